@@ -1,11 +1,14 @@
 import logging
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi_pagination import add_pagination
 
-from . import config, database
+from . import cache, config, database
+from .data import logos, selector, warmup
+from .dependencies import check_master_generation
 from .logger import log
+from .middleware import CompressionMiddleware, ConditionalRequestMiddleware
 from .routes import api_router
 
 
@@ -14,7 +17,23 @@ def create_app():
               % (config.APP_ENV))
     # create a new FastAPI instance.
     app = FastAPI(
-        title = config.PROJECT_NAME, dependencies = [])
+        title = config.PROJECT_NAME, dependencies = [
+            # on every request, ensure we're not serving a stale master.
+            Depends(check_master_generation)
+        ])
+    # answer repeat requests for anything derived from master data with 304
+    # not modified, before any session is opened. logos are validated by
+    # their own content hash.
+    app.add_middleware(
+        ConditionalRequestMiddleware,
+        path_prefixes = ("/api/vehicles/",),
+        compression = config.COMPRESSION_ENABLED)
+    if config.COMPRESSION_ENABLED:
+        # compress large responses for clients that accept it.
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size = config.COMPRESSION_MINIMUM_SIZE,
+            gzip_level = config.COMPRESSION_GZIP_LEVEL)
     # configure to allow CORS. This is just an example app so we will
     # have no restrictions.
     app.add_middleware(
@@ -43,10 +62,21 @@ def _register_events(app: FastAPI):
         """
         log.debug("application starting up, ensuring database is created...")
         await database.init_database()
+        # note the current master generation, everything loaded from here is
+        # from this generation.
+        cache.refresh_master_generation()
+        if config.SELECTOR_SERVE_FROM_MEMORY:
+            # load the selector tree we'll be serving from.
+            log.debug("serving selector from memory, loading selector tree...")
+            await selector.reload()
+        # warm up in the background; pools, selector queries, caches and
+        # logos. until it's done, this worker reports itself not ready.
+        warmup.start()
         log.debug("app startup completed :)")
 
     @app.on_event("shutdown")
     async def on_shutdown():
         """On shutdown, ensure we close the database properly."""
         log.debug("application shutting down...")
+        await warmup.stop()
         await database.close_database()
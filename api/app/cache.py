@@ -0,0 +1,332 @@
+"""Caching of responses derived from master data. Master data only changes
+when it is imported, so anything derived from it can be cached until then.
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from app import config
+from app.logger import log
+
+
+class LRUCache():
+    """A least-recently-used cache bounded both by the number of entries it
+    holds and by the approximate total size, in bytes, of those entries. The
+    number of hits and misses are counted.
+    """
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self._num_bytes: int = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the value cached for the given key, or None if there is
+        none. The entry becomes the most recently used.
+        """
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Return True if a value is cached for the given key. Neither a hit
+        nor a miss is counted, and the entry isn't used.
+        """
+        with self._lock:
+            return key in self._entries
+
+    def set(self, key: Hashable, value: Any, size: int):
+        """Cache the given value, which is approximately size bytes, under
+        the given key. Least recently used entries are evicted until the cache
+        is within its bounds. Values larger than the cache are not cached.
+        """
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            existing = self._entries.pop(key, None)
+            if existing is not None:
+                self._num_bytes -= existing[1]
+            self._entries[key] = (value, size,)
+            self._num_bytes += size
+            while len(self._entries) > self.max_entries or \
+                self._num_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last = False)
+                self._num_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry in the cache. Counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._num_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return the current size and counters of this cache."""
+        return dict(
+            entries = len(self._entries),
+            bytes = self._num_bytes,
+            hits = self.hits,
+            misses = self.misses,
+            evictions = self.evictions
+        )
+
+
+class MasterGeneration():
+    """The master generation is a number, shared by every process through a
+    file, that is bumped each time a master import commits. Reading it is
+    cheap; the file is only read again when a stat shows it has been replaced.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._stat_key: Optional[Tuple] = None
+        self._generation: int = 0
+
+    def current(self) -> int:
+        """Return the current master generation. If the master has never
+        been imported, this is 0.
+        """
+        try:
+            stat_result = os.stat(self.path)
+        except FileNotFoundError:
+            return 0
+        stat_key = (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size,)
+        if stat_key != self._stat_key:
+            with open(self.path, "r") as r:
+                self._generation = int(r.read().strip() or 0)
+            self._stat_key = stat_key
+        return self._generation
+
+    def changed_at(self) -> Optional[float]:
+        """Return the time the master generation last changed, as seconds
+        since the epoch, or None if the master has never been imported.
+        """
+        try:
+            return os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def bump(self) -> int:
+        """Increment the master generation, and return the new value. The
+        file is replaced atomically so readers never see a partial write.
+        """
+        new_generation: int = self.current() + 1
+        temp_path: str = "%s.%d" % (self.path, os.getpid(),)
+        with open(temp_path, "w") as w:
+            w.write(str(new_generation))
+        os.replace(temp_path, self.path)
+        return new_generation
+
+
+class SharedCache():
+    """A cache shared by every worker process, stored in a local SQLite
+    file. Each entry is stamped with the master generation it was derived
+    from, and only entries from the current generation are ever returned.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.hits: int = 0
+        self.misses: int = 0
+        self._pid: Optional[int] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this process' connection to the cache file, opening it and
+        ensuring the schema exists if required.
+        """
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout = 5,
+                isolation_level = None, check_same_thread = False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE IF NOT EXISTS entry (key TEXT PRIMARY KEY, "\
+                         "generation INTEGER NOT NULL, value BLOB NOT NULL)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key: str, generation: int) -> Optional[bytes]:
+        """Return the value cached for the given key at the given master
+        generation, or None if there is none.
+        """
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value FROM entry WHERE key = ? AND generation = ?",
+                (key, generation,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def set(self, key: str, generation: int, value: bytes):
+        """Cache the given value under the given key, at the given master
+        generation.
+        """
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO entry (key, generation, value) VALUES (?, ?, ?)",
+                (key, generation, value,))
+
+    def drop_stale(self, generation: int):
+        """Delete every entry from a generation before the given one."""
+        with self._lock:
+            self._connection().execute(
+                "DELETE FROM entry WHERE generation < ?", (generation,))
+
+    def stats(self) -> Dict[str, int]:
+        """Return the counters of this cache, as seen by this process."""
+        return dict(
+            hits = self.hits,
+            misses = self.misses
+        )
+
+
+class SingleFlight():
+    """Coalesces identical concurrent work within a process. The first caller
+    for a key leads, running the work, while every caller for the same key
+    arriving before it finishes awaits the leader's result, or exception,
+    instead. Should the leader be cancelled, such as by its client going
+    away, its followers run the work themselves. The number of flights led
+    and the number of callers coalesced into them are counted.
+    """
+    def __init__(self):
+        self.leads: int = 0
+        self.coalesced: int = 0
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the result of awaiting the given work, or that of the flight
+        already in progress for the given key.
+        """
+        while True:
+            flight: Optional[asyncio.Future] = self._flights.get(key, None)
+            if flight is None:
+                break
+            self.coalesced += 1
+            try:
+                # shielded, so a follower being cancelled doesn't cancel the flight.
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+                # the leader was cancelled, take over the flight.
+                self.coalesced -= 1
+
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        self.leads += 1
+        try:
+            result = await work()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as e:
+            flight.set_exception(e)
+            # mark the exception as retrieved, in case there are no followers.
+            flight.exception()
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            if self._flights.get(key, None) is flight:
+                del self._flights[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of flights in progress, and the counters."""
+        return dict(
+            in_flight = len(self._flights),
+            leads = self.leads,
+            coalesced = self.coalesced
+        )
+
+
+def _cache_path(filename: str) -> str:
+    """Return the path to the given file within the cache directory, which
+    is created if required. If no cache directory is configured, a directory
+    within the system's temporary directory is used, with a warning, as the
+    master generation is then only shared with processes on the same host
+    and temporary directory.
+    """
+    cache_directory: Optional[str] = config.CACHE_DIRECTORY
+    if not cache_directory:
+        cache_directory = os.path.join(tempfile.gettempdir(), "csb-cache")
+        log.warning("CACHE_DIRECTORY is not set, using %s; a master update run "\
+                    "anywhere that doesn't share it won't invalidate this "\
+                    "process' caches!" % cache_directory)
+    os.makedirs(cache_directory, exist_ok = True)
+    return os.path.join(cache_directory, filename)
+
+
+# The cache for paginated selector responses, shared by the whole process.
+selector_cache = LRUCache(
+    config.SELECTOR_CACHE_MAX_ENTRIES,
+    config.SELECTOR_CACHE_MAX_BYTES
+)
+# The cache for compressed response bodies, keyed by ETag and encoding.
+compression_cache = LRUCache(
+    config.COMPRESSION_CACHE_MAX_ENTRIES,
+    config.COMPRESSION_CACHE_MAX_BYTES
+)
+# The cache for logo bytes, keyed by each logo's content hash ETag.
+logo_cache = LRUCache(
+    config.LOGO_CACHE_MAX_ENTRIES,
+    config.LOGO_CACHE_MAX_BYTES
+)
+# Coalesces identical concurrent selector queries within the process.
+selector_flights = SingleFlight()
+# The cache for paginated selector responses, shared by every worker.
+shared_selector_cache = SharedCache(_cache_path("selector-cache.sqlite"))
+# The master generation, shared by every process.
+master_generation = MasterGeneration(_cache_path("master.generation"))
+
+# The master generation this process last saw.
+_seen_generation: Optional[int] = None
+
+
+def refresh_master_generation() -> bool:
+    """Check the master generation. If it has changed since this process
+    last checked, drop everything this process has cached from master data,
+    and any stale shared entries, then return True.
+    """
+    global _seen_generation
+    generation: int = master_generation.current()
+    if generation == _seen_generation:
+        return False
+    first_check: bool = _seen_generation is None
+    _seen_generation = generation
+    if first_check:
+        return False
+    log.debug("master generation is now %d, invalidating selector cache..."
+              % generation)
+    selector_cache.clear()
+    compression_cache.clear()
+    if config.SHARED_CACHE_ENABLED:
+        shared_selector_cache.drop_stale(generation)
+    return True
+
+
+def invalidate_master():
+    """Drop everything cached from master data, in every process, by bumping
+    the master generation. This must be called whenever a master import
+    commits.
+    """
+    generation: int = master_generation.bump()
+    log.debug("master data has changed, now at generation %d" % generation)
+    selector_cache.clear()
+    compression_cache.clear()
@@ -42,4 +42,11 @@ for atr in [f for f in dir(_current_config) if not "__" in f]:
         else:
             # attempt get as-is from environ.
             val = os.environ.get(atr, getattr(_current_config, atr))
+    # values read from the environment are always strings; coerce them to
+    # the type of the configured default where that is a bool or number.
+    default = getattr(_current_config, atr)
+    if isinstance(val, str) and isinstance(default, bool):
+        val = val.strip().lower() not in ("", "0", "false", "no", "off")
+    elif isinstance(val, str) and isinstance(default, (int, float)):
+        val = type(default)(val.strip())
     setattr(sys.modules[__name__], atr, val)
\ No newline at end of file
@@ -7,7 +7,33 @@ class BaseConfig:
     DEBUG = False
     TESTING = False
     
+    # Read replicas, either as a comma separated list of URIs or of hosts
+    # sharing the other db_ components. Reads are routed to them, round_robin
+    # or to the one with least_connections in use; a replica that fails is
+    # skipped for the retry interval, in seconds. For the max lag, in seconds,
+    # after each master update, reads go to the primary while replicas catch
+    # up, so nothing cached for the new master is read from a stale replica.
+    SQLALCHEMY_REPLICA_URIS = None
+    DB_REPLICA_HOSTS = None
+    REPLICA_ROUTING = "round_robin"
+    REPLICA_RETRY_INTERVAL = 30
+    REPLICA_MAX_LAG = 30
+
+    # The name of the connection pool class, from sqlalchemy.pool, like
+    # AsyncAdaptedQueuePool or NullPool. If not set, the dialect's default.
     SQLALCHEMY_POOLCLASS = None
+    # The number of connections a queue pool keeps open, and the number it
+    # may open beyond that under load.
+    SQLALCHEMY_POOL_SIZE = 5
+    SQLALCHEMY_MAX_OVERFLOW = 10
+    # Seconds to wait for a connection from a full queue pool before failing.
+    SQLALCHEMY_POOL_TIMEOUT = 30
+    # Seconds after which a connection is replaced; must be below MySQL's
+    # wait_timeout. Set to -1 to never replace connections.
+    SQLALCHEMY_POOL_RECYCLE = 3600
+    # Set to test each connection as it is checked out, replacing it if it
+    # has gone stale.
+    SQLALCHEMY_POOL_PRE_PING = True
     
     # Set to any value to serve media through nginx.
     USING_NGINX = None
@@ -31,6 +57,58 @@ class BaseConfig:
     CONTENT_DIRECTORY = None
     # Directory to where we store master data.
     MASTER_DIRECTORY = None
+    # Directory to where selector responses are exported as static files.
+    STATIC_DIRECTORY = None
+    # The number of rows written per statement when bulk importing master.
+    BULK_UPSERT_CHUNK_SIZE = 500
+
+    # Directory for caches shared by all workers, and the master generation.
+    # If not set, a directory within the system's temp directory is used.
+    CACHE_DIRECTORY = None
+    # Set to also cache selector responses in a cache shared by all workers.
+    SHARED_CACHE_ENABLED = True
+    # Set to cache selector responses in process until master changes.
+    SELECTOR_CACHE_ENABLED = True
+    # The maximum number of responses the selector cache will hold.
+    SELECTOR_CACHE_MAX_ENTRIES = 4096
+    # The maximum approximate size, in bytes, of the selector cache.
+    SELECTOR_CACHE_MAX_BYTES = 32 * 1024 * 1024
+    # Set to warm each worker up at startup; open its connection pools, run
+    # each selector query once and preload makes, types and logos. Until it
+    # is done, /api/health/ready reports the worker isn't ready.
+    WARMUP_ENABLED = True
+    # Set to coalesce identical concurrent selector queries in each worker
+    # into one, whose result they all share.
+    SELECTOR_COALESCING_ENABLED = True
+    # Set to select only the columns each selector response needs, as rows,
+    # rather than whole mapped instances.
+    SELECTOR_PROJECTED_READS = True
+    # Set to serve the selector from an in-memory snapshot of the master,
+    # loaded at startup, rather than querying the database per request.
+    SELECTOR_SERVE_FROM_MEMORY = False
+    # Set to compress responses with gzip, or brotli if installed, for
+    # clients that accept it.
+    COMPRESSION_ENABLED = True
+    # Responses smaller than this many bytes are not worth compressing.
+    COMPRESSION_MINIMUM_SIZE = 1024
+    # The gzip compression level, 1 (fastest) to 9 (smallest).
+    COMPRESSION_GZIP_LEVEL = 6
+    # The maximum number of compressed bodies, and their approximate total
+    # size in bytes, cached by ETag.
+    COMPRESSION_CACHE_MAX_ENTRIES = 4096
+    COMPRESSION_CACHE_MAX_BYTES = 16 * 1024 * 1024
+    # Logos no larger than this many bytes are kept in memory.
+    LOGO_CACHE_MAX_FILE_SIZE = 256 * 1024
+    # The maximum number of logos, and their total size in bytes, in memory.
+    LOGO_CACHE_MAX_ENTRIES = 512
+    LOGO_CACHE_MAX_BYTES = 16 * 1024 * 1024
+    # How long, in seconds, clients may cache a logo without revalidating.
+    LOGO_MAX_AGE = 365 * 24 * 60 * 60
+    # Set to serialise responses built from trusted data straight to JSON,
+    # without FastAPI validating them against the response model again.
+    FAST_JSON_RESPONSES = False
+    # The maximum number of vehicles that can be resolved in a single batch.
+    MAX_BATCH_SIZE = 250
 
 
 class TestConfig(BaseConfig):
@@ -38,7 +116,12 @@ class TestConfig(BaseConfig):
     TESTING = True
     PRESERVE_CONTEXT_ON_EXCEPTION = False
 
-    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    # Tests point this at their own database file, through the environment.
+    SQLALCHEMY_DATABASE_URI = None
+    # Tests run in many event loops, so connections must never be pooled.
+    SQLALCHEMY_POOLCLASS = "NullPool"
+    # Tests control the caches themselves.
+    WARMUP_ENABLED = False
 
     # The default number per page in pagination.
     DEFAULT_NUM_PER_PAGE = 10
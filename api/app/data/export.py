@@ -0,0 +1,107 @@
+"""Export of every selector response as static, pre-serialised JSON files,
+with precompressed siblings, such that a web server can serve the selector
+without calling the API at all. Master data only changes when it is imported,
+so an export stays valid until the next import.
+"""
+import gzip
+import math
+import os
+import shutil
+
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi_pagination import Params
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import config, utility as util
+from app.data import selector
+from app.logger import log
+from app.routes import schemas
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Each selector route, and the type of its options.
+EXPORTED_ROUTES: Dict[str, Any] = {
+    "makes": schemas.VehicleMakeResponse,
+    "types": schemas.VehicleTypeResponse,
+    "models": schemas.VehicleModelResponse,
+    "years": schemas.VehicleYearModelResponse,
+    "stock": schemas.VehicleResponse
+}
+
+PageResponse = util.make_page_response()
+
+
+def static_page_path(route: str, args: Tuple, page: int, size: int) -> str:
+    """Return the path, relative to the static directory, of the given page
+    of the given selector route and args. For example, the first page of 25
+    models for a make and type is 'vehicles/models/<mk>/<t>/page-1-25.json'.
+    """
+    return os.path.join("vehicles", route, *[str(arg) for arg in args],
+        "page-%d-%d.json" % (page, size,))
+
+
+def _write_static_file(path: str, body: bytes):
+    """Write the given body to the given path, along with gzip and, if the
+    brotli module is available, brotli compressed siblings.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    with open(path, "wb") as w:
+        w.write(body)
+    with open(path + ".gz", "wb") as w:
+        w.write(gzip.compress(body, compresslevel = 9, mtime = 0))
+    if brotli is not None:
+        with open(path + ".br", "wb") as w:
+            w.write(brotli.compress(body))
+
+
+async def export_static(
+    sesh: AsyncSession,
+    directory: str,
+    *,
+    page_size: Optional[int] = None
+) -> Dict[str, int]:
+    """Export every page of every selector response, at the given page size,
+    to the given directory. If page size is not given, the default page size
+    is used. The export is written beside the directory first, then swapped in
+    for it, so a web server never serves a partial export.
+
+    Returns a dictionary of route to the number of pages exported.
+    """
+    if page_size is None:
+        page_size = config.DEFAULT_NUM_PER_PAGE
+    tree: selector.SelectorTree = await selector.SelectorTree.load(sesh)
+    directory = os.path.abspath(directory)
+    new_directory: str = "%s.new-%d" % (directory, os.getpid(),)
+    shutil.rmtree(new_directory, ignore_errors = True)
+    if brotli is None:
+        log.warning("brotli module not installed, only exporting gzip siblings")
+
+    num_pages: Dict[str, int] = {}
+    for route, item_type in EXPORTED_ROUTES.items():
+        page_type = PageResponse[item_type]
+        num_pages[route] = 0
+        for args, options in tree.levels(route):
+            total: int = len(options)
+            for page in range(1, max(1, math.ceil(total / page_size)) + 1):
+                start: int = (page - 1) * page_size
+                body: bytes = page_type.create(
+                    options[start:start + page_size],
+                    Params(page = page, size = page_size),
+                    total = total
+                ).model_dump_json(by_alias = True).encode("utf-8")
+                _write_static_file(os.path.join(new_directory,
+                    static_page_path(route, args, page, page_size)), body)
+                num_pages[route] += 1
+        log.debug("exported %d %s pages" % (num_pages[route], route,))
+
+    # swap the new export in for the old one.
+    old_directory: str = "%s.old-%d" % (directory, os.getpid(),)
+    if os.path.isdir(directory):
+        os.rename(directory, old_directory)
+    os.rename(new_directory, directory)
+    shutil.rmtree(old_directory, ignore_errors = True)
+    return num_pages
@@ -0,0 +1,127 @@
+"""Incremental reading of large JSON documents, such that only a single
+array member needs to be held in memory at any one time.
+"""
+import json
+import pathlib
+import aiofiles
+
+from collections.abc import AsyncGenerator
+from typing import Any, Collection, Tuple, Union
+
+_WHITESPACE = " \t\n\r"
+
+
+class JSONStreamReader():
+    """Reads a JSON document whose root is an object, from a file, a chunk
+    at a time. The members of chosen top-level arrays are decoded and yielded
+    one at a time, while all other top-level values are skipped.
+    """
+    def __init__(self, file, chunk_size: int = 65536):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer: str = ""
+        self._pos: int = 0
+        self._eof: bool = False
+
+    async def _read_more(self, at_least: int = 0) -> bool:
+        """Read at least one more chunk from the file into the buffer, first
+        discarding everything that has been consumed. Returns False if the
+        file is exhausted.
+        """
+        if self._eof:
+            return False
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        contents: str = await self._file.read(max(self._chunk_size, at_least))
+        if not contents:
+            self._eof = True
+            return False
+        self._buffer += contents
+        return True
+
+    async def _peek(self) -> str:
+        """Skip whitespace, then return the next character without consuming
+        it. An empty string is returned at the end of the file.
+        """
+        while True:
+            while self._pos < len(self._buffer) and \
+                self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not await self._read_more():
+                return ""
+
+    async def _expect(self, char: str):
+        """Consume the next non-whitespace character, which must be char."""
+        next_char: str = await self._peek()
+        if next_char != char:
+            raise ValueError("expected '%s' at offset %d of JSON stream, found "\
+                             "'%s'" % (char, self._pos, next_char))
+        self._pos += 1
+
+    async def _read_value(self) -> Any:
+        """Decode and consume the next complete JSON value. If the buffer
+        holds only part of it, more is read until the value is complete; the
+        amount read doubles each time so large values don't decode
+        quadratically.
+        """
+        await self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # a number that ends with the buffer may be continued.
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError as jde:
+                if self._eof:
+                    raise jde
+            await self._read_more(len(self._buffer) - self._pos)
+
+    async def iter_arrays(
+        self,
+        keys: Collection[str]
+    ) -> AsyncGenerator[Tuple[str, Any], None]:
+        """Walk the top-level object of the document, yielding a tuple of
+        key and decoded member for every member of each top-level array whose
+        key is in keys, in document order.
+        """
+        await self._expect("{")
+        if await self._peek() == "}":
+            return
+        while True:
+            key: str = await self._read_value()
+            await self._expect(":")
+            if key in keys and await self._peek() == "[":
+                await self._expect("[")
+                if await self._peek() == "]":
+                    self._pos += 1
+                else:
+                    while True:
+                        yield key, await self._read_value()
+                        if await self._peek() == "]":
+                            self._pos += 1
+                            break
+                        await self._expect(",")
+            else:
+                await self._read_value()
+            if await self._peek() == "}":
+                return
+            await self._expect(",")
+
+
+async def stream_arrays(
+    path: Union[str, pathlib.Path],
+    keys: Collection[str],
+    *,
+    chunk_size: int = 65536
+) -> AsyncGenerator[Tuple[str, Any], None]:
+    """Open the JSON document at the given path, then yield a tuple of key
+    and decoded member for every member of each top-level array whose key is
+    in keys, in document order.
+    """
+    async with aiofiles.open(path, mode = "r") as r:
+        async for key, value in JSONStreamReader(r, chunk_size).iter_arrays(keys):
+            yield key, value
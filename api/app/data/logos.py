@@ -0,0 +1,120 @@
+"""Make logos, preloaded such that a logo request never needs the database.
+Every make's logo is mapped to its path, mimetype, size and a hash of its
+contents, and small logos' bytes are kept in a bounded cache. The map is
+reloaded whenever the master generation changes.
+"""
+import hashlib
+import mimetypes
+import os
+import pathlib
+import time
+import aiofiles
+
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from sqlalchemy import select
+
+from app import cache, config, database
+from app.logger import log
+
+
+@dataclass(frozen = True)
+class Logo():
+    """A single make's logo."""
+    # The logo's media uri, relative to the content directory.
+    media_uri: str
+    # The logo's absolute path on disk, or None if there's no content directory.
+    path: Optional[str]
+    # The logo's mimetype, or None if it can't be determined.
+    mimetype: Optional[str]
+    # The logo's size in bytes, or None if it isn't on disk.
+    size: Optional[int]
+    # A strong ETag derived from the logo's contents, or from its media uri
+    # if it isn't on disk.
+    etag: str
+    # True if the ETag was derived from the logo's contents, such that the
+    # logo can't change without its ETag changing too.
+    content_hashed: bool
+
+
+async def load_logo(media_uri: str) -> Logo:
+    """Build a logo from the given media uri, hashing the file's contents if
+    it exists within the content directory. If it is small enough, the file's
+    bytes are cached along the way.
+    """
+    media_path = pathlib.Path(media_uri)
+    mimetype, _ = mimetypes.guess_type(media_uri)
+    path: Optional[str] = None
+    if config.CONTENT_DIRECTORY:
+        path = os.path.join(config.CONTENT_DIRECTORY, str(media_path))
+    contents: Optional[bytes] = None
+    if path is not None and os.path.isfile(path):
+        async with aiofiles.open(path, mode = "rb") as r:
+            contents = await r.read()
+    if contents is None:
+        log.warning("logo %s isn't within the content directory" % media_uri)
+        digest: str = hashlib.blake2b(media_uri.encode("utf-8"),
+            digest_size = 12).hexdigest()
+        return Logo(media_uri, path, mimetype, None, "\"%s\"" % digest, False)
+    digest = hashlib.blake2b(contents, digest_size = 12).hexdigest()
+    logo = Logo(media_uri, path, mimetype, len(contents), "\"%s\"" % digest, True)
+    if len(contents) <= config.LOGO_CACHE_MAX_FILE_SIZE:
+        cache.logo_cache.set(logo.etag, contents, len(contents))
+    return logo
+
+
+async def read_logo(logo: Logo) -> Optional[bytes]:
+    """Return the given logo's bytes from the cache, reading and caching them
+    if they're not cached. If the logo is too large to cache, None is
+    returned and the logo should be streamed from disk instead.
+    """
+    if logo.size is None or logo.size > config.LOGO_CACHE_MAX_FILE_SIZE:
+        return None
+    contents: Optional[bytes] = cache.logo_cache.get(logo.etag)
+    if contents is None:
+        async with aiofiles.open(logo.path, mode = "rb") as r:
+            contents = await r.read()
+        cache.logo_cache.set(logo.etag, contents, len(contents))
+    return contents
+
+
+# Make ID -> the make's logo, along with the master generation they are from.
+# The map is only ever replaced, never modified.
+_logos: Optional[Dict[str, Logo]] = None
+_generation: Optional[int] = None
+# Coalesces concurrent reloads for the same master generation.
+_reloads = cache.SingleFlight()
+
+
+async def reload():
+    """Load every make's logo, then swap them in for the current logos."""
+    global _logos, _generation
+    started: float = time.perf_counter()
+    generation: int = cache.master_generation.current()
+    async with database.async_read_session() as sesh:
+        result = await sesh.execute(
+            select(database.VehicleMake.id, database.VehicleMake.logo_media_uri))
+        media_uris: Dict[str, str] = dict(result.all())
+    logos_by_uri: Dict[str, Logo] = {}
+    for media_uri in set(media_uris.values()):
+        logos_by_uri[media_uri] = await load_logo(media_uri)
+    _logos = {
+        make_id: logos_by_uri[media_uri] for make_id, media_uri in media_uris.items()
+    }
+    _generation = generation
+    log.debug("loaded %d logos in %.1fms"
+              % (len(_logos), (time.perf_counter() - started) * 1000,))
+
+
+async def find_logo(make_id: str) -> Optional[Logo]:
+    """Return the logo for the given make ID, or None if there is no such
+    make. Logos are only loaded from the database when first required, and
+    when the master generation has changed since they were last loaded. Any
+    requests arriving during a reload await that reload rather than starting
+    their own.
+    """
+    generation: int = cache.master_generation.current()
+    if _logos is None or _generation != generation:
+        await _reloads.run(generation, reload)
+    return _logos.get(make_id, None)
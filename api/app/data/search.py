@@ -0,0 +1,170 @@
+"""An in-memory prefix index over every vehicle, for type-ahead searches like
+'94 supra manual'. The index is built from the vehicle stock read table, and
+rebuilt whenever the master generation changes.
+"""
+import bisect
+import itertools
+import re
+import time
+
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import cache, database
+from app.logger import log
+from app.routes import schemas
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+# transmission type -> the words a search may use for it.
+_TRANSMISSION_WORDS = {
+    "A": ("automatic", "auto",),
+    "M": ("manual",)
+}
+# a query token that equals an indexed token outranks one that only prefixes it.
+_EXACT_SCORE = 2
+_PREFIX_SCORE = 1
+
+
+def tokenise(text: Optional[str]) -> List[str]:
+    """Split the given text into lowercase search tokens. Decimal numbers,
+    like 3.0, are kept whole.
+    """
+    if not text:
+        return []
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class SearchIndex():
+    """An immutable prefix index over a set of vehicles. Each vehicle is
+    indexed by the tokens of its title (year, make and model names), its year
+    model spec (badge or version, motor and transmission), its two digit year
+    and the words for its transmission. Tokens are held sorted, so all tokens
+    starting with a prefix are found with a binary search.
+    """
+    def __init__(
+        self,
+        vehicles: Tuple[schemas.VehicleResponse, ...],
+        years: Tuple[int, ...],
+        generation: int
+    ):
+        self.vehicles = vehicles
+        self.years = years
+        self.generation = generation
+        postings: Dict[str, Set[int]] = defaultdict(set)
+        for position, vehicle in enumerate(vehicles):
+            for token in _vehicle_tokens(vehicle, years[position]):
+                postings[token].add(position)
+        self._postings: Dict[str, FrozenSet[int]] = {
+            token: frozenset(positions) for token, positions in postings.items()
+        }
+        self._tokens: List[str] = sorted(self._postings.keys())
+
+    def _match_token(self, query_token: str) -> Dict[int, int]:
+        """Return a dictionary of vehicle position to score, for every vehicle
+        with an indexed token that starts with the given query token.
+        """
+        scores: Dict[int, int] = {}
+        start: int = bisect.bisect_left(self._tokens, query_token)
+        # every token with the prefix sorts before the first without it.
+        end: int = bisect.bisect_left(self._tokens, query_token + "\uffff", start)
+        for token in itertools.islice(self._tokens, start, end):
+            score: int = _EXACT_SCORE if token == query_token else _PREFIX_SCORE
+            for position in self._postings[token]:
+                if scores.get(position, 0) < score:
+                    scores[position] = score
+        return scores
+
+    def search(self, query: str, limit: int) -> List[schemas.VehicleResponse]:
+        """Return up to limit vehicles matching every token in the given query,
+        either exactly or by prefix. Results are ranked by their total score,
+        then newest year first, then by title and spec.
+        """
+        query_tokens: List[str] = sorted(set(tokenise(query)), key = len,
+            reverse = True)
+        if not query_tokens:
+            return []
+        # start with the longest, and likely most selective, token.
+        totals: Dict[int, int] = self._match_token(query_tokens[0])
+        for query_token in query_tokens[1:]:
+            if not totals:
+                break
+            scores: Dict[int, int] = self._match_token(query_token)
+            totals = {
+                position: total + scores[position]
+                for position, total in totals.items() if position in scores
+            }
+        ranked = sorted(totals.items(), key = lambda item: (
+            -item[1],
+            -self.years[item[0]],
+            self.vehicles[item[0]].title or "",
+            self.vehicles[item[0]].year_model_spec or "",
+        ))
+        return [self.vehicles[position] for position, _ in ranked[:limit]]
+
+    def count(self) -> Dict[str, int]:
+        """Return the number of vehicles and distinct tokens indexed."""
+        return dict(
+            vehicles = len(self.vehicles),
+            tokens = len(self._tokens)
+        )
+
+    @classmethod
+    async def load(cls, sesh: AsyncSession, generation: int) -> "SearchIndex":
+        """Load every vehicle from the vehicle stock read table, and build a
+        new index from them, stamped with the given master generation.
+        """
+        result = await sesh.execute(
+            select(*database.PROJECTIONS["stock"], database.VehicleStock.year))
+        rows = result.all()
+        return cls(
+            tuple(schemas.VehicleResponse.model_validate(row) for row in rows),
+            tuple(row.year for row in rows),
+            generation
+        )
+
+
+def _vehicle_tokens(vehicle: schemas.VehicleResponse, year: int) -> Set[str]:
+    """Return every token the given vehicle, from the given year, should be
+    found by.
+    """
+    tokens: Set[str] = set(tokenise(vehicle.title))
+    tokens.update(tokenise(vehicle.year_model_spec))
+    tokens.update(tokenise(vehicle.badge))
+    tokens.update(tokenise(vehicle.version))
+    tokens.add("%02d" % (year % 100))
+    tokens.update(_TRANSMISSION_WORDS.get(vehicle.trans_type, ()))
+    return tokens
+
+
+# The current search index. This is only ever replaced, never modified, so
+# readers always see a complete index.
+_index: Optional[SearchIndex] = None
+# Coalesces concurrent builds for the same master generation.
+_builds = cache.SingleFlight()
+
+
+async def current(sesh: AsyncSession) -> SearchIndex:
+    """Return the search index for the current master generation, building
+    it with the given session first if the master has changed since it was
+    last built. Any requests arriving during a build await that build rather
+    than starting their own.
+    """
+    generation: int = cache.master_generation.current()
+    if _index is not None and _index.generation == generation:
+        return _index
+    return await _builds.run(generation, lambda: _build(sesh, generation))
+
+
+async def _build(sesh: AsyncSession, generation: int) -> SearchIndex:
+    """Build the search index for the given master generation with the given
+    session, then swap it in for the current one.
+    """
+    global _index
+    started: float = time.perf_counter()
+    _index = await SearchIndex.load(sesh, generation)
+    log.debug("search index built in %.1fms; %s"
+              % ((time.perf_counter() - started) * 1000, _index.count(),))
+    return _index
@@ -0,0 +1,192 @@
+"""An in-memory, precomputed snapshot of the whole selector hierarchy. When
+enabled, the selector routes are answered from this snapshot rather than the
+database.
+"""
+from collections import defaultdict
+from collections.abc import Callable
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import cache, config, database
+from app.logger import log
+from app.routes import schemas
+
+
+# Each selector level in order; its route, option type, query builder, the
+# parameter its selection is passed as and the option attribute selected.
+SELECTOR_LEVELS = (
+    ("makes", schemas.VehicleMakeResponse, database.build_make_query, "mk", "id",),
+    ("types", schemas.VehicleTypeResponse, database.build_type_query, "t", "id",),
+    ("models", schemas.VehicleModelResponse, database.build_model_query, "mdl", "id",),
+    ("years", schemas.VehicleYearModelResponse, database.build_year_model_query,
+     "y", "year",),
+    ("stock", schemas.VehicleResponse, database.build_vehicle_query, None, None,),
+)
+
+
+async def selector_options(
+    sesh: AsyncSession,
+    route: str,
+    item_type: Type[BaseModel],
+    build_query: Callable[..., Select],
+    *args: Any
+) -> List[BaseModel]:
+    """Return every option for the given selector route and args; from the
+    in-memory selector tree if the app is configured to serve from memory,
+    otherwise from the database.
+    """
+    if config.SELECTOR_SERVE_FROM_MEMORY:
+        return list(current().options(route, *args))
+    return await database.select_selector_options(sesh, route, item_type,
+        build_query, *args)
+
+
+class SelectorTree():
+    """An immutable snapshot of the selector hierarchy; make -> type ->
+    model -> year -> vehicles. Each level's options are held as a tuple of
+    response schemas, keyed by the IDs of every level above it, and sorted in
+    the level's keyset order, just as the database orders them.
+    """
+    def __init__(
+        self,
+        makes: Tuple[schemas.VehicleMakeResponse, ...],
+        types: Dict[Tuple, Tuple[schemas.VehicleTypeResponse, ...]],
+        models: Dict[Tuple, Tuple[schemas.VehicleModelResponse, ...]],
+        years: Dict[Tuple, Tuple[schemas.VehicleYearModelResponse, ...]],
+        stock: Dict[Tuple, Tuple[schemas.VehicleResponse, ...]]
+    ):
+        self._options: Dict[str, Dict[Tuple, Tuple]] = {
+            "makes": {(): makes},
+            "types": types,
+            "models": models,
+            "years": years,
+            "stock": stock
+        }
+
+    def options(self, route: str, *args: Any) -> Tuple:
+        """Return the options for the given route, given the IDs of every
+        level above it, in order. If there are none, an empty tuple is
+        returned.
+        """
+        return self._options[route].get(args, ())
+
+    def levels(self, route: str) -> Iterable[Tuple[Tuple, Tuple]]:
+        """Return every set of options held for the given route, as tuples of
+        the IDs of every level above it and its options.
+        """
+        return self._options[route].items()
+
+    def count(self) -> Dict[str, int]:
+        """Return the total number of options held at each level."""
+        return {
+            route: sum(len(options) for options in level.values())
+            for route, level in self._options.items()
+        }
+
+    @classmethod
+    async def load(cls, sesh: AsyncSession) -> "SelectorTree":
+        """Load the whole selector hierarchy from the database, and build a
+        new tree from it.
+        """
+        makes: Dict[str, Dict] = await _select_rows(sesh, database.VehicleMake)
+        types: Dict[str, Dict] = await _select_rows(sesh, database.VehicleType)
+        models: Dict[str, Dict] = await _select_rows(sesh, database.VehicleModel)
+        year_models: Dict[str, Dict] = \
+            await _select_rows(sesh, database.VehicleYearModel)
+        vehicles: Dict[str, Dict] = await _select_rows(sesh, database.Vehicle)
+
+        types_by_make: Dict[Tuple, set] = defaultdict(set)
+        models_by_type: Dict[Tuple, List] = defaultdict(list)
+        for model in models.values():
+            types_by_make[(model["vehicle_make_id"],)].add(model["type_id"])
+            models_by_type[(model["vehicle_make_id"], model["type_id"],)]\
+                .append(schemas.VehicleModelResponse.model_validate(model))
+        years_by_model: Dict[Tuple, List] = defaultdict(list)
+        for year_model in year_models.values():
+            model = models[year_model["vehicle_model_id"]]
+            years_by_model[(year_model["vehicle_make_id"], model["type_id"],
+                            year_model["vehicle_model_id"],)]\
+                .append(schemas.VehicleYearModelResponse.model_validate(year_model))
+        stock_by_year: Dict[Tuple, List] = defaultdict(list)
+        for vehicle in vehicles.values():
+            year_model = year_models[vehicle["vehicle_year_model_id"]]
+            model = models[year_model["vehicle_model_id"]]
+            stock_by_year[(model["vehicle_make_id"], model["type_id"],
+                           model["id"], year_model["year"],)]\
+                .append(schemas.VehicleResponse.model_validate(vehicle))
+
+        return cls(
+            makes = tuple(sorted(
+                (schemas.VehicleMakeResponse.model_validate(make)
+                 for make in makes.values()),
+                key = lambda make: (make.name, make.id,))),
+            types = {
+                key: tuple(sorted(
+                    (schemas.VehicleTypeResponse.model_validate(types[type_id])
+                     for type_id in type_ids),
+                    key = lambda type: (type.name, type.id,)))
+                for key, type_ids in types_by_make.items()
+            },
+            models = {
+                key: tuple(sorted(options, key = lambda model: (model.name, model.id,)))
+                for key, options in models_by_type.items()
+            },
+            years = {
+                key: tuple(sorted(options,
+                    key = lambda year_model: (year_model.year, year_model.id,)))
+                for key, options in years_by_model.items()
+            },
+            stock = {
+                key: tuple(sorted(options, key = lambda vehicle: vehicle.id))
+                for key, options in stock_by_year.items()
+            }
+        )
+
+
+async def _select_rows(sesh: AsyncSession, model_cls) -> Dict[str, Dict]:
+    """Select every row of the given model's table, as dictionaries of column
+    name to value, keyed by each row's ID.
+    """
+    result = await sesh.execute(select(*model_cls.__table__.columns))
+    return {row["id"]: dict(row) for row in result.mappings()}
+
+
+# The current selector tree. This is only ever replaced, never modified, so
+# readers always see a complete tree.
+_tree: Optional[SelectorTree] = None
+# The master generation the current tree was loaded from.
+_generation: Optional[int] = None
+# Coalesces concurrent reloads for the same master generation.
+_reloads = cache.SingleFlight()
+
+
+def current() -> Optional[SelectorTree]:
+    """Return the current selector tree, or None if none has been loaded."""
+    return _tree
+
+
+async def reload():
+    """Load a new selector tree from the database, then swap it in for the
+    current one, along with the master generation it was loaded from.
+    """
+    global _tree, _generation
+    generation: int = cache.master_generation.current()
+    async with database.async_read_session() as sesh:
+        new_tree: SelectorTree = await SelectorTree.load(sesh)
+    _tree = new_tree
+    _generation = generation
+    log.debug("selector tree reloaded for generation %d; %s"
+              % (generation, new_tree.count(),))
+
+
+async def ensure_current():
+    """Reload the selector tree if it isn't from the current master
+    generation. Every caller arriving during a reload awaits that reload,
+    rather than serving the previous tree or starting their own.
+    """
+    generation: int = cache.master_generation.current()
+    if _tree is None or _generation != generation:
+        await _reloads.run(generation, reload)
@@ -5,26 +5,199 @@ import os
 import pathlib
 import aiofiles
 
-from typing import Optional, Union
+from collections.abc import AsyncGenerator
+from typing import Any, Dict, List, Optional, Set, Union
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import config, database, datamodels as data
 from app.logger import log
 
+from . import jsonstream
+
 
 async def import_vehicles_from(
     sesh: AsyncSession,
-    input_: Optional[Union[str, pathlib.Path]] = None
+    input_: Optional[Union[str, pathlib.Path]] = None,
+    *,
+    differential: bool = True,
+    delete: bool = False,
+    bulk: bool = True,
+    chunk_size: Optional[int] = None
 ) -> bool:
     """Given an input; either a path or a string that is a path, read the
     vehicle master data indicated and insert/upsert it all into the database,
     inserting and updating where relevant.
 
+    By default, the import is differential; only rows that are new or have
+    changed are written, and if delete is True, rows no longer in the master
+    are deleted. The number of changes to each table is logged. Otherwise, the
+    whole master is written with multi-row bulk upserts in chunks of chunk size
+    rows, or if bulk is also False, each object is upserted individually.
+
+    Unless each object is upserted individually, the master is streamed; each
+    type and make is read, validated and written in turn, so the whole master
+    is never held in memory. Types must precede makes in the master, otherwise
+    UnknownVehicleTypeException is raised. A differential import always writes
+    in bulk, so bulk must not be False unless differential is too.
+
     This function will return a boolean indicating success.
     """
-    vehicles: data.Vehicles = await read_vehicles_from(input_)
-    return await database.update_vehicles(sesh, vehicles)
+    if differential and not bulk:
+        raise ValueError("a differential import always writes in bulk")
+    if not differential and not bulk:
+        vehicles: data.Vehicles = await read_vehicles_from(input_)
+        return await database.update_vehicles(sesh, vehicles)
+    # otherwise, stream the master and write each make as it is read.
+    diff: Optional[MasterDiff] = \
+        await MasterDiff.load(sesh) if differential else None
+    type_ids: Set[str] = set()
+    async for item in stream_vehicles_from(input_):
+        if isinstance(item, data.VehicleType):
+            type_ids.add(item.type_id)
+            rows = database.flatten_types([item])
+        else:
+            for model in item.models:
+                if model.type_id not in type_ids:
+                    raise database.errors.UnknownVehicleTypeException(
+                        item.id, model.type_id)
+            rows = database.flatten_makes([item])
+        if diff is not None:
+            await diff.apply(sesh, rows, chunk_size = chunk_size)
+        else:
+            await database.write_master_rows(sesh, rows,
+                chunk_size = chunk_size)
+    if diff is not None:
+        changes = await diff.finish(sesh, delete = delete,
+            chunk_size = chunk_size)
+        for table_name, table_changes in changes.items():
+            log.info("%s: %d inserted, %d updated, %d deleted, %d unchanged"
+                     % (table_name, table_changes.inserted, table_changes.updated,
+                        table_changes.deleted, table_changes.unchanged,))
+        if not any(table_changes.inserted or table_changes.updated or
+                   table_changes.deleted for table_changes in changes.values()) \
+            and await database.read_tables_populated(sesh):
+            # nothing changed, so the read tables are already up to date.
+            return True
+    # rebuild the read tables from the master tables we've just written.
+    await database.refresh_read_tables(sesh)
+    return True
+
+
+class MasterDiff():
+    """Tracks the difference between the master tables as they are stored
+    in the database, and the rows of a master being imported. Rows of the
+    master can be applied in any number of batches; only those rows that are
+    new or changed will be written, and when finished, rows not seen in any
+    batch can be deleted.
+    """
+    def __init__(self, existing: Dict[str, Dict[str, str]]):
+        # table name -> row ID -> content hash, as currently stored.
+        self._existing = existing
+        # table name -> IDs of all rows seen in the master so far.
+        self._seen: Dict[str, set] = {
+            table_name: set() for table_name in existing.keys()
+        }
+        self.changes: Dict[str, data.TableChanges] = {
+            table_name: data.TableChanges() for table_name in existing.keys()
+        }
+
+    @classmethod
+    async def load(cls, sesh: AsyncSession) -> "MasterDiff":
+        """Create a new diff against the master tables currently stored."""
+        return cls(await database.load_master_hashes(sesh))
+
+    async def apply(
+        self,
+        sesh: AsyncSession,
+        rows: Dict[str, List[Dict[str, Any]]],
+        *,
+        chunk_size: Optional[int] = None
+    ):
+        """Write only the new and changed rows from the given dictionary of
+        table name to rows. This function will not commit.
+        """
+        changed_rows: Dict[str, List[Dict[str, Any]]] = {}
+        for model_cls in database.MASTER_MODELS:
+            table = model_cls.__table__
+            existing = self._existing[table.name]
+            changes = self.changes[table.name]
+            # collapse repeated IDs first, the last occurrence wins.
+            table_rows = {row["id"]: row for row in rows.get(table.name, [])}
+            for row_id, row in table_rows.items():
+                self._seen[table.name].add(row_id)
+                row_hash = database.hash_master_row(table, row)
+                existing_hash = existing.get(row_id, None)
+                if existing_hash == row_hash:
+                    changes.unchanged += 1
+                    continue
+                if existing_hash is None:
+                    changes.inserted += 1
+                else:
+                    changes.updated += 1
+                existing[row_id] = row_hash
+                changed_rows.setdefault(table.name, []).append(row)
+        await database.write_master_rows(sesh, changed_rows,
+            chunk_size = chunk_size)
+
+    async def finish(
+        self,
+        sesh: AsyncSession,
+        *,
+        delete: bool = False,
+        chunk_size: Optional[int] = None
+    ) -> Dict[str, data.TableChanges]:
+        """Finish this diff. If delete is True, every stored row that was not
+        seen in any applied batch is deleted. Returns the changes made to each
+        table. This function will not commit.
+        """
+        if delete:
+            stale_ids: Dict[str, List[str]] = {
+                table_name: [row_id for row_id in existing.keys()
+                             if row_id not in self._seen[table_name]]
+                for table_name, existing in self._existing.items()
+            }
+            num_deleted = await database.delete_master_rows(sesh, stale_ids,
+                chunk_size = chunk_size)
+            for table_name, deleted in num_deleted.items():
+                self.changes[table_name].deleted = deleted
+        return self.changes
+
+
+async def diff_update_vehicles(
+    sesh: AsyncSession,
+    vehicles: data.Vehicles,
+    *,
+    delete: bool = False,
+    chunk_size: Optional[int] = None
+) -> Dict[str, data.TableChanges]:
+    """Compare the given vehicles container against the master tables as
+    currently stored, then write only rows that are new or have changed. If
+    delete is True, stored rows that are no longer in the container are also
+    deleted. Returns the changes made to each table. This function will not
+    commit.
+    """
+    diff = await MasterDiff.load(sesh)
+    await diff.apply(sesh, database.flatten_vehicles(vehicles),
+        chunk_size = chunk_size)
+    return await diff.finish(sesh, delete = delete, chunk_size = chunk_size)
+
+
+async def stream_vehicles_from(
+    input_: Optional[Union[str, pathlib.Path]] = None
+) -> AsyncGenerator[Union[data.VehicleType, data.VehicleMake], None]:
+    """Given an input; either a path or a string that is a path, stream the
+    vehicle master data indicated, yielding each vehicle type and then each
+    vehicle make (including all its models) as it is read and validated. If
+    input is none, the best source file is determined based on current
+    environment.
+    """
+    path: pathlib.Path = _resolve_master_path(input_)
+    async for key, value in jsonstream.stream_arrays(path, ("types", "makes",)):
+        if key == "types":
+            yield data.VehicleType.model_validate(value)
+        else:
+            yield data.VehicleMake.model_validate(value)
 
 
 async def read_vehicles_from(
@@ -34,6 +207,21 @@ async def read_vehicles_from(
     return that as a vehicles container. If input is none, the best source
     file is determined based on current environment.
     """
+    path: pathlib.Path = _resolve_master_path(input_)
+    # now parse contents as a vehicles container.
+    async with aiofiles.open(path, mode = "r") as r:
+        contents: str = await r.read()
+        return data.Vehicles\
+            .model_validate_json(contents)
+
+
+def _resolve_master_path(
+    input_: Optional[Union[str, pathlib.Path]] = None
+) -> pathlib.Path:
+    """Given an input; either a path or a string that is a path, return it
+    as a path to a file. If input is none, the vehicles.json file within the
+    current master directory is used.
+    """
     if input_ is None:
         # no input explicitly given, try to use current master directory, then
         # the vehicles.json filename.
@@ -48,8 +236,4 @@ async def read_vehicles_from(
     if not path.is_file():
         raise Exception("failed to import cars from '%s', that is not a file."
                         % input_)
-    # now parse contents as a vehicles container.
-    async with aiofiles.open(path, mode = "r") as r:
-        contents: str = await r.read()
-        return data.Vehicles\
-            .model_validate_json(contents)
\ No newline at end of file
+    return path
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""Warming up a freshly started worker, such that its first requests don't
+pay for cold connection pools, uncompiled statements and empty caches. The
+worker reports itself not ready until its warm-up finishes, so a load
+balancer can hold traffic back until then. Should the warm-up fail, the worker
+keeps reporting itself not ready, along with the failure.
+"""
+import asyncio
+import time
+
+from typing import Any, Dict, List, Optional
+
+from fastapi_pagination.api import set_page, set_params
+
+from app import config, database, utility as util
+from app.data import logos, search, selector
+from app.logger import log
+from app.routes import schemas
+
+PageResponse = util.make_page_response()
+
+# Set once the warm-up has finished, or if there is none.
+_ready: bool = False
+# Why the warm-up failed, if it did.
+_error: Optional[str] = None
+_task: Optional[asyncio.Task] = None
+
+
+def is_ready() -> bool:
+    """Return True if this worker has finished warming up."""
+    return _ready
+
+
+def error() -> Optional[str]:
+    """Return why this worker failed to warm up, or None if it didn't."""
+    return _error
+
+
+async def warm_selector() -> Dict[str, int]:
+    """Run each selector level's query builder once, down the selector by its
+    first options, both paginated and by keyset, such that every statement is
+    compiled and cached. The first page of makes, and of every make's types,
+    are preloaded into the selector cache.
+
+    Returns a dictionary of route to the number of options found.
+    """
+    params = PageResponse.__params_type__(page = 1, size = config.DEFAULT_NUM_PER_PAGE)
+    num_options: Dict[str, int] = {}
+    args: List[Any] = []
+    async with database.async_read_session() as sesh:
+        for route, item_type, build_query, param, attribute in \
+            selector.SELECTOR_LEVELS:
+            # paginate just as the route does, so the page is the same one cached.
+            with set_page(PageResponse[item_type]), set_params(params):
+                await database.paginate_selector(sesh, route, build_query, *args)
+            await database.paginate_keyset(sesh, route, item_type, build_query,
+                *args, size = config.DEFAULT_NUM_PER_PAGE)
+            options = await database.select_selector_options(
+                sesh, route, item_type, build_query, *args)
+            num_options[route] = len(options)
+            if route == "makes":
+                with set_page(PageResponse[schemas.VehicleTypeResponse]), \
+                    set_params(params):
+                    for make in options:
+                        await database.paginate_selector(sesh, "types",
+                            database.build_type_query, make.id)
+            if param is None or not options:
+                break
+            args.append(getattr(options[0], attribute))
+        # build the search index too.
+        await search.current(sesh)
+    return num_options
+
+
+async def _open_pools() -> Dict[str, int]:
+    """Open the connection pools to their minimum size. Should the warm-up be
+    cancelled meanwhile, the pools are still opened in full before it stops,
+    so no connection is left half open as the database is closed.
+    """
+    opening: asyncio.Future = asyncio.ensure_future(database.open_pools())
+    try:
+        return await asyncio.shield(opening)
+    except asyncio.CancelledError:
+        await asyncio.wait([opening])
+        raise
+
+
+async def warm_up():
+    """Warm this worker up; open the connection pools to their minimum size,
+    run every selector query once, preload makes, types and logos, then mark
+    the worker ready. Should warming up fail, the worker isn't marked ready,
+    and the failure is kept to be reported instead.
+    """
+    global _ready, _error
+    started: float = time.perf_counter()
+    try:
+        num_opened: Dict[str, int] = await _open_pools()
+        num_options: Dict[str, int] = await warm_selector()
+        await logos.reload()
+        log.debug("warmed up in %.1fms; connections %s, options %s"
+                  % ((time.perf_counter() - started) * 1000, num_opened, num_options,))
+    except Exception as e:
+        log.error("failed to warm up; %s" % str(e))
+        _error = str(e) or type(e).__name__
+        return
+    _ready = True
+
+
+def start():
+    """Start warming this worker up in the background, if warm-up is enabled.
+    Otherwise, the worker is ready straight away.
+    """
+    global _ready, _error, _task
+    _error = None
+    if not config.WARMUP_ENABLED:
+        _ready = True
+        return
+    _ready = False
+    _task = asyncio.get_running_loop().create_task(warm_up())
+
+
+async def stop():
+    """Cancel the warm-up, if it is still running."""
+    global _task
+    if _task is not None and not _task.done():
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+    _task = None
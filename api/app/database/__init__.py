@@ -1,15 +1,33 @@
 """Global database functionality defined here."""
-from collections.abc import AsyncGenerator
-from typing import Any
+import base64
+import binascii
+import contextlib
+import decimal
+import hashlib
+import json
 
-from sqlalchemy import select, and_, or_
-from sqlalchemy.ext.asyncio import AsyncSession
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
 
-from app import datamodels as data
+from fastapi_pagination.api import create_page, resolve_params
+from fastapi_pagination.bases import AbstractPage
+from fastapi_pagination.ext.sqlalchemy import paginate
+from pydantic import BaseModel
+from sqlalchemy import (
+    Connection, Numeric, Select, Table, delete, func, inspect, select,
+    text, tuple_, and_, or_
+)
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.schema import DDL, CreateColumn
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.pool import QueuePool
+
+from app import cache, config, datamodels as data
 from app.logger import log
 
-from . import errors, compat
-from .session import async_engine, async_session
+from . import errors, compat, session
+from .session import async_engine, async_engine_counters, async_session, \
+    async_read_session, pool_stats
 from .basemodel import Model
 from .models import *
 from .crud import *
@@ -22,9 +40,172 @@ async def init_database():
         pass
 
 
+def ensure_columns(conn: Connection) -> List[str]:
+    """Ensure every nullable column declared on the models exists on the
+    database the given (sync) connection is connected to, adding any that are
+    missing; create_all only creates columns alongside new tables. Columns
+    that can't be null can't be added this way, and are left alone.
+
+    Returns the names of any columns that had to be added.
+    """
+    added: List[str] = []
+    for table in Model.metadata.sorted_tables:
+        existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            log.info("adding missing column '%s' to '%s'" % (column.name, table.name))
+            # compiled as ddl, so identifiers are quoted for the dialect.
+            column_ddl: str = str(CreateColumn(column).compile(dialect = conn.dialect))
+            conn.execute(DDL("ALTER TABLE %%(fullname)s ADD COLUMN %s"
+                             % column_ddl.replace("%", "%%")).against(table))
+            added.append("%s.%s" % (table.name, column.name,))
+    return added
+
+
+def ensure_indexes(conn: Connection) -> List[str]:
+    """Ensure every index declared on the models exists on the database the
+    given (sync) connection is connected to, creating any that are missing;
+    create_all only creates indexes alongside new tables. Then confirm they
+    all exist, raising an exception naming any that still don't.
+
+    Returns the names of any indexes that had to be created.
+    """
+    created: List[str] = []
+    for table in Model.metadata.sorted_tables:
+        existing = {index["name"] for index in inspect(conn).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                log.info("creating missing index '%s' on '%s'"
+                         % (index.name, table.name))
+                index.create(conn)
+                created.append(index.name)
+    for table in Model.metadata.sorted_tables:
+        existing = {index["name"] for index in inspect(conn).get_indexes(table.name)}
+        missing = [index.name for index in table.indexes
+                   if index.name not in existing]
+        if missing:
+            raise Exception("table '%s' is missing indexes: %s"
+                            % (table.name, ", ".join(missing)))
+    return created
+
+
+async def explain_query(sesh: AsyncSession, query: Select) -> Tuple[List[str], bool]:
+    """Explain how the database would execute the given query. Returns a
+    tuple of the plan as lines of text, and whether any table in the plan is
+    read with a full scan rather than through an index. Only sqlite and mysql
+    are supported.
+    """
+    dialect = sesh.bind.dialect
+    sql: str = str(query.compile(dialect = dialect,
+        compile_kwargs = {"literal_binds": True}))
+    if dialect.name == "sqlite":
+        result = await sesh.execute(text("EXPLAIN QUERY PLAN " + sql))
+        plan: List[str] = [row.detail for row in result]
+        # sqlite reports 'SEARCH table USING INDEX' for an index lookup, and
+        # 'SCAN table' for a full scan; even 'SCAN table USING INDEX' walks
+        # the whole index, such as to produce the order.
+        uses_scan: bool = any(line.startswith("SCAN") for line in plan)
+    elif dialect.name in ("mysql", "mariadb"):
+        result = await sesh.execute(text("EXPLAIN " + sql))
+        rows = result.mappings().all()
+        plan = ["%s: %s using %s" % (row["table"], row["type"], row["key"])
+                for row in rows]
+        uses_scan = any(row["type"] == "ALL" for row in rows)
+    else:
+        raise NotImplementedError("can't explain queries for dialect '%s'"
+                                  % dialect.name)
+    return plan, uses_scan
+
+
+# The selector routes whose queries may read a table with a full scan; the
+# makes query has no criteria at all.
+SCAN_ALLOWED_ROUTES = ("makes",)
+
+
+async def sample_selector_args(sesh: AsyncSession) -> Dict[str, Tuple]:
+    """Find a year model with vehicles, and return a dictionary of each
+    selector route to the args of its query builder leading to it.
+    """
+    result = await sesh.execute(
+        select(VehicleYearModel, VehicleModel)
+        .join(VehicleModel, VehicleModel.id == VehicleYearModel.vehicle_model_id)
+        .join(Vehicle, Vehicle.vehicle_year_model_id == VehicleYearModel.id)
+        .limit(1))
+    year_model, model = result.one()
+    return {
+        "makes": (),
+        "types": (model.vehicle_make_id,),
+        "models": (model.vehicle_make_id, model.type_id,),
+        "years": (model.vehicle_make_id, model.type_id, model.id,),
+        "stock": (model.vehicle_make_id, model.type_id, model.id, year_model.year,)
+    }
+
+
+async def explain_selector_queries(
+    sesh: AsyncSession
+) -> Dict[str, Tuple[List[str], bool]]:
+    """Explain every selector query, as its route would run it, for a sample
+    selection. Returns a dictionary of route to its plan as lines of text,
+    and whether it reads a table with a full scan where its route may not.
+    """
+    explained: Dict[str, Tuple[List[str], bool]] = {}
+    for route, args in (await sample_selector_args(sesh)).items():
+        query: Select = SELECTOR_QUERY_BUILDERS[route](*args)\
+            .order_by(*KEYSET_ORDERS[route])
+        if config.SELECTOR_PROJECTED_READS:
+            query = project_selector_query(route, query)
+        plan, uses_scan = await explain_query(sesh, query)
+        explained[route] = (plan, uses_scan and route not in SCAN_ALLOWED_ROUTES,)
+    return explained
+
+
 async def close_database():
     """Properly shut the database connection down."""
     await async_engine.dispose()
+    for read_engine in session.read_router.replicas:
+        await read_engine.engine.dispose()
+
+
+async def open_pools() -> Dict[str, int]:
+    """Open each engine's connection pool to its minimum size, by checking
+    out that many connections at once then returning them all. Pools that
+    don't queue connections are opened with a single connection. An engine
+    that can't be connected to is skipped; a replica is also marked unhealthy.
+
+    Returns a dictionary of engine name to the number of connections opened.
+    """
+    engines: List[Tuple[str, AsyncEngine, Any]] = [("primary", async_engine, None,)]
+    for read_engine in session.read_router.replicas:
+        engines.append((read_engine.name, read_engine.engine, read_engine,))
+    num_opened: Dict[str, int] = {}
+    for name, engine, read_engine in engines:
+        num_connections: int = engine.pool.size() \
+            if isinstance(engine.pool, QueuePool) else 1
+        try:
+            async with contextlib.AsyncExitStack() as stack:
+                for _ in range(num_connections):
+                    await stack.enter_async_context(engine.connect())
+        except (OperationalError, InterfaceError) as e:
+            if read_engine is not None:
+                session.read_router.mark_unhealthy(read_engine, e)
+            else:
+                log.warning("failed to open pool for %s; %s" % (name, str(e),))
+            continue
+        num_opened[name] = num_connections
+    return num_opened
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Return the current state and counters of each engine's connection
+    pool, keyed by the engine's name.
+    """
+    stats: Dict[str, Dict[str, Any]] = {
+        "primary": pool_stats(async_engine, async_engine_counters)
+    }
+    for read_engine in session.read_router.replicas:
+        stats[read_engine.name] = pool_stats(read_engine.engine, read_engine.counters)
+    return stats
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, Any]:
@@ -33,6 +214,16 @@ async def get_session() -> AsyncGenerator[AsyncSession, Any]:
         yield sesh
 
 
+async def get_read_session() -> AsyncGenerator[AsyncSession, Any]:
+    """Generate and yield an async database session for reads only. No
+    connection is checked out until the session's first statement, each
+    statement runs in autocommit mode, and its connection is released as soon
+    as it finishes.
+    """
+    async with async_read_session() as sesh:
+        yield sesh
+
+
 async def find_vehicle_make(
     sesh: AsyncSession,
     make_id: str
@@ -43,6 +234,238 @@ async def find_vehicle_make(
     return await vehicle_makes.get_by_id(sesh, make_id)
 
 
+async def paginate_selector(
+    sesh: AsyncSession,
+    route: str,
+    build_query: Callable[..., Select],
+    *args: Any
+) -> AbstractPage:
+    """Paginate the query built by calling build query with the given args,
+    in the route's keyset order, for the current page parameters. Pages are
+    cached per route, args and page parameters until the master changes;
+    first in this process, then in the cache shared by all workers. The query
+    is only built and executed if neither has the page, and identical
+    concurrent misses are coalesced into a single query.
+    """
+    def _build_query() -> Select:
+        # ordered, so pages are stable and match every other read path.
+        query: Select = build_query(*args).order_by(*KEYSET_ORDERS[route])
+        if config.SELECTOR_PROJECTED_READS:
+            return project_selector_query(route, query)
+        return query
+    params = resolve_params()
+    generation: int = cache.master_generation.current()
+    cache_key = (generation, route, args, params.page, params.size,)
+    if not config.SELECTOR_CACHE_ENABLED:
+        return await coalesce_selector(("page",) + cache_key,
+            lambda: paginate(sesh, _build_query()))
+    page: Optional[AbstractPage] = cache.selector_cache.get(cache_key)
+    if page is not None:
+        return page
+
+    async def _load_page() -> AbstractPage:
+        page: Optional[AbstractPage] = None
+        shared_key: str = json.dumps([route, args, params.page, params.size])
+        if config.SHARED_CACHE_ENABLED:
+            page_json: Optional[bytes] = \
+                cache.shared_selector_cache.get(shared_key, generation)
+            if page_json is not None:
+                # rebuild the page from the items and total another worker saved.
+                page_data: Dict[str, Any] = json.loads(page_json)
+                page = create_page(page_data["items"],
+                    total = page_data["total"], params = params)
+        if page is None:
+            page = await paginate(sesh, _build_query())
+            page_json = page.model_dump_json(include = {"items", "total"})\
+                .encode("utf-8")
+            if config.SHARED_CACHE_ENABLED:
+                cache.shared_selector_cache.set(shared_key, generation, page_json)
+        cache.selector_cache.set(cache_key, page, len(page_json))
+        return page
+    return await coalesce_selector(("page",) + cache_key, _load_page)
+
+
+async def coalesce_selector(key: Tuple, load: Callable[[], Awaitable[Any]]) -> Any:
+    """Return the result of awaiting the given load function. If enabled,
+    identical concurrent selector reads in this process, identified by the
+    given key, are coalesced into a single flight, and all share the result
+    of the first. The key must include the master generation.
+    """
+    if not config.SELECTOR_COALESCING_ENABLED:
+        return await load()
+    return await cache.selector_flights.run(key, load)
+
+
+# For reads, the only columns each selector route's response needs. When
+# projected, selector queries select just these rather than whole entities.
+PROJECTIONS = {
+    "makes": (VehicleMake.id, VehicleMake.name,),
+    "types": (VehicleMakeType.type_id.label("id"), VehicleMakeType.name,
+              VehicleMakeType.description,),
+    "models": (VehicleModel.id, VehicleModel.name, VehicleModel.vehicle_make_id,
+               VehicleModel.type_id,),
+    "years": (VehicleYearModel.id, VehicleYearModel.vehicle_make_id,
+              VehicleYearModel.vehicle_model_id, VehicleYearModel.year,),
+    "stock": (VehicleStock.id, VehicleStock.vehicle_year_model_id,
+              VehicleStock.motor_type, VehicleStock.trans_type,
+              VehicleStock.num_gears, VehicleStock.displacement,
+              VehicleStock.version, VehicleStock.induction, VehicleStock.badge,
+              VehicleStock.fuel_type, VehicleStock.power, VehicleStock.elec_type,
+              VehicleStock.title, VehicleStock.year_model_spec,)
+}
+
+
+def project_selector_query(route: str, query: Select) -> Select:
+    """Return the given selector route's query, selecting only the columns
+    its response needs, as plain rows rather than mapped instances.
+    """
+    return query.with_only_columns(*PROJECTIONS[route])
+
+
+# For keyset pagination, the columns each selector route's query is ordered
+# by. The last column must be unique, so that the order is total.
+KEYSET_ORDERS = {
+    "makes": (VehicleMake.name, VehicleMake.id,),
+    "types": (VehicleMakeType.name, VehicleMakeType.type_id,),
+    "models": (VehicleModel.name, VehicleModel.id,),
+    "years": (VehicleYearModel.year, VehicleYearModel.id,),
+    "stock": (VehicleStock.id,)
+}
+
+
+async def paginate_keyset(
+    sesh: AsyncSession,
+    route: str,
+    item_type: Type[BaseModel],
+    build_query: Callable[..., Select],
+    *args: Any,
+    cursor: Optional[str] = None,
+    size: int = 25,
+    include_total: bool = False
+) -> Tuple[List[BaseModel], Optional[str], Optional[int]]:
+    """Paginate the query built by calling build query with the given args,
+    by keyset rather than by offset. The query is ordered by the route's
+    keyset order, and only rows after the given cursor are selected, so every
+    page costs the same regardless of how deep it is. If reads are
+    projected, only the columns the route's response needs are selected. The
+    total is only counted if include total is True.
+
+    Returns a tuple of the page's items as the given item type, the cursor
+    for the next page or None if this is the last, and the total or None.
+    Raises InvalidCursorException if the cursor can't be decoded. Identical
+    concurrent pages are coalesced.
+    """
+    return await coalesce_selector(
+        ("keyset", cache.master_generation.current(), route, item_type, args,
+         cursor, size, include_total,),
+        lambda: _paginate_keyset(sesh, route, item_type, build_query, *args,
+            cursor = cursor, size = size, include_total = include_total)
+    )
+
+
+async def _paginate_keyset(
+    sesh: AsyncSession,
+    route: str,
+    item_type: Type[BaseModel],
+    build_query: Callable[..., Select],
+    *args: Any,
+    cursor: Optional[str],
+    size: int,
+    include_total: bool
+) -> Tuple[List[BaseModel], Optional[str], Optional[int]]:
+    order_by = KEYSET_ORDERS[route]
+    query: Select = build_query(*args)
+    total: Optional[int] = None
+    if include_total:
+        total_result = await sesh.execute(
+            select(func.count()).select_from(query.subquery()))
+        total = total_result.scalar()
+    page_query: Select = query.order_by(*order_by).limit(size + 1)
+    if cursor is not None:
+        page_query = page_query.where(
+            tuple_(*order_by) > tuple_(*decode_cursor(cursor, len(order_by))))
+    # the keyset value of each order column is read from the row by this key;
+    # projected columns may be labelled differently to the column they hold.
+    row_keys: Dict[str, str] = {column.key: column.key for column in order_by}
+    if config.SELECTOR_PROJECTED_READS:
+        for column in PROJECTIONS[route]:
+            row_keys[getattr(column, "element", column).key] = column.key
+        result = await sesh.execute(project_selector_query(route, page_query))
+        rows: List[Any] = list(result.all())
+    else:
+        result = await sesh.execute(page_query)
+        rows = list(result.scalars().all())
+    next_cursor: Optional[str] = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(
+            [getattr(rows[-1], row_keys[column.key]) for column in order_by])
+    # validate within the session, should any attribute need loading.
+    items: List[BaseModel] = await sesh.run_sync(
+        lambda _: [item_type.model_validate(row) for row in rows])
+    return items, next_cursor, total
+
+
+async def select_selector_options(
+    sesh: AsyncSession,
+    route: str,
+    item_type: Type[BaseModel],
+    build_query: Callable[..., Select],
+    *args: Any
+) -> List[BaseModel]:
+    """Select every option for the given selector route, as the given item
+    type, from the query built by calling build query with the given args.
+    Options are in the route's keyset order; the in-memory selector tree is
+    sorted the same way, so the first option is the same whichever serves
+    the selector. Identical concurrent selections are coalesced.
+    """
+    return await coalesce_selector(
+        ("options", cache.master_generation.current(), route, item_type, args,),
+        lambda: _select_selector_options(sesh, route, item_type, build_query,
+            *args)
+    )
+
+
+async def _select_selector_options(
+    sesh: AsyncSession,
+    route: str,
+    item_type: Type[BaseModel],
+    build_query: Callable[..., Select],
+    *args: Any
+) -> List[BaseModel]:
+    query: Select = build_query(*args).order_by(*KEYSET_ORDERS[route])
+    if config.SELECTOR_PROJECTED_READS:
+        result = await sesh.execute(project_selector_query(route, query))
+        rows: List[Any] = list(result.all())
+    else:
+        result = await sesh.execute(query)
+        rows = list(result.scalars().all())
+    # validate within the session, should any attribute need loading.
+    return await sesh.run_sync(
+        lambda _: [item_type.model_validate(row) for row in rows])
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Encode the given keyset values as an opaque cursor."""
+    return base64.urlsafe_b64encode(
+        json.dumps(values, default = str).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, num_values: int) -> List[Any]:
+    """Decode keyset values from the given opaque cursor. There must be
+    exactly num values values, each a string or number. Raises
+    InvalidCursorException otherwise.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise errors.InvalidCursorException(cursor) from e
+    if not isinstance(values, list) or len(values) != num_values or \
+        not all(isinstance(value, (str, int, float,)) for value in values):
+        raise errors.InvalidCursorException(cursor)
+    return values
+
+
 def build_make_query():
     """Build a query for a selection of VehicleMake."""
     return (
@@ -51,22 +474,13 @@ def build_make_query():
 
 
 def build_type_query(make_id: str):
-    """Build a query for a selection of VehicleTypes."""
+    """Build a query for a selection of VehicleTypes, for a make. This reads
+    only the make type read table.
+    """
     return (
-        select(VehicleType)
-        .join(
-            VehicleModel,
-            VehicleModel.type_id == VehicleType.id
-        )
-        .join(
-            VehicleMake,
-            VehicleMake.id == VehicleModel.vehicle_make_id
-        )
+        select(VehicleMakeType)
         .where(
-            VehicleMake.id == make_id
-        )
-        .group_by(
-            VehicleType.id
+            VehicleMakeType.vehicle_make_id == make_id
         )
     )
 
@@ -110,32 +524,371 @@ def build_vehicle_query(
     model_id: str,
     year: int
 ):
-    """Build a query for a selection of Vehicles."""
+    """Build a query for a selection of Vehicles. This reads only the stock
+    read table, in which each vehicle's make, model, year and title are
+    already inlined.
+    """
     return (
         select(
-            Vehicle
+            VehicleStock
         )
+        .where(
+            and_(
+                VehicleStock.vehicle_make_id == make_id,
+                VehicleStock.type_id == type_id,
+                VehicleStock.vehicle_model_id == model_id,
+                VehicleStock.year == year
+            )
+        )
+    )
+
+
+# Each selector route's query builder.
+SELECTOR_QUERY_BUILDERS = {
+    "makes": build_make_query,
+    "types": build_type_query,
+    "models": build_model_query,
+    "years": build_year_model_query,
+    "stock": build_vehicle_query
+}
+
+
+async def read_tables_populated(sesh: AsyncSession) -> bool:
+    """Return True if the read tables have been built at least once."""
+    result = await sesh.execute(select(select(VehicleStock.id).exists()))
+    return result.scalar()
+
+
+async def refresh_read_tables(
+    sesh: AsyncSession,
+    *,
+    chunk_size: Optional[int] = None
+) -> Dict[str, data.TableChanges]:
+    """Bring the denormalised read tables, vehicle make type and vehicle
+    stock, up to date with the master tables. Each table's rows are compared
+    against the rows the master tables now derive, and only those that are
+    new or changed are upserted, and only those no longer derived are
+    deleted; changing one vehicle writes just that vehicle's row. This must be
+    called after any import that changes the master tables. This function
+    will not commit.
+
+    Returns the changes made to each read table.
+    """
+    if chunk_size is None:
+        chunk_size = config.BULK_UPSERT_CHUNK_SIZE
+    log.debug("refreshing read tables...")
+    make_type_source: Select = select(
+        VehicleModel.vehicle_make_id.label("vehicle_make_id"),
+        VehicleType.id.label("type_id"),
+        VehicleType.name.label("name"),
+        VehicleType.description.label("description")
+    ) \
+        .join(
+            VehicleType,
+            VehicleType.id == VehicleModel.type_id
+        ) \
+        .distinct()
+    stock_columns = [
+        "id", "vehicle_make_id", "type_id", "vehicle_model_id",
+        "vehicle_year_model_id", "year", "title", "year_model_spec",
+        "motor_type", "version", "badge", "trans_type", "num_gears",
+        "displacement", "induction", "fuel_type", "power", "elec_type"
+    ]
+    stock_expressions = [
+        Vehicle.id,
+        VehicleModel.vehicle_make_id,
+        VehicleModel.type_id,
+        VehicleModel.id,
+        VehicleYearModel.id,
+        VehicleYearModel.year,
+        *[getattr(Vehicle, column) for column in stock_columns[6:]]
+    ]
+    stock_source: Select = select(
+        *[expression.label(column)
+          for column, expression in zip(stock_columns, stock_expressions)]
+    ) \
         .join(
             VehicleYearModel,
             VehicleYearModel.id == Vehicle.vehicle_year_model_id
-        )
+        ) \
         .join(
             VehicleModel,
             VehicleModel.id == VehicleYearModel.vehicle_model_id
+        ) \
+        .join(
+            VehicleMake,
+            VehicleMake.id == VehicleModel.vehicle_make_id
         )
-        .where(
-            and_(
-                VehicleModel.vehicle_make_id == make_id,
-                and_(
-                    VehicleModel.type_id == type_id,
-                    VehicleModel.id == model_id
-                )
-            )
-        )
-        .where(
-            VehicleYearModel.year == year
-        )
-    )
+    changes: Dict[str, data.TableChanges] = {}
+    for model_cls, source in ((VehicleMakeType, make_type_source,),
+                              (VehicleStock, stock_source,),):
+        table_changes = await _sync_read_table(sesh, model_cls.__table__, source,
+            chunk_size)
+        log.debug("%s: %d inserted, %d updated, %d deleted, %d unchanged"
+                  % (model_cls.__tablename__, table_changes.inserted,
+                     table_changes.updated, table_changes.deleted,
+                     table_changes.unchanged,))
+        changes[model_cls.__tablename__] = table_changes
+    await sesh.flush()
+    return changes
+
+
+async def _sync_read_table(
+    sesh: AsyncSession,
+    table: Table,
+    source: Select,
+    chunk_size: int
+) -> data.TableChanges:
+    """Make the given read table hold exactly the rows selected by the given
+    source query, whose columns are labelled as the table's, by upserting
+    rows that are new or changed, and deleting rows that aren't selected.
+    """
+    key_columns = list(table.primary_key.columns)
+    def _key(row) -> Tuple:
+        return tuple(row[column.name] for column in key_columns)
+    source_result = await sesh.execute(source)
+    wanted: Dict[Tuple, Dict[str, Any]] = {
+        _key(row): dict(row) for row in source_result.mappings()
+    }
+    existing_result = await sesh.execute(select(*table.columns))
+    existing: Dict[Tuple, Dict[str, Any]] = {
+        _key(row): dict(row) for row in existing_result.mappings()
+    }
+    changes = data.TableChanges()
+    changed_rows: List[Dict[str, Any]] = []
+    for key, row in wanted.items():
+        existing_row: Optional[Dict[str, Any]] = existing.get(key, None)
+        if existing_row == row:
+            changes.unchanged += 1
+            continue
+        if existing_row is None:
+            changes.inserted += 1
+        else:
+            changes.updated += 1
+        changed_rows.append(row)
+    stale_keys: List[Tuple] = [key for key in existing.keys() if key not in wanted]
+    dialect_name: str = sesh.bind.dialect.name
+    for idx in range(0, len(changed_rows), chunk_size):
+        await sesh.execute(compat.build_upsert(dialect_name, table,
+            changed_rows[idx:idx + chunk_size]))
+    for idx in range(0, len(stale_keys), chunk_size):
+        await sesh.execute(delete(table)
+            .where(tuple_(*key_columns).in_(stale_keys[idx:idx + chunk_size])))
+    changes.deleted = len(stale_keys)
+    return changes
+
+
+# All master data models, in the order they must be written to satisfy
+# foreign keys. Deletes must happen in the reverse of this order.
+MASTER_MODELS = (VehicleType, VehicleMake, VehicleModel, VehicleYearModel, Vehicle)
+
+# Associate each master data table with the CRUD object that manages it.
+MASTER_CRUD = {
+    VehicleType.__tablename__: vehicle_types,
+    VehicleMake.__tablename__: vehicle_makes,
+    VehicleModel.__tablename__: vehicle_models,
+    VehicleYearModel.__tablename__: vehicle_year_models,
+    Vehicle.__tablename__: vehicles
+}
+
+
+def flatten_types(
+    types: Iterable[data.VehicleType]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Flatten the given vehicle types into a dictionary of table name to
+    the rows to be written to that table.
+    """
+    return {
+        VehicleType.__tablename__: [
+            VehicleTypeCreate.model_validate(type.model_dump(by_alias = True))
+                .model_dump()
+            for type in types
+        ]
+    }
+
+
+def flatten_makes(
+    makes: Iterable[data.VehicleMake]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Flatten the given vehicle makes, and every model, year model and
+    vehicle within them, into a dictionary of table name to the rows to be
+    written to that table.
+    """
+    rows: Dict[str, List[Dict[str, Any]]] = {
+        model_cls.__tablename__: [] for model_cls in MASTER_MODELS[1:]
+    }
+    for make in makes:
+        rows[VehicleMake.__tablename__].append(VehicleMakeCreate
+            .model_validate(make.model_dump(by_alias = True)).model_dump())
+        for model in make.models:
+            rows[VehicleModel.__tablename__].append(VehicleModelCreate
+                .model_validate(model.model_dump(by_alias = True)).model_dump())
+            for year_model in model.year_models:
+                rows[VehicleYearModel.__tablename__].append(VehicleYearModelCreate
+                    .model_validate(year_model.model_dump(by_alias = True))
+                    .model_dump())
+                title: str = vehicle_title(year_model.year, make.name, model.name)
+                for vehicle in year_model.vehicles:
+                    rows[Vehicle.__tablename__].append(
+                        _flatten_vehicle(vehicle, title))
+    return rows
+
+
+def flatten_vehicles(
+    vehicles: data.Vehicles
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Flatten the entire vehicles container into a dictionary of table name
+    to the rows to be written to that table. The dictionary is ordered such
+    that tables can be written in order of iteration.
+    """
+    return {
+        **flatten_types(vehicles.types),
+        **flatten_makes(vehicles.makes)
+    }
+
+
+def vehicle_title(year: int, make_name: str, model_name: str) -> str:
+    """Return the title for a vehicle in the given year, make and model. Like
+    1994 Toyota Supra.
+    """
+    return "%d %s %s" % (year, make_name, model_name,)
+
+
+def _materialise_car(car: data.Car, title: str) -> Dict[str, Any]:
+    """Return the given car as a dictionary, along with the columns that are
+    materialised at import time; its title and year model spec.
+    """
+    return dict(car.model_dump(by_alias = True),
+        title = title,
+        year_model_spec = car.year_model_spec())
+
+
+def _flatten_vehicle(vehicle: data.Vehicle, title: str) -> Dict[str, Any]:
+    """Flatten a single vehicle, with the given title, into a row. Just like
+    upserting, only cars are supported.
+    """
+    if isinstance(vehicle, data.Car):
+        return VehicleCreate\
+            .model_validate(_materialise_car(vehicle, title)).model_dump()
+    elif isinstance(vehicle, data.Bike):
+        raise NotImplementedError
+    raise TypeError("unrecognised vehicle type '%s'" % str(type(vehicle)))
+
+
+async def write_master_rows(
+    sesh: AsyncSession,
+    rows: Dict[str, List[Dict[str, Any]]],
+    *,
+    chunk_size: Optional[int] = None
+) -> Dict[str, int]:
+    """Bulk upsert the given rows, a dictionary of table name to rows, into
+    their respective tables. Tables are written in foreign key order, each in
+    chunks of chunk size rows per statement. If chunk size is not given, the
+    configured bulk upsert chunk size is used. This function will not commit.
+
+    Returns a dictionary of table name to the number of rows written.
+    """
+    if chunk_size is None:
+        chunk_size = config.BULK_UPSERT_CHUNK_SIZE
+    num_written: Dict[str, int] = {}
+    for model_cls in MASTER_MODELS:
+        table_rows = rows.get(model_cls.__tablename__, None)
+        if not table_rows:
+            continue
+        # the master may repeat an object; just like upserting one by one,
+        # the last occurrence of each primary key wins.
+        table_rows = list({row["id"]: row for row in table_rows}.values())
+        log.debug("bulk upserting %d rows into '%s'"
+                  % (len(table_rows), model_cls.__tablename__))
+        num_written[model_cls.__tablename__] = \
+            await MASTER_CRUD[model_cls.__tablename__].bulk_upsert(
+                sesh, table_rows, chunk_size = chunk_size)
+    return num_written
+
+
+def hash_master_row(table: Table, row: Dict[str, Any]) -> str:
+    """Return a content hash for the given row of the given master table.
+    The hash covers every column of the table, and values are normalised to
+    how the database stores them, so a row read back from the database will
+    hash the same as the row that was written.
+    """
+    values: List[Any] = []
+    for column in table.columns:
+        value = row.get(column.name, None)
+        if value is not None and isinstance(column.type, Numeric):
+            # numerics come back as decimals rounded half up to the column's
+            # scale, just as the database rounds them when they are written.
+            value = str(decimal.Decimal(str(value)).quantize(
+                decimal.Decimal(10) ** -(column.type.scale or 0),
+                rounding = decimal.ROUND_HALF_UP))
+        values.append(value)
+    return hashlib.blake2b(
+        json.dumps(values, default = str).encode("utf-8"),
+        digest_size = 16
+    ).hexdigest()
+
+
+async def load_master_hashes(
+    sesh: AsyncSession
+) -> Dict[str, Dict[str, str]]:
+    """Load the primary key and content hash of every row currently stored
+    in each master table. Returns a dictionary of table name to a dictionary
+    of row ID to that row's hash.
+    """
+    hashes: Dict[str, Dict[str, str]] = {}
+    for model_cls in MASTER_MODELS:
+        table = model_cls.__table__
+        result = await sesh.execute(select(*table.columns))
+        hashes[table.name] = {
+            row["id"]: hash_master_row(table, row)
+            for row in result.mappings()
+        }
+    return hashes
+
+
+async def delete_master_rows(
+    sesh: AsyncSession,
+    ids: Dict[str, List[str]],
+    *,
+    chunk_size: Optional[int] = None
+) -> Dict[str, int]:
+    """Delete the given IDs, a dictionary of table name to IDs, from their
+    respective master tables. Tables are deleted from in reverse foreign key
+    order. This function will not commit.
+
+    Returns a dictionary of table name to the number of rows deleted.
+    """
+    if chunk_size is None:
+        chunk_size = config.BULK_UPSERT_CHUNK_SIZE
+    num_deleted: Dict[str, int] = {}
+    for model_cls in reversed(MASTER_MODELS):
+        table_ids = ids.get(model_cls.__tablename__, None)
+        if not table_ids:
+            continue
+        log.debug("deleting %d rows from '%s'"
+                  % (len(table_ids), model_cls.__tablename__))
+        num_deleted[model_cls.__tablename__] = \
+            await MASTER_CRUD[model_cls.__tablename__].delete_many(
+                sesh, table_ids, chunk_size = chunk_size)
+    return num_deleted
+
+
+async def bulk_update_vehicles(
+    sesh: AsyncSession,
+    vehicles: data.Vehicles,
+    *,
+    chunk_size: Optional[int] = None
+) -> bool:
+    """Upsert all vehicles in the given container into the database with as
+    few statements as possible, by flattening the container into rows per
+    table and writing each table with multi-row upserts. This is the bulk
+    alternative to update_vehicles. This function will not commit.
+    """
+    rows = flatten_vehicles(vehicles)
+    num_written = await write_master_rows(sesh, rows, chunk_size = chunk_size)
+    log.debug("bulk upsert complete; %s" % num_written)
+    await refresh_read_tables(sesh)
+    return True
 
 
 async def update_vehicles(
@@ -152,6 +905,8 @@ async def update_vehicles(
     # now iterate all makes, upserting each.
     for make in vehicles.makes:
         await _upsert_make(sesh, make)
+    # finally, rebuild the read tables from everything upserted.
+    await refresh_read_tables(sesh)
     return True
 
 
@@ -197,10 +952,14 @@ async def _upsert_make(sesh: AsyncSession, make: data.VehicleMake):
     await sesh.flush()
     # now upsert all models within this make.
     for model in make.models:
-        await _upsert_model(sesh, model)
+        await _upsert_model(sesh, model, make.name)
 
 
-async def _upsert_model(sesh: AsyncSession, model: data.VehicleModel):
+async def _upsert_model(
+    sesh: AsyncSession,
+    model: data.VehicleModel,
+    make_name: str
+):
     log.debug("attempting to insert model '%s'" % model.name)
     # load a creation schema for the object.
     vehicle_model_create = VehicleModelCreate\
@@ -221,10 +980,15 @@ async def _upsert_model(sesh: AsyncSession, model: data.VehicleModel):
     await sesh.flush()
     # now upsert all year models in this model.
     for year_model in model.year_models:
-        await _upsert_year_model(sesh, year_model)
+        await _upsert_year_model(sesh, year_model, make_name, model.name)
 
 
-async def _upsert_year_model(sesh: AsyncSession, year_model: data.VehicleYearModel):
+async def _upsert_year_model(
+    sesh: AsyncSession,
+    year_model: data.VehicleYearModel,
+    make_name: str,
+    model_name: str
+):
     log.debug("attempting to insert year model '%s'" % year_model.id)
     # load a creation schema for the object.
     vehicle_year_model_create = VehicleYearModelCreate\
@@ -244,31 +1008,32 @@ async def _upsert_year_model(sesh: AsyncSession, year_model: data.VehicleYearMod
     # commit before next object.
     await sesh.flush()
     # now upsert all vehicles in this year model.
+    title: str = vehicle_title(year_model.year, make_name, model_name)
     for vehicle in year_model.vehicles:
-        await _upsert_vehicle(sesh, vehicle)
+        await _upsert_vehicle(sesh, vehicle, title)
 
 
-async def _upsert_vehicle(sesh: AsyncSession, vehicle: data.Vehicle):
+async def _upsert_vehicle(sesh: AsyncSession, vehicle: data.Vehicle, title: str):
     """Abstract between the different kinds of vehicles, and invoke the
     correct upsert logic on that basis.
     """
     log.debug("attempting to insert vehicle '%s'" % str(vehicle))
     if isinstance(vehicle, data.Car):
-        await _upsert_car(sesh, vehicle)
+        await _upsert_car(sesh, vehicle, title)
     elif isinstance(vehicle, data.Bike):
         await _upsert_bike(sesh, vehicle)
     else:
         raise TypeError("unrecognised vehicle type '%s'" % str(type(vehicle)))
     
 
-async def _upsert_car(sesh: AsyncSession, car: data.Car):
-    """Insert the given car into the database according to how cars are
-    stored. If the car already exists, update it.
+async def _upsert_car(sesh: AsyncSession, car: data.Car, title: str):
+    """Insert the given car, with the given title, into the database
+    according to how cars are stored. If the car already exists, update it.
     """
     log.debug("attempting to insert car '%s'" % car.id)
-    # load a creation schema for the object.
-    vehicle_create = VehicleCreate\
-        .model_validate(car.model_dump(by_alias = True))
+    # load a creation schema for the object, along with its materialised columns.
+    car_values: Dict[str, Any] = _materialise_car(car, title)
+    vehicle_create = VehicleCreate.model_validate(car_values)
     try:
         # within a nested transaction, we'll attempt to insert the object.
         async with sesh.begin_nested():
@@ -276,8 +1041,7 @@ async def _upsert_car(sesh: AsyncSession, car: data.Car):
                 commit = False)
     except errors.ObjectAlreadyExistsException as oaee:
         # this object already exists, we will update instead.
-        vehicle_update = VehicleUpdate\
-            .model_validate(car.model_dump(by_alias = True))
+        vehicle_update = VehicleUpdate.model_validate(car_values)
         # load an update for this object.
         await vehicles.update(sesh, car.id, vehicle_update,
             commit = False)
@@ -1,4 +1,9 @@
 """Functionality for bridging definition gaps between dialects."""
+from typing import Any, Dict, List
+
+from sqlalchemy import Table
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.sql.dml import Insert
 
 
 def check_for_unique_violation(e: Exception) -> bool:
@@ -10,4 +15,34 @@ def check_for_unique_violation(e: Exception) -> bool:
     if str(orig_arg_code).startswith("UNIQUE") or \
         orig_arg_code == 1062 or orig_arg_code == 2627:
         return True
-    return False
\ No newline at end of file
+    return False
+
+
+def build_upsert(
+    dialect_name: str,
+    table: Table,
+    rows: List[Dict[str, Any]]
+) -> Insert:
+    """Build a single multi-row insert statement for the given table and
+    rows, that will update every non primary key column where a row with the
+    same primary key already exists. The statement is specific to the given
+    dialect name; mysql uses ON DUPLICATE KEY UPDATE, while sqlite and
+    postgresql use ON CONFLICT DO UPDATE.
+    """
+    primary_keys: List[str] = [column.name for column in table.primary_key]
+    update_columns: List[str] = [column.name for column in table.columns
+                                 if column.name not in primary_keys]
+    if dialect_name in ("mysql", "mariadb"):
+        insert_stmt = mysql.insert(table).values(rows)
+        return insert_stmt.on_duplicate_key_update(
+            {column: insert_stmt.inserted[column] for column in update_columns}
+        )
+    elif dialect_name in ("sqlite", "postgresql"):
+        dialect_module = sqlite if dialect_name == "sqlite" else postgresql
+        insert_stmt = dialect_module.insert(table).values(rows)
+        return insert_stmt.on_conflict_do_update(
+            index_elements = primary_keys,
+            set_ = {column: insert_stmt.excluded[column] for column in update_columns}
+        )
+    raise NotImplementedError("bulk upsert is not supported for dialect '%s'"
+                              % dialect_name)
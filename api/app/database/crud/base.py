@@ -1,7 +1,7 @@
 """Base CRUD generic implementation - supports async"""
 import logging
 
-from typing import Any, Dict, Generic, Optional, Type, TypeVar, Union
+from typing import Any, Dict, Generic, List, Optional, Sequence, Type, TypeVar, Union
 from pydantic import BaseModel
 from sqlalchemy import select, delete, insert, func, exists, update
 from sqlalchemy.exc import IntegrityError
@@ -75,6 +75,45 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         except Exception as e:
             raise e
         
+    async def get_many(
+        self,
+        sesh: AsyncSession,
+        ids: List[Any],
+        *,
+        options: Sequence[Any] = (),
+        chunk_size: int = 500
+    ) -> List[ModelType]:
+        """Get every instance of the model type whose ID is in the given list,
+        with a single IN query per chunk of at most chunk size IDs. Instances
+        are returned in the order their IDs were first given, once each, even
+        if an ID is given more than once; IDs that don't exist are skipped.
+        The model type must have an attribute named 'id'.
+
+        Arguments
+        ---------
+        :sesh: The database session on which to query the model.
+        :ids: The IDs with which to query the model.
+
+        Keyword arguments
+        -----------------
+        :options: Loader options to apply to the query, like eager loads.
+        :chunk_size: The maximum number of IDs per statement. Default is 500.
+        """
+        try:
+            unique_ids: List[Any] = list(dict.fromkeys(ids))
+            found: Dict[Any, ModelType] = {}
+            for idx in range(0, len(unique_ids), chunk_size):
+                select_stmt = (
+                    select(self._ModelTypeCls)
+                        .where(self._ModelTypeCls.id.in_(unique_ids[idx:idx + chunk_size]))
+                        .options(*options)
+                )
+                result = await sesh.execute(select_stmt)
+                found.update((obj.id, obj,) for obj in result.unique().scalars())
+            return [found[id] for id in unique_ids if id in found]
+        except Exception as e:
+            raise e
+
     async def upsert(
         self, 
         sesh: AsyncSession, 
@@ -90,6 +129,47 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         except Exception as e:
             raise e
     
+    async def bulk_upsert(
+        self,
+        sesh: AsyncSession,
+        rows: List[Dict[str, Any]],
+        *,
+        chunk_size: int = 500,
+        commit: bool = False
+    ) -> int:
+        """Insert all given rows of model type, updating every row whose
+        primary key already exists. Rows are written in chunks of at most
+        chunk size per statement, each chunk as a single dialect-native
+        multi-row upsert. The number of rows written is returned.
+
+        Arguments
+        ---------
+        :sesh: The database session on which to upsert the rows.
+        :rows: A list of dictionaries, each mapping column names to values.
+
+        Keyword arguments
+        -----------------
+        :chunk_size: The maximum number of rows per statement. Default is 500.
+        :commit: Whether commit should be used. If False, flush will be used.
+                 Default is False.
+        """
+        try:
+            if chunk_size < 1:
+                raise ValueError("chunk size must be at least 1")
+            dialect_name: str = sesh.bind.dialect.name
+            table = self._ModelTypeCls.__table__
+            for idx in range(0, len(rows), chunk_size):
+                upsert_stmt = compat.build_upsert(
+                    dialect_name, table, rows[idx:idx + chunk_size])
+                await sesh.execute(upsert_stmt)
+            if commit:
+                await sesh.commit()
+            else:
+                await sesh.flush()
+            return len(rows)
+        except Exception as e:
+            raise e
+
     async def create(
         self, 
         sesh: AsyncSession,
@@ -192,6 +272,44 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         except Exception as e:
             raise e
     
+    async def delete_many(
+        self,
+        sesh: AsyncSession,
+        ids: List[Any],
+        *,
+        chunk_size: int = 500,
+        commit: bool = False
+    ) -> int:
+        """Delete every instance of model type whose ID is in the given list,
+        in chunks of at most chunk size IDs per statement. The model type
+        must have an 'id' attribute. The number of IDs given is returned.
+
+        Arguments
+        ---------
+        :sesh: The database session on which to delete model type.
+        :ids: The IDs of all targets to delete.
+
+        Keyword arguments
+        -----------------
+        :chunk_size: The maximum number of IDs per statement. Default is 500.
+        :commit: Whether commit should be used. If False, flush will be used.
+                 Default is False.
+        """
+        try:
+            for idx in range(0, len(ids), chunk_size):
+                delete_stmt = (
+                    delete(self._ModelTypeCls)
+                        .where(self._ModelTypeCls.id.in_(ids[idx:idx + chunk_size]))
+                )
+                await sesh.execute(delete_stmt)
+            if commit:
+                await sesh.commit()
+            else:
+                await sesh.flush()
+            return len(ids)
+        except Exception as e:
+            raise e
+
     async def delete(self, sesh: AsyncSession, id: Any, *, 
         commit: bool = False
     ) -> bool:
@@ -1,3 +1,16 @@
 class ObjectAlreadyExistsException(Exception):
     def __init__(self, obj):
-        self.obj = obj
\ No newline at end of file
+        self.obj = obj
+
+
+class InvalidCursorException(Exception):
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+
+class UnknownVehicleTypeException(Exception):
+    def __init__(self, make_id, type_id):
+        super().__init__("make '%s' has a model of type '%s', which the master "\
+                         "doesn't list before it" % (make_id, type_id,))
+        self.make_id = make_id
+        self.type_id = type_id
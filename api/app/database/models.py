@@ -5,10 +5,8 @@ from sqlalchemy import create_engine, func
 from sqlalchemy.orm import as_declarative, sessionmaker, Session
 from sqlalchemy.ext.declarative import declared_attr
 
-from sqlalchemy import String, Text, Numeric, ForeignKey, ForeignKeyConstraint
-from sqlalchemy.sql.expression import ColumnElement, cast
-from sqlalchemy.orm import relationship, Mapped, mapped_column, declared_attr
-from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy import String, Text, Numeric, ForeignKey, ForeignKeyConstraint, Index
+from sqlalchemy.orm import relationship, synonym, Mapped, mapped_column, declared_attr
 from sqlalchemy.ext.associationproxy import association_proxy, AssociationProxy
 
 from app import config, database as db
@@ -31,6 +29,12 @@ class Vehicle(db.Model):
     varying trim levels on that vehicle.
     """
     __tablename__ = "vehicle"
+    __table_args__ = (
+        # stock for a year model, in keyset order.
+        Index("ix_vehicle_year_model_id", "vehicle_year_model_id", "id"),
+        # title prefix search.
+        Index("ix_vehicle_title", "title"),
+    )
 
     # A UUID that identifies this vehicle.
     id: Mapped[str] = mapped_column(String(64), nullable = False, primary_key = True)
@@ -101,6 +105,22 @@ class Vehicle(db.Model):
         nullable = True,
         default = None
     )
+    # The vehicle's title, like 1994 Toyota Supra. Materialised from the
+    # year model, make and model by the importer; None only if the vehicle
+    # was stored before this column existed, until the next import.
+    title: Mapped[Optional[str]] = mapped_column(
+        String(255),
+        nullable = True,
+        default = None
+    )
+    # The vehicle's unique options within its year model, like RZ 3.0L T 6
+    # spd Manual. Materialised by the importer, which fails on vehicles it
+    # isn't supported for; None only if stored before this column existed.
+    year_model_spec: Mapped[Optional[str]] = mapped_column(
+        String(128),
+        nullable = True,
+        default = None
+    )
 
     # Association proxy to the vehicle's make through year model.
     make: AssociationProxy["VehicleMake"] = association_proxy("year_model", "make")
@@ -116,27 +136,15 @@ class Vehicle(db.Model):
         uselist = False
     )
 
-    @hybrid_property
-    def title(self) -> str:
-        """Return a title for this vehicle. Consists of the year, make name
-        and model name. Like 1994 Toyota Supra.
-        """
-        return "%d %s %s" % (self.year_model.year, self.make.name, self.model.name,)
-    
-    @title.inplace.expression
-    @classmethod
-    def _title(cls) -> ColumnElement[str]:
-        """Expression level title relies on joins to year model,
-        make and model.
-        """
-        return cast(VehicleYearModel.year, String) + " " \
-            + VehicleMake.name + " " \
-            + VehicleModel.name
-
 
 class VehicleYearModel(db.Model):
     """A single vehicle year model, within a model."""
     __tablename__ = "vehicle_year_model"
+    __table_args__ = (
+        # years for a make's model, and the year model for a model's year.
+        Index("ix_vehicle_year_model_make_model_year",
+              "vehicle_make_id", "vehicle_model_id", "year"),
+    )
 
     # A unique string identifying this model.
     id: Mapped[str] = mapped_column(String(64), nullable = False, primary_key = True)
@@ -173,6 +181,11 @@ class VehicleYearModel(db.Model):
 class VehicleModel(db.Model):
     """A single vehicle model, within a make."""
     __tablename__ = "vehicle_model"
+    __table_args__ = (
+        # types for a make, and models for a make's type in keyset order.
+        Index("ix_vehicle_model_make_type_name",
+              "vehicle_make_id", "type_id", "name"),
+    )
 
     # A unique string identifying this model.
     id: Mapped[str] = mapped_column(String(64), nullable = False, primary_key = True)
@@ -220,4 +233,66 @@ class VehicleMake(db.Model):
     models: Mapped[List[VehicleModel]] = relationship(
         back_populates = "make",
         uselist = True
-    )
\ No newline at end of file
+    )
+
+
+class VehicleMakeType(db.Model):
+    """A denormalised read table; each type of vehicle a make has models of,
+    with the type's details inlined. This is rebuilt from the master tables
+    by every import that changes them, and should never be written otherwise.
+    """
+    __tablename__ = "vehicle_make_type"
+
+    # The make that has models of this type.
+    vehicle_make_id: Mapped[str] = mapped_column(String(64), nullable = False, primary_key = True)
+    # The type's short name.
+    type_id: Mapped[str] = mapped_column(String(24), nullable = False, primary_key = True)
+    # Type's friendly name.
+    name: Mapped[str] = mapped_column(String(64), nullable = False)
+    # Type's description.
+    description: Mapped[str] = mapped_column(String(128), nullable = False)
+
+    # The type's short name, by the same name as on vehicle type.
+    id = synonym("type_id")
+
+
+class VehicleStock(db.Model):
+    """A denormalised read table; every vehicle, with its make, model, type
+    and year inlined alongside its own columns. This is rebuilt from the
+    master tables by every import that changes them, and should never be
+    written otherwise.
+    """
+    __tablename__ = "vehicle_stock"
+    __table_args__ = (
+        # stock for a make, type, model and year, in keyset order.
+        Index("ix_vehicle_stock_selector",
+              "vehicle_make_id", "type_id", "vehicle_model_id", "year", "id"),
+        # title prefix search.
+        Index("ix_vehicle_stock_title", "title"),
+    )
+
+    # The vehicle's UUID.
+    id: Mapped[str] = mapped_column(String(64), nullable = False, primary_key = True)
+    # The make the vehicle belongs to.
+    vehicle_make_id: Mapped[str] = mapped_column(String(64), nullable = False)
+    # The type of the model the vehicle belongs to.
+    type_id: Mapped[str] = mapped_column(String(24), nullable = False)
+    # The model the vehicle belongs to.
+    vehicle_model_id: Mapped[str] = mapped_column(String(64), nullable = False)
+    # The year model the vehicle belongs to, and its year.
+    vehicle_year_model_id: Mapped[str] = mapped_column(String(64), nullable = False)
+    year: Mapped[int] = mapped_column(nullable = False)
+    # The vehicle's title, like 1994 Toyota Supra, and unique options.
+    title: Mapped[str] = mapped_column(String(255), nullable = False)
+    year_model_spec: Mapped[Optional[str]] = mapped_column(String(128), nullable = True)
+    # All remaining columns are as on vehicle.
+    motor_type: Mapped[str] = mapped_column(String(32), nullable = False)
+    version: Mapped[Optional[str]] = mapped_column(String(64), nullable = True)
+    badge: Mapped[Optional[str]] = mapped_column(String(64), nullable = True)
+    trans_type: Mapped[Optional[str]] = mapped_column(String(24), nullable = True)
+    num_gears: Mapped[Optional[int]] = mapped_column(nullable = True)
+    displacement: Mapped[Optional[float]] = mapped_column(Numeric(3, 1), nullable = True)
+    induction: Mapped[Optional[str]] = mapped_column(String(24), nullable = True)
+    fuel_type: Mapped[Optional[str]] = mapped_column(String(24), nullable = True)
+    power: Mapped[Optional[float]] = mapped_column(Numeric(3, 1), nullable = True)
+    elec_type: Mapped[Optional[str]] = mapped_column(String(24), nullable = True)
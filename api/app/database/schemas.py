@@ -37,6 +37,8 @@ class VehicleCreate(VehicleBase):
     id: str
     type_id: str
     vehicle_year_model_id: str
+    title: Optional[str] = None
+    year_model_spec: Optional[str] = None
 
 
 class VehicleUpdate(VehicleBase):
@@ -50,6 +52,8 @@ class VehicleUpdate(VehicleBase):
     fuel_type: Optional[str] = None
     power: Optional[float] = None
     elec_type: Optional[str] = None
+    title: Optional[str] = None
+    year_model_spec: Optional[str] = None
 
 
 class VehicleYearModelBase(BaseModel):
@@ -1,12 +1,22 @@
 """Creating connections & session management for the app."""
-from sqlalchemy import URL
+import itertools
+import time
+
+from typing import Any, Dict, List, Optional, Type, Union
+
+from sqlalchemy import URL, event, make_url, pool
+from sqlalchemy.exc import InterfaceError, InvalidRequestError, OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.util import EMPTY_DICT
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     async_sessionmaker,
+    AsyncEngine,
     AsyncSession
 )
 
-from app import config
+from app import cache, config
+from app.logger import log
 
 
 if config.SQLALCHEMY_DATABASE_URI is None:
@@ -23,12 +33,294 @@ else:
     # otherwise just use configured value.
     connection_url = config.SQLALCHEMY_DATABASE_URI
 
-# create a new async engine with that URL.
-async_engine = create_async_engine(connection_url, echo = False)
+def resolve_pool_class(url: Union[str, URL]) -> Type[pool.Pool]:
+    """Return the connection pool class to use for the given URL; the one
+    configured by name, or otherwise the default for the URL's dialect.
+    """
+    if not config.SQLALCHEMY_POOLCLASS:
+        url = make_url(url)
+        return url.get_dialect().get_pool_class(url)
+    if isinstance(config.SQLALCHEMY_POOLCLASS, type):
+        return config.SQLALCHEMY_POOLCLASS
+    pool_class: Optional[Type[pool.Pool]] = \
+        getattr(pool, config.SQLALCHEMY_POOLCLASS, None)
+    if not isinstance(pool_class, type) or not issubclass(pool_class, pool.Pool):
+        raise ValueError("'%s' is not a pool class in sqlalchemy.pool"
+                         % config.SQLALCHEMY_POOLCLASS)
+    return pool_class
+
+
+def engine_options(url: Union[str, URL]) -> Dict[str, Any]:
+    """Return the keyword arguments with which to create an engine for the
+    given URL, configuring its connection pool. Sizing and timeout only apply
+    to queue pools, so are only given for those.
+    """
+    pool_class: Type[pool.Pool] = resolve_pool_class(url)
+    options: Dict[str, Any] = dict(
+        echo = False,
+        poolclass = pool_class,
+        pool_pre_ping = config.SQLALCHEMY_POOL_PRE_PING,
+        pool_recycle = config.SQLALCHEMY_POOL_RECYCLE
+    )
+    if issubclass(pool_class, pool.QueuePool):
+        options.update(
+            pool_size = config.SQLALCHEMY_POOL_SIZE,
+            max_overflow = config.SQLALCHEMY_MAX_OVERFLOW,
+            pool_timeout = config.SQLALCHEMY_POOL_TIMEOUT
+        )
+    return options
+
+
+class PoolCounters():
+    """Counts the events of an engine's connection pool since startup; new
+    connections, checkouts, checkins and connections invalidated, such as
+    those found stale by a pre ping.
+    """
+    def __init__(self, engine: AsyncEngine):
+        self.connects: int = 0
+        self.checkouts: int = 0
+        self.checkins: int = 0
+        self.invalidations: int = 0
+        event.listen(engine.sync_engine, "connect", self._on_connect)
+        event.listen(engine.sync_engine, "checkout", self._on_checkout)
+        event.listen(engine.sync_engine, "checkin", self._on_checkin)
+        event.listen(engine.sync_engine, "invalidate", self._on_invalidate)
+
+    @property
+    def in_use(self) -> int:
+        """The number of connections currently checked out."""
+        return self.checkouts - self.checkins
+
+    def _on_connect(self, *args):
+        self.connects += 1
+
+    def _on_checkout(self, *args):
+        self.checkouts += 1
+
+    def _on_checkin(self, *args):
+        self.checkins += 1
+
+    def _on_invalidate(self, *args):
+        self.invalidations += 1
+
+
+def pool_stats(engine: AsyncEngine, counters: PoolCounters) -> Dict[str, Any]:
+    """Return the current state of the given engine's connection pool, along
+    with its counters. Sizes are only reported by queue pools, and are None
+    otherwise.
+    """
+    engine_pool: pool.Pool = engine.pool
+    is_queue_pool: bool = isinstance(engine_pool, pool.QueuePool)
+    return dict(
+        pool_class = type(engine_pool).__name__,
+        size = engine_pool.size() if is_queue_pool else None,
+        max_overflow = config.SQLALCHEMY_MAX_OVERFLOW if is_queue_pool else None,
+        checked_in = engine_pool.checkedin() if is_queue_pool else None,
+        checked_out = engine_pool.checkedout() if is_queue_pool else None,
+        overflow = engine_pool.overflow() if is_queue_pool else None,
+        connects = counters.connects,
+        checkouts = counters.checkouts,
+        invalidations = counters.invalidations
+    )
+
+
+class ReadSession(Session):
+    """A session for reads only, bound to an engine in autocommit mode. No
+    connection is checked out until the first statement, and the connection
+    is released back to the pool as soon as each statement finishes; rows
+    are buffered first, so results outlive the connection. Read sessions
+    can't flush changes.
+
+    If a statement fails on a replica's connection, the replica is marked
+    unhealthy, and the statement is run again on the primary, which serves
+    the rest of the session.
+    """
+    def _run_read(self, method, statement, params, **kwargs) -> Any:
+        """Run the given Session method on the given statement, falling back
+        to the primary if the session's replica fails, then release the
+        connection.
+        """
+        try:
+            result = method(statement, params, **kwargs)
+        except (OperationalError, InterfaceError) as e:
+            read_engine: Optional[ReadEngine] = self.info.get("read_engine", None)
+            if read_engine is None or read_engine.is_primary:
+                raise e
+            self.rollback()
+            read_router.mark_unhealthy(read_engine, e)
+            self.bind = read_router.primary.engine.sync_engine
+            self.info["read_engine"] = read_router.primary
+            result = method(statement, params, **kwargs)
+        self.commit()
+        return result
+
+    def execute(self, statement, params = None, *, execution_options = EMPTY_DICT, **kwargs):
+        return self._run_read(super().execute, statement, params,
+            execution_options = dict(execution_options, prebuffer_rows = True),
+            **kwargs)
+
+    def scalar(self, statement, params = None, **kwargs):
+        return self._run_read(super().scalar, statement, params, **kwargs)
+
+    def scalars(self, statement, params = None, **kwargs):
+        return self.execute(statement, params, **kwargs).scalars()
+
+    def flush(self, objects = None):
+        if self.new or self.dirty or self.deleted:
+            raise InvalidRequestError("read sessions can't write changes!")
+
+
+class ReadEngine():
+    """An engine that reads are routed to; either the primary, or a replica.
+    Its connections are always in autocommit mode, so there is never a
+    transaction to begin or commit.
+    """
+    def __init__(
+        self,
+        name: str,
+        engine: AsyncEngine,
+        counters: PoolCounters,
+        is_primary: bool
+    ):
+        self.name = name
+        self.is_primary = is_primary
+        self.engine = engine
+        self.counters = counters
+        self.sessionmaker = async_sessionmaker(
+            self.engine,
+            class_ = AsyncSession,
+            sync_session_class = ReadSession,
+            expire_on_commit = False,
+            info = {"read_engine": self}
+        )
+        # the time before which this engine is considered unhealthy.
+        self.unhealthy_until: float = 0
+
+
+class ReadRouter():
+    """Routes each read session to a healthy replica, either round robin or
+    to the replica with the fewest connections in use. A replica that fails
+    is skipped for the retry interval. If there are no replicas, or none are
+    healthy, reads are routed to the primary.
+
+    Replicas may lag behind the primary, so for the max lag after the master
+    generation changes, reads are routed to the primary; everything cached
+    for a new generation is read from the primary, rather than from a replica
+    that has yet to apply the import.
+    """
+    def __init__(
+        self,
+        primary: ReadEngine,
+        replicas: List[ReadEngine],
+        policy: str,
+        retry_interval: float,
+        max_lag: float = 0
+    ):
+        if policy not in ("round_robin", "least_connections",):
+            raise ValueError("'%s' is not a replica routing policy" % policy)
+        self.primary = primary
+        self.replicas = replicas
+        self.policy = policy
+        self.retry_interval = retry_interval
+        self.max_lag = max_lag
+        self._turn = itertools.count()
+
+    def choose(self) -> ReadEngine:
+        """Return the engine the next read session should use."""
+        if self.replicas and self.max_lag > 0:
+            changed_at: Optional[float] = cache.master_generation.changed_at()
+            if changed_at is not None and time.time() - changed_at < self.max_lag:
+                return self.primary
+        now: float = time.monotonic()
+        healthy: List[ReadEngine] = [
+            replica for replica in self.replicas if replica.unhealthy_until <= now
+        ]
+        if not healthy:
+            return self.primary
+        if self.policy == "least_connections":
+            return min(healthy, key = lambda replica: replica.counters.in_use)
+        return healthy[next(self._turn) % len(healthy)]
+
+    def mark_unhealthy(self, read_engine: ReadEngine, error: Exception):
+        """Skip the given engine for the retry interval, due to the given
+        error.
+        """
+        log.warning("read engine %s failed, skipping it for %ds; %s"
+                    % (read_engine.name, self.retry_interval, str(error),))
+        read_engine.unhealthy_until = time.monotonic() + self.retry_interval
+
+
+# create a new async engine with that URL, and count its pool's events.
+async_engine = create_async_engine(connection_url, **engine_options(connection_url))
+async_engine_counters = PoolCounters(async_engine)
 
 # create an async session maker bound to that engine.
 async_session = async_sessionmaker(
     async_engine,
     class_ = AsyncSession,
     expire_on_commit = False
-)
\ No newline at end of file
+)
+
+
+def replica_urls() -> List[Union[str, URL]]:
+    """Return the URLs of the configured read replicas. Replicas are given
+    either as a comma separated list of URIs, or as a comma separated list of
+    hosts alongside the db_ components.
+    """
+    if config.SQLALCHEMY_REPLICA_URIS:
+        return [
+            uri.strip() for uri in config.SQLALCHEMY_REPLICA_URIS.split(",") if uri.strip()
+        ]
+    if config.DB_REPLICA_HOSTS:
+        return [
+            URL.create(
+                config.DB_ADAPTER,
+                username = config.DB_USER,
+                password = config.DB_PASSWORD,
+                host = host.strip(),
+                database = config.DB_DATABASE
+            )
+            for host in config.DB_REPLICA_HOSTS.split(",") if host.strip()
+        ]
+    return []
+
+
+def create_replica_engine(url: Union[str, URL]) -> AsyncEngine:
+    """Create an engine for the read replica at the given URL. Its
+    connections are only ever used for reads in autocommit mode, so aren't
+    reset when returned to the pool.
+    """
+    return create_async_engine(url,
+        isolation_level = "AUTOCOMMIT",
+        pool_reset_on_return = None,
+        **engine_options(url))
+
+
+def build_read_router() -> ReadRouter:
+    """Build a read router for the configured replicas and routing policy.
+    Reads fall back to the primary, through its own engine and pool in
+    autocommit mode.
+    """
+    replicas: List[ReadEngine] = []
+    for idx, url in enumerate(replica_urls()):
+        engine: AsyncEngine = create_replica_engine(url)
+        replicas.append(
+            ReadEngine("replica-%d" % idx, engine, PoolCounters(engine), False))
+    return ReadRouter(
+        ReadEngine("primary",
+            async_engine.execution_options(isolation_level = "AUTOCOMMIT"),
+            async_engine_counters, True),
+        replicas,
+        config.REPLICA_ROUTING,
+        config.REPLICA_RETRY_INTERVAL,
+        config.REPLICA_MAX_LAG
+    )
+
+
+# route reads to the replicas, if any, falling back to the primary.
+read_router = build_read_router()
+
+
+def async_read_session() -> AsyncSession:
+    """Return a new read session, on the engine chosen by the read router."""
+    return read_router.choose().sessionmaker()
@@ -23,6 +23,37 @@ class Car(BaseVehicle):
     power: Optional[float] = None
     elec_type: Optional[str] = None
 
+    def year_model_spec(self) -> str:
+        """Return a string containing this car's unique options within its
+        year model. An example is something like 'RZ 3.0L T 6 spd Manual'. If
+        the car's motor or transmission type isn't supported, this raises
+        NotImplementedError; as this is materialised at import, such a car
+        fails the import rather than its responses.
+        """
+        result: str = ""
+        if self.badge is not None:
+            result += self.badge + " "
+        elif self.version is not None:
+            result += self.version + " "
+        if self.motor_type == "piston":
+            result += "%.1fL %s" % (self.displacement, self.induction,)
+        elif self.motor_type == "rotary":
+            return "%.1fL Rotary %s" % (self.displacement, self.induction,)
+        elif self.motor_type == "electric":
+            raise NotImplementedError("vehicle %s; electric motor types not "\
+                                      "implemented in options!" % self.id)
+        else:
+            raise NotImplementedError("vehicle %s; motor type '%s' not "\
+                                      "implemented in options!" % (self.id, self.motor_type,))
+        if self.trans_type == "A":
+            result += " %d spd Automatic" % self.num_gears
+        elif self.trans_type == "M":
+            result += " %d spd Manual" % self.num_gears
+        else:
+            raise NotImplementedError("vehicle %s; transmission type '%s' not "\
+                                      "implemented in options!" % (self.id, self.trans_type,))
+        return result
+
 
 class Bike(BaseVehicle):
     type_id: Literal["bike"]
@@ -77,4 +108,12 @@ class VehicleType(BaseModel):
 class Vehicles(BaseModel):
     types: List[VehicleType]
     years: List[int]
-    makes: List[VehicleMake]
\ No newline at end of file
+    makes: List[VehicleMake]
+
+
+class TableChanges(BaseModel):
+    """The changes made to a single master table by an import."""
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
\ No newline at end of file
@@ -4,8 +4,24 @@ from typing import Annotated
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_session
+from app import cache, config
+from app.data import selector
+from app.database import get_read_session, get_session
 
 
 # Define a dependency that will inject a started database session.
-Sesh = Annotated[AsyncSession, Depends(get_session)]
\ No newline at end of file
+Sesh = Annotated[AsyncSession, Depends(get_session)]
+# Define a dependency that will inject a session for reads only.
+ReadSesh = Annotated[AsyncSession, Depends(get_read_session)]
+
+
+async def check_master_generation():
+    """Check whether the master has been imported since this worker last
+    checked. If serving the selector from memory, its tree is reloaded first,
+    with every request meanwhile awaiting the new tree. Only then are caches
+    from the previous master dropped, so nothing from the previous tree is
+    cached under the new generation.
+    """
+    if config.SELECTOR_SERVE_FROM_MEMORY:
+        await selector.ensure_current()
+    cache.refresh_master_generation()
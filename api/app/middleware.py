@@ -0,0 +1,270 @@
+"""Middleware for the application."""
+import gzip
+import hashlib
+import os
+
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app import cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content types worth compressing; anything else, like images, already is.
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript",
+                      "image/svg+xml",)
+
+
+class ConditionalRequestMiddleware():
+    """Supports conditional requests for all responses derived from master
+    data. Such responses only change when the master generation changes, so
+    an ETag is derived from the generation, the path and the query parameters
+    without running the request at all; a request whose If-None-Match (or
+    If-Modified-Since) still matches is answered with 304 Not Modified before
+    any route or dependency runs.
+
+    A 304 repeats the ETag the client's 200 was sent with; weak if that
+    response was compressed, otherwise strong. If responses are compressed,
+    they vary by Accept-Encoding.
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
+        path_prefixes: Tuple[str, ...],
+        compression: bool = False
+    ):
+        self.app = app
+        self.path_prefixes = path_prefixes
+        self.compression = compression
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD",) or \
+            not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+        generation: int = cache.master_generation.current()
+        etag: str = make_etag(generation, scope["path"],
+            scope["query_string"].decode("latin-1"))
+        last_modified: Optional[str] = _master_last_modified()
+        request_headers = Headers(scope = scope)
+        encoding: Optional[str] = None
+        if self.compression:
+            encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        validators = [("etag", etag,), ("cache-control", "no-cache",)]
+        if last_modified is not None:
+            validators.append(("last-modified", last_modified,))
+        if self.compression:
+            validators.append(("vary", "Accept-Encoding",))
+
+        if is_not_modified(request_headers, etag, last_modified):
+            # the compression middleware only weakens the etag of a 200 it
+            # compresses, so repeat the etag as the client has it; failing
+            # that, as it was sent if the compressed body is still cached.
+            not_modified_etag: Optional[str] = matched_etag(request_headers, etag)
+            if not_modified_etag is None:
+                was_compressed: bool = encoding is not None and \
+                    (etag, encoding,) in cache.compression_cache
+                not_modified_etag = representation_etag(etag,
+                    encoding if was_compressed else None)
+            headers = [("etag", not_modified_etag,), *validators[1:]]
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(name.encode("latin-1"), value.encode("latin-1"),)
+                            for name, value in headers]
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_validators(message: Message):
+            # only successful responses may be revalidated later on.
+            if message["type"] == "http.response.start" and \
+                message["status"] == 200:
+                headers = MutableHeaders(scope = message)
+                for name, value in validators:
+                    if name == "vary":
+                        headers.add_vary_header(value)
+                    else:
+                        headers[name] = value
+            await send(message)
+        await self.app(scope, receive, send_with_validators)
+
+
+class CompressionMiddleware():
+    """Compresses response bodies of at least minimum size bytes, with
+    brotli if it is installed and the client accepts it, otherwise gzip.
+    Compressed bodies of responses with an ETag are cached by that ETag, so
+    the same response is only compressed once. As the compressed response is
+    a different representation, its ETag is made weak; a response sent
+    uncompressed, such as one too small, keeps its ETag as it is.
+    """
+    def __init__(self, app: ASGIApp, minimum_size: int, gzip_level: int):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding: Optional[str] = choose_encoding(
+            Headers(scope = scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        body_parts = []
+        passthrough: bool = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw = message["headers"])
+                if "content-encoding" in headers or \
+                    not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # hold the start until the whole body is known.
+                    start_message = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body: bytes = b"".join(body_parts)
+            headers = MutableHeaders(scope = start_message)
+            headers.add_vary_header("Accept-Encoding")
+            if len(body) >= self.minimum_size:
+                body = self._compress(body, encoding, headers.get("etag", None))
+                headers["content-encoding"] = encoding
+                headers["content-length"] = str(len(body))
+                etag: Optional[str] = headers.get("etag", None)
+                if etag is not None:
+                    headers["etag"] = representation_etag(etag, encoding)
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+        await self.app(scope, receive, send_compressed)
+
+    def _compress(self, body: bytes, encoding: str, etag: Optional[str]) -> bytes:
+        """Return the given body compressed with the given encoding. If an
+        ETag is given, the compressed body is cached by it.
+        """
+        if etag is not None:
+            compressed: Optional[bytes] = \
+                cache.compression_cache.get((etag, encoding,))
+            if compressed is not None:
+                return compressed
+        if encoding == "br":
+            compressed = brotli.compress(body)
+        else:
+            compressed = gzip.compress(body, compresslevel = self.gzip_level,
+                mtime = 0)
+        if etag is not None:
+            cache.compression_cache.set((etag, encoding,), compressed,
+                len(compressed))
+        return compressed
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Return the best encoding this app supports, from the given Accept
+    Encoding header, or None if the client accepts none of them.
+    """
+    accepted = set()
+    for candidate in accept_encoding.split(","):
+        name, _, parameters = candidate.strip().partition(";")
+        quality: str = parameters.strip().removeprefix("q=")
+        if quality and quality.strip("0.") == "":
+            # q=0 means not acceptable.
+            continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def representation_etag(etag: str, encoding: Optional[str]) -> str:
+    """Return the ETag to send for a response with the given ETag, given the
+    content encoding its body was actually encoded with, if any. An encoded
+    representation differs from the response byte for byte, so its ETag is
+    made weak.
+    """
+    if encoding is None or etag.startswith("W/"):
+        return etag
+    return "W/" + etag
+
+
+def make_etag(generation: int, path: str, query_string: str) -> str:
+    """Return a strong ETag for a response derived from the given master
+    generation, for the given path and query string. Query parameters are
+    sorted, so their order doesn't matter.
+    """
+    normalised_query: str = urlencode(sorted(parse_qsl(query_string,
+        keep_blank_values = True)))
+    digest: str = hashlib.blake2b(
+        ("%d:%s?%s" % (generation, path, normalised_query,)).encode("utf-8"),
+        digest_size = 12
+    ).hexdigest()
+    return "\"%s\"" % digest
+
+
+def _master_last_modified() -> Optional[str]:
+    """Return the time the master generation last changed, as an HTTP date,
+    or None if the master has never been imported.
+    """
+    try:
+        return formatdate(os.stat(cache.master_generation.path).st_mtime,
+            usegmt = True)
+    except FileNotFoundError:
+        return None
+
+
+def matched_etag(request_headers: Headers, etag: str) -> Optional[str]:
+    """Return the given ETag just as the request's If-None-Match gives it,
+    weak or strong, or None if If-None-Match doesn't give it.
+    """
+    if_none_match: Optional[str] = request_headers.get("if-none-match", None)
+    if if_none_match is None:
+        return None
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.removeprefix("W/") == etag:
+            return candidate
+    return None
+
+
+def is_not_modified(
+    request_headers: Headers,
+    etag: str,
+    last_modified: Optional[str]
+) -> bool:
+    """Return True if the request's validators show the client already has
+    the response identified by the given ETag and last modified date. Just
+    like HTTP, If-None-Match takes priority over If-Modified-Since.
+    """
+    if_none_match: Optional[str] = request_headers.get("if-none-match", None)
+    if if_none_match is not None:
+        candidates = [candidate.strip().removeprefix("W/")
+                      for candidate in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+    if_modified_since: Optional[str] = \
+        request_headers.get("if-modified-since", None)
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(if_modified_since) >= \
+            parsedate_to_datetime(last_modified)
+    except (TypeError, ValueError):
+        return False
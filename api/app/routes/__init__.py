@@ -2,6 +2,7 @@
 from fastapi import APIRouter
 
 from .general import router as general_router
+from .health import router as health_router
 from .vehicles import router as vehicle_router
 
 
@@ -13,4 +14,5 @@ api_router = APIRouter(
 
 # Add all other routes to this router.
 api_router.include_router(general_router)
+api_router.include_router(health_router)
 api_router.include_router(vehicle_router)
\ No newline at end of file
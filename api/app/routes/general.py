@@ -1,76 +1,79 @@
 """General API endpoints."""
-import os
-import pathlib
-import mimetypes
+from typing import Dict, Optional
 
-from typing import Optional
-
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.responses import FileResponse
 
-from app import config, database
-from app.dependencies import Sesh
+from app import config
+from app.data import logos
 from app.logger import log
+from app.middleware import is_not_modified
 
 router = APIRouter(tags = ["general"])
 
 
 @router.get("/logo/{make_uid}")
-async def request_make_logo(make_uid: str, sesh: Sesh):
-    """Query the logo for the given Make UID. This will return a response
-    that will invoke X-Accel-Redirect internally toward the resource.
+async def request_make_logo(make_uid: str, request: Request):
+    """Query the logo for the given Make UID. Logos are preloaded, so this
+    never needs the database. Logos are validated by a hash of their content,
+    and a request that already has the logo is answered with 304. Otherwise,
+    if using nginx, this will return a response that will invoke
+    X-Accel-Redirect internally toward the resource.
     """
     log.debug("logo with UID %s has been requested" % make_uid)
-    # query a vehicle make with the given id
-    vehicle_make: Optional[database.VehicleMake] = \
-        await database.find_vehicle_make(
-            sesh,
-            make_uid
-        )
+    logo: Optional[logos.Logo] = await logos.find_logo(make_uid)
     # if the vehicle make can't be found, abort with 404.
-    if vehicle_make is None:
+    if logo is None:
         log.error("failed to find logo. returning 404")
         raise HTTPException(
             status_code = 404,
             detail = "the desired vehicle make can't be found!"
         )
-    log.debug("found logo, it is %s" % str(vehicle_make.logo_media_uri))
-    # otherwise, extract info from the vehicle make. we need the filename
-    # and mimetype.
-    logo_media_path = pathlib.Path(vehicle_make.logo_media_uri)
-    # get filename with the extension.
-    filename: str = logo_media_path.name
-    # guess mimetype, fail if we can't find anything.
-    mimetype, _ = mimetypes.guess_type(vehicle_make.logo_media_uri)
-    if mimetype is None:
+    log.debug("found logo, it is %s" % logo.media_uri)
+    # fail if we couldn't determine the logo's mimetype.
+    if logo.mimetype is None:
         raise HTTPException(
             status_code = 500,
             detail = "we found the logo! but could not determine type of "\
                      "resource."
         )
-    
+    # logos hashed by content never change without their ETag changing, so
+    # can be cached for good. otherwise, they must always be revalidated.
+    headers: Dict[str, str] = {
+        "ETag": logo.etag,
+        "Cache-Control": "public, max-age=%d, immutable" % config.LOGO_MAX_AGE \
+            if logo.content_hashed else "no-cache"
+    }
+    if is_not_modified(request.headers, logo.etag, None):
+        return Response(status_code = 304, headers = headers)
+
     # depending on status of using nginx, serve content either with
-    # X-Accel-Redirect or a file response.
+    # X-Accel-Redirect or from memory/a file response.
     if config.USING_NGINX:
         # build a url to redirect to
-        redirect_to: str = "/%s" % str(logo_media_path).strip("/")
+        redirect_to: str = "/%s" % logo.media_uri.strip("/")
         log.debug("using nginx to serve content. X-Accel-Redirect to %s"
                   % redirect_to)
         # build a response with X-Accel-Redirect. this will trigger the internal
         # location block with /import/vehicles/logos/toyota.png or whatever.
         return Response(
             headers = {
-                "Content-Type": mimetype,
+                **headers,
+                "Content-Type": logo.mimetype,
                 "X-Accel-Redirect": redirect_to
             }
         )
-    else:
-        # serve with file response.
-        log.warning("application configured as NOT using nginx, we will use "\
-                    " fastapi's fileresponse to serve the content...")
-        # build an absolute path with the content directory variable.
-        absolute_path: str = os.path.join(
-            config.CONTENT_DIRECTORY,
-            str(logo_media_path)
+    if logo.size is None:
+        log.error("logo %s isn't within the content directory. returning 404"
+                  % logo.media_uri)
+        raise HTTPException(
+            status_code = 404,
+            detail = "the desired logo can't be found!"
         )
-        return FileResponse(absolute_path)
+    # small logos are served from memory, anything larger from disk.
+    contents: Optional[bytes] = await logos.read_logo(logo)
+    if contents is not None:
+        return Response(contents, media_type = logo.mimetype, headers = headers)
+    log.warning("application configured as NOT using nginx, we will use "\
+                " fastapi's fileresponse to serve the content...")
+    return FileResponse(logo.path, media_type = logo.mimetype, headers = headers)
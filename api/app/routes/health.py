@@ -0,0 +1,56 @@
+"""Health and diagnostic API endpoints."""
+from typing import Dict, Optional
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app import cache, database
+from app.data import warmup
+from app.logger import log
+
+from . import schemas
+
+router = APIRouter(
+    prefix = "/health",
+    tags = ["health"]
+)
+
+
+@router.get("/ready", response_model = schemas.ReadinessResponse,
+    responses = {503: {"model": schemas.ReadinessResponse}})
+async def get_readiness():
+    """Get whether this worker has finished warming up. Responds with 503
+    until it has, so a load balancer doesn't send traffic to a cold worker,
+    and for good if the warm-up failed, along with why."""
+    if not warmup.is_ready():
+        error: Optional[str] = warmup.error()
+        return JSONResponse(
+            status_code = 503,
+            content = schemas.ReadinessResponse(ready = False,
+                failed = error is not None, error = error).model_dump()
+        )
+    return schemas.ReadinessResponse(ready = True)
+
+
+@router.get("/pool", response_model = Dict[str, schemas.PoolStatsResponse])
+async def get_pool_stats():
+    """Get the state of each of this worker's database connection pools,
+    keyed by engine, and their counters since the worker started. Use this to
+    size the pools against real traffic."""
+    log.debug("pool stats have been requested")
+    return {
+        name: schemas.PoolStatsResponse(**stats)
+        for name, stats in database.get_pool_stats().items()
+    }
+
+
+@router.get("/selector", response_model = schemas.SelectorStatsResponse)
+async def get_selector_stats():
+    """Get the counters of this worker's selector cache, and of the single
+    flight identical concurrent selector queries are coalesced by. The number
+    coalesced is the number of queries saved."""
+    log.debug("selector stats have been requested")
+    return schemas.SelectorStatsResponse(
+        cache = schemas.CacheStatsResponse(**cache.selector_cache.stats()),
+        flights = schemas.SingleFlightStatsResponse(**cache.selector_flights.stats())
+    )
@@ -1,7 +1,21 @@
 """Response & request schemas for the API."""
-from typing import Optional
+from typing import Generic, List, Optional, TypeVar
 
-from pydantic import BaseModel, ConfigDict, Field, computed_field
+from pydantic import BaseModel, ConfigDict, Field
+
+from app import config
+
+T = TypeVar("T")
+
+
+class CursorPage(BaseModel, Generic[T]):
+    """A page of items paginated by keyset. To request the next page, pass
+    its next cursor as the cursor; it is None on the last page. The total is
+    only counted when requested.
+    """
+    items: List[T]
+    next_cursor: Optional[str] = Field(serialization_alias = "nextCursor")
+    total: Optional[int] = None
 
 
 class VehicleResponse(BaseModel):
@@ -23,34 +37,23 @@ class VehicleResponse(BaseModel):
     fuel_type: Optional[str] = Field(serialization_alias = "fuelType")
     power: Optional[float]
     elec_type: Optional[str] = Field(serialization_alias = "elecType")
-    title: str
-
-    @computed_field
-    def yearModelSpec(self) -> str:
-        """Return a string containing this vehicle's unique options. An example
-        is something like 'RZ 3.0L T 6 spd Manual'
-        """
-        result: str = ""
-        if self.badge is not None:
-            result += self.badge + " "
-        elif self.version is not None:
-            result += self.version + " "
-        if self.motor_type == "piston":
-            result += "%.1fL %s" % (self.displacement, self.induction,)
-        elif self.motor_type == "rotary":
-            return "%.1fL Rotary %s" % (self.displacement, self.induction,)
-        elif self.motor_type == "electric":
-            raise NotImplementedError("electric motor types not implemented "\
-                                      "in options!")
-        else:
-            raise NotImplementedError
-        if self.trans_type == "A":
-            result += " %d spd Automatic" % self.num_gears
-        elif self.trans_type == "M":
-            result += " %d spd Manual" % self.num_gears
-        else:
-            raise NotImplementedError
-        return result
+    # None for a vehicle not yet materialised by an import, such as one stored
+    # before these columns existed.
+    title: Optional[str]
+    year_model_spec: Optional[str] = Field(serialization_alias = "yearModelSpec")
+
+
+class VehicleBatchRequest(BaseModel):
+    """A request to resolve many vehicles, by their IDs, at once."""
+    ids: List[str] = Field(min_length = 1, max_length = config.MAX_BATCH_SIZE)
+
+
+class VehicleBatchResponse(BaseModel):
+    """The vehicles resolved from a batch request, in the order requested,
+    along with any requested IDs that don't exist.
+    """
+    items: List[VehicleResponse]
+    missing: List[str]
 
 
 class VehicleYearModelResponse(BaseModel):
@@ -87,4 +90,69 @@ class VehicleMakeResponse(BaseModel):
         from_attributes = True
     )
     id: str
-    name: str
\ No newline at end of file
+    name: str
+
+
+class SelectorSnapshotResponse(BaseModel):
+    """The options for every selector level below a given selection. The
+    selection is that given, continued by selecting the first option of each
+    level below it. Levels at or above the given selection are None.
+    """
+    mk: Optional[str] = None
+    t: Optional[str] = None
+    mdl: Optional[str] = None
+    y: Optional[int] = None
+    makes: Optional[List[VehicleMakeResponse]] = None
+    types: Optional[List[VehicleTypeResponse]] = None
+    models: Optional[List[VehicleModelResponse]] = None
+    years: Optional[List[VehicleYearModelResponse]] = None
+    stock: Optional[List[VehicleResponse]] = None
+
+
+class PoolStatsResponse(BaseModel):
+    """The state of a database connection pool, and its counters since the
+    worker started. Sizes are only reported by queue pools.
+    """
+    pool_class: str = Field(serialization_alias = "poolClass")
+    size: Optional[int]
+    max_overflow: Optional[int] = Field(serialization_alias = "maxOverflow")
+    checked_in: Optional[int] = Field(serialization_alias = "checkedIn")
+    checked_out: Optional[int] = Field(serialization_alias = "checkedOut")
+    overflow: Optional[int]
+    connects: int
+    checkouts: int
+    invalidations: int
+
+
+class CacheStatsResponse(BaseModel):
+    """The current size and counters of an in-process cache."""
+    entries: int
+    bytes: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+class SingleFlightStatsResponse(BaseModel):
+    """The counters of a single flight; the number of flights led, each a
+    query actually run, and the number of requests coalesced into them, each
+    a query saved.
+    """
+    in_flight: int = Field(serialization_alias = "inFlight")
+    leads: int
+    coalesced: int
+
+
+class SelectorStatsResponse(BaseModel):
+    """How selector reads are being served by this worker."""
+    cache: CacheStatsResponse
+    flights: SingleFlightStatsResponse
+
+
+class ReadinessResponse(BaseModel):
+    """Whether this worker is ready to serve traffic, and if its warm-up
+    failed, why.
+    """
+    ready: bool
+    failed: bool = False
+    error: Optional[str] = None
@@ -1,10 +1,17 @@
 """Vehicle specific API endpoints."""
-from fastapi import APIRouter
+from collections.abc import Callable
+from typing import Annotated, Any, List, Optional, Type
 
-from fastapi_pagination.ext.sqlalchemy import paginate
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi_pagination.api import create_page, resolve_params
+from fastapi_pagination.bases import AbstractPage
+from pydantic import BaseModel
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import config, database, utility as util
-from app.dependencies import Sesh
+from app.data import search, selector
+from app.dependencies import ReadSesh
 from app.logger import log
 
 from . import schemas
@@ -16,22 +23,75 @@ router = APIRouter(
 
 # Make a new page response type configured with the desired page sizes.
 PageResponse = util.make_page_response()
+# A dependency for the parameters of cursor paginated routes.
+CursorParams = Annotated[util.CursorParams, Depends(util.cursor_params)]
+
+
+async def _paginate_selector(
+    sesh: AsyncSession,
+    route: str,
+    build_query: Callable[..., Select],
+    *args: Any
+) -> Any:
+    """Paginate the options for the given selector route and args; from the
+    in-memory selector tree if the app is configured to serve from memory,
+    otherwise from the database. The page is returned as a fast JSON response
+    if those are enabled.
+    """
+    if config.SELECTOR_SERVE_FROM_MEMORY:
+        options = selector.current().options(route, *args)
+        params = resolve_params()
+        raw_params = params.to_raw_params().as_limit_offset()
+        page: AbstractPage = create_page(list(options[raw_params.as_slice()]),
+            total = len(options), params = params)
+    else:
+        page = await database.paginate_selector(sesh, route, build_query, *args)
+    return util.json_response(page)
+
+
+async def _paginate_keyset(
+    sesh: AsyncSession,
+    params: util.CursorParams,
+    route: str,
+    item_type: Type[BaseModel],
+    build_query: Callable[..., Select],
+    *args: Any
+) -> Any:
+    """Paginate the options for the given selector route and args by keyset,
+    from the database. Aborts with 400 if the given cursor is invalid.
+    """
+    try:
+        items, next_cursor, total = await database.paginate_keyset(
+            sesh, route, item_type, build_query, *args,
+            cursor = params.cursor,
+            size = params.size,
+            include_total = params.include_total)
+    except database.errors.InvalidCursorException as ice:
+        raise HTTPException(
+            status_code = 400,
+            detail = "the given cursor is not valid!"
+        )
+    return util.json_response(schemas.CursorPage[item_type](
+        items = items,
+        next_cursor = next_cursor,
+        total = total
+    ))
 
 
 @router.get("/makes", response_model = PageResponse[schemas.VehicleMakeResponse])
-async def search_vehicle_makes(sesh: Sesh):
+async def search_vehicle_makes(sesh: ReadSesh):
     """Search for Vehicle makes. This is a pagination route, so you may
     also provide the following arguments:
 
     :page: The requested page.
     :limit: The number per page."""
     log.debug(f"attempting to locate vehicle makes")
-    makes_q = database.build_make_query()
-    return await paginate(sesh, makes_q)
+    return await _paginate_selector(sesh, "makes",
+        database.build_make_query)
     
 
 @router.get("/types", response_model = PageResponse[schemas.VehicleTypeResponse])
-async def search_vehicle_types(mk: str, sesh: Sesh):
+async def search_vehicle_types(mk: str, sesh: ReadSesh):
     """Search for vehicle types for the given make UID.
     :mk: The make UID.
     
@@ -39,12 +99,12 @@ async def search_vehicle_types(mk: str, sesh: Sesh):
     :page: The requested page.
     :limit: The number per page."""
     log.debug("attempting to locate vehicle types with make '%s'" % mk)
-    types_q = database.build_type_query(mk)
-    return await paginate(sesh, types_q)
+    return await _paginate_selector(sesh, "types",
+        database.build_type_query, mk)
     
 
 @router.get("/models", response_model = PageResponse[schemas.VehicleModelResponse])
-async def search_vehicle_models(mk: str, t: str, sesh: Sesh):
+async def search_vehicle_models(mk: str, t: str, sesh: ReadSesh):
     """Search for vehicle models for the given make UID and type ID.
     :mk: The make UID.
     :t: the Type ID.
@@ -54,8 +114,8 @@ async def search_vehicle_models(mk: str, t: str, sesh: Sesh):
     :limit: The number per page."""
     log.debug("attempting to locate vehicle models with make '%s' and type '%s'"
               % (mk, t,))
-    models_q = database.build_model_query(mk, t)
-    return await paginate(sesh, models_q)
+    return await _paginate_selector(sesh, "models",
+        database.build_model_query, mk, t)
     
 
 @router.get("/years", response_model = PageResponse[schemas.VehicleYearModelResponse])
@@ -63,7 +123,7 @@ async def search_vehicle_years(
     mk: str,
     t: str,
     mdl: str,
-    sesh: Sesh
+    sesh: ReadSesh
 ):
     """Search for vehicle years given make UID, type ID and model UID:
     :mk: The make UID.
@@ -75,8 +135,8 @@ async def search_vehicle_years(
     :limit: The number per page."""
     log.debug("Attempting to locate vehicle years with make '%s', type '%s' and model '%s'"\
               % (mk, t, mdl,))
-    year_models_q = database.build_year_model_query(mk, t, mdl)
-    return await paginate(sesh, year_models_q)
+    return await _paginate_selector(sesh, "years",
+        database.build_year_model_query, mk, t, mdl)
 
 
 @router.get("/stock", response_model = PageResponse[schemas.VehicleResponse])
@@ -85,7 +145,7 @@ async def search_vehicles_stock(
     t: str,
     mdl: str,
     y: int,
-    sesh: Sesh
+    sesh: ReadSesh
 ):
     """Search for vehicles given a set of cascading criteria. Accepted parameters (also in this order):
     :mk: The make UID.
@@ -98,7 +158,185 @@ async def search_vehicles_stock(
     :limit: The number per page."""
     log.debug("attempting to locate vehicle stocks with make '%s', type '%s'"\
               ", model '%s' and year '%d'" % (mk, t, mdl, y,))
-    vehicles_q = database.build_vehicle_query(mk, t, mdl, y)
-    results = await sesh.execute(vehicles_q)
-    print(results.all())
-    return await paginate(sesh, vehicles_q)
\ No newline at end of file
+    return await _paginate_selector(sesh, "stock",
+        database.build_vehicle_query, mk, t, mdl, y)
+
+
+@router.get("/search", response_model = List[schemas.VehicleResponse])
+async def search_vehicles(
+    sesh: ReadSesh,
+    q: str = Query(..., min_length = 1, max_length = 128),
+    limit: int = Query(25, ge = 1, le = 100)
+):
+    """Search for vehicles by any combination of year (like 1994 or 94),
+    make and model names, badge, version and transmission. Each word may be
+    partial, as the user types. The best matches are returned first.
+    :q: The search query, like '94 supra manual'.
+    :limit: The maximum number of vehicles to return."""
+    log.debug("searching vehicles for '%s'" % q)
+    index: search.SearchIndex = await search.current(sesh)
+    return util.json_response(index.search(q, limit))
+
+
+@router.post("/batch", response_model = schemas.VehicleBatchResponse)
+async def resolve_vehicles(batch: schemas.VehicleBatchRequest, sesh: ReadSesh):
+    """Resolve many vehicles at once, given their IDs, like a saved garage.
+    Vehicles are returned in the order requested, once each even if requested
+    more than once; IDs that don't exist are returned as missing. Each vehicle
+    is read from its own row alone, as its title and spec are stored on it."""
+    log.debug("attempting to resolve a batch of %d vehicles" % len(batch.ids))
+    found = await database.vehicles.get_many(sesh, batch.ids)
+    found_ids = {vehicle.id for vehicle in found}
+    return util.json_response(schemas.VehicleBatchResponse(
+        items = [schemas.VehicleResponse.model_validate(vehicle) for vehicle in found],
+        missing = [id for id in dict.fromkeys(batch.ids) if id not in found_ids]
+    ))
+
+
+@router.get("/snapshot", response_model = schemas.SelectorSnapshotResponse)
+async def get_selector_snapshot(
+    sesh: ReadSesh,
+    mk: Optional[str] = None,
+    t: Optional[str] = None,
+    mdl: Optional[str] = None,
+    y: Optional[int] = None
+):
+    """Get the options for every selector level below the given selection,
+    in a single call. The selection may be any prefix of the following, in
+    order; with none given, the snapshot starts from the makes. Below the
+    given selection, the first option of each level, in its keyset order
+    (years oldest first), is selected.
+    :mk: The make UID.
+    :t: The type ID.
+    :mdl: The model's UID.
+    :y: The target year."""
+    given = [mk, t, mdl, y]
+    num_given: int = len(given)
+    while num_given and given[num_given - 1] is None:
+        num_given -= 1
+    if None in given[:num_given]:
+        raise HTTPException(
+            status_code = 400,
+            detail = "the selection must be a prefix of mk, t, mdl and y!"
+        )
+    log.debug("attempting to snapshot the selector below %s" % given[:num_given])
+    snapshot = schemas.SelectorSnapshotResponse()
+    args: List[Any] = given[:num_given]
+    for route, item_type, build_query, param, attribute in selector.SELECTOR_LEVELS[num_given:]:
+        options = await selector.selector_options(sesh, route, item_type, build_query, *args)
+        setattr(snapshot, route, options)
+        if param is None:
+            break
+        if not options:
+            # nothing to select, so there are no options below this level.
+            break
+        args.append(getattr(options[0], attribute))
+    for param, value in zip(("mk", "t", "mdl", "y",), args):
+        setattr(snapshot, param, value)
+    return util.json_response(snapshot)
+
+
+@router.get("/makes/cursor",
+    response_model = schemas.CursorPage[schemas.VehicleMakeResponse])
+async def search_vehicle_makes_by_cursor(sesh: ReadSesh, params: CursorParams):
+    """Search for Vehicle makes, ordered by name. This is a cursor paginated
+    route, so you may also provide the following arguments:
+
+    :cursor: The next cursor from the previous page.
+    :size: The number per page.
+    :total: Whether to count the total."""
+    return await _paginate_keyset(sesh, params, "makes",
+        schemas.VehicleMakeResponse, database.build_make_query)
+
+
+@router.get("/types/cursor",
+    response_model = schemas.CursorPage[schemas.VehicleTypeResponse])
+async def search_vehicle_types_by_cursor(
+    mk: str,
+    sesh: ReadSesh,
+    params: CursorParams
+):
+    """Search for vehicle types for the given make UID, ordered by name.
+    :mk: The make UID.
+
+    This is a cursor paginated route, so you may also provide the following
+    arguments:
+    :cursor: The next cursor from the previous page.
+    :size: The number per page.
+    :total: Whether to count the total."""
+    return await _paginate_keyset(sesh, params, "types",
+        schemas.VehicleTypeResponse, database.build_type_query, mk)
+
+
+@router.get("/models/cursor",
+    response_model = schemas.CursorPage[schemas.VehicleModelResponse])
+async def search_vehicle_models_by_cursor(
+    mk: str,
+    t: str,
+    sesh: ReadSesh,
+    params: CursorParams
+):
+    """Search for vehicle models for the given make UID and type ID, ordered
+    by name.
+    :mk: The make UID.
+    :t: the Type ID.
+
+    This is a cursor paginated route, so you may also provide the following
+    arguments:
+    :cursor: The next cursor from the previous page.
+    :size: The number per page.
+    :total: Whether to count the total."""
+    return await _paginate_keyset(sesh, params, "models",
+        schemas.VehicleModelResponse, database.build_model_query, mk, t)
+
+
+@router.get("/years/cursor",
+    response_model = schemas.CursorPage[schemas.VehicleYearModelResponse])
+async def search_vehicle_years_by_cursor(
+    mk: str,
+    t: str,
+    mdl: str,
+    sesh: ReadSesh,
+    params: CursorParams
+):
+    """Search for vehicle years given make UID, type ID and model UID,
+    ordered by year:
+    :mk: The make UID.
+    :t: The type ID.
+    :mdl: The model's UID.
+
+    This is a cursor paginated route, so you may also provide the following
+    arguments:
+    :cursor: The next cursor from the previous page.
+    :size: The number per page.
+    :total: Whether to count the total."""
+    return await _paginate_keyset(sesh, params, "years",
+        schemas.VehicleYearModelResponse, database.build_year_model_query,
+        mk, t, mdl)
+
+
+@router.get("/stock/cursor",
+    response_model = schemas.CursorPage[schemas.VehicleResponse])
+async def search_vehicles_stock_by_cursor(
+    mk: str,
+    t: str,
+    mdl: str,
+    y: int,
+    sesh: ReadSesh,
+    params: CursorParams
+):
+    """Search for vehicles given a set of cascading criteria, ordered by ID.
+    Accepted parameters (also in this order):
+    :mk: The make UID.
+    :t: The type ID.
+    :mdl: The model's UID.
+    :y: The target year.
+
+    This is a cursor paginated route, so you may also provide the following
+    arguments:
+    :cursor: The next cursor from the previous page.
+    :size: The number per page.
+    :total: Whether to count the total."""
+    return await _paginate_keyset(sesh, params, "stock",
+        schemas.VehicleResponse, database.build_vehicle_query,
+        mk, t, mdl, y)
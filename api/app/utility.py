@@ -1,5 +1,11 @@
-from fastapi import Query
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import pydantic_core
+
+from fastapi import Query, Response
 from fastapi_pagination import Page
+from pydantic import BaseModel
 
 from app import config
 
@@ -10,4 +16,53 @@ def make_page_response() -> Page:
             ge = 1,
             le = config.MAX_NUM_PER_PAGE
         )
-    )
\ No newline at end of file
+    )
+
+
+class FastJSONResponse(Response):
+    """A JSON response whose content is serialised straight to bytes by
+    pydantic-core. Returning a response skips FastAPI validating the content
+    against the route's response model and encoding it a second time, so
+    this must only be given content that is already the response model,
+    like pages of response schemas loaded from the database.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.model_dump_json(by_alias = True).encode("utf-8")
+        return pydantic_core.to_json(content, by_alias = True)
+
+
+def json_response(content: Any) -> Any:
+    """Return the given content, which must already be the route's response
+    model, as a fast JSON response if fast JSON responses are enabled.
+    Otherwise, the content is returned as it is, for FastAPI to validate and
+    serialise.
+    """
+    if config.FAST_JSON_RESPONSES:
+        return FastJSONResponse(content)
+    return content
+
+
+@dataclass
+class CursorParams():
+    """Parameters for a keyset (cursor) paginated route."""
+    cursor: Optional[str]
+    size: int
+    include_total: bool
+
+
+def cursor_params(
+    cursor: Optional[str] = None,
+    size: int = Query(config.DEFAULT_NUM_PER_PAGE,
+        ge = 1,
+        le = config.MAX_NUM_PER_PAGE
+    ),
+    total: bool = False
+) -> CursorParams:
+    """A dependency that reads the parameters for a keyset paginated route.
+    :cursor: The next cursor from the previous page, omit for the first page.
+    :size: The number per page.
+    :total: Whether to also count the total number of items."""
+    return CursorParams(cursor, size, total)
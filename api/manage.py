@@ -1,8 +1,16 @@
 import asyncio
+import json
+import logging
+import time
 import typer
 
-from app import create_app, database
-from app.data import vehicles
+from typing import List, Optional, Tuple
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from app import cache, config, create_app, database
+from app.data import export, search, vehicles
 from app.logger import log
 
 application = create_app()
@@ -24,6 +32,9 @@ def init_db():
     async def _async_init_db():
         async with database.async_engine.begin() as conn:
             await conn.run_sync(database.Model.metadata.create_all)
+            # create_all won't add new columns or indexes to existing tables.
+            await conn.run_sync(database.ensure_columns)
+            await conn.run_sync(database.ensure_indexes)
     # run until complete.
     asyncio.get_event_loop()\
         .run_until_complete(_async_init_db())
@@ -31,20 +42,274 @@ def init_db():
 
 
 @wrapper.command()
-def update_master():
-    """Update master data tables."""
+def update_master(
+    differential: bool = typer.Option(True, "--diff/--full",
+        help = "Only write rows that are new or have changed."),
+    delete: bool = typer.Option(False,
+        help = "Delete rows no longer in the master; differential only."),
+    bulk: bool = typer.Option(True,
+        help = "Write master data with multi-row upserts; --no-bulk requires --full."),
+    chunk_size: Optional[int] = typer.Option(None,
+        help = "Rows per upsert statement when writing in bulk.")
+):
+    """Update master data tables. If STATIC_DIRECTORY is set, the static
+    export is then replaced with one of the new master."""
+    if differential and not bulk:
+        log.error("a differential update always writes in bulk, --no-bulk "\
+                  "requires --full!")
+        raise typer.Exit(code = 1)
     log.debug("now updating vehicle master...")
     async def _async_update_master():
         async with database.async_session() as sesh, sesh.begin():
             # with a new started session, invoke vehicles import.
-            await vehicles.import_vehicles_from(sesh)
+            await vehicles.import_vehicles_from(sesh,
+                differential = differential, delete = delete,
+                bulk = bulk, chunk_size = chunk_size)
             # commit session.
             await sesh.commit()
+        # master has changed, so drop anything cached from it.
+        cache.invalidate_master()
+        # and replace the static export, if there is one, so the web server
+        # doesn't keep serving the previous master.
+        if config.STATIC_DIRECTORY:
+            log.info("re-exporting selector responses to %s..."
+                     % config.STATIC_DIRECTORY)
+            async with database.async_session() as sesh:
+                num_pages = await export.export_static(sesh, config.STATIC_DIRECTORY)
+            log.info("exported pages; %s" % num_pages)
     # run until complete.
     asyncio.get_event_loop()\
         .run_until_complete(_async_update_master())
     log.info("done :)")
 
 
+@wrapper.command()
+def export_static(
+    directory: Optional[str] = typer.Option(None,
+        help = "Directory to export to; by default, the static directory."),
+    page_size: Optional[int] = typer.Option(None,
+        help = "Items per page; by default, the default page size.")
+):
+    """Export every selector response, as pre-serialised JSON with gzip and
+    brotli siblings, to a directory the web server can serve directly. The
+    static directory is re-exported by each master update anyway.
+    """
+    directory = directory or config.STATIC_DIRECTORY
+    if not directory:
+        log.error("no directory given, and STATIC_DIRECTORY is not set!")
+        raise typer.Exit(code = 1)
+    log.info("exporting selector responses to %s..." % directory)
+    async def _async_export_static():
+        async with database.async_session() as sesh:
+            num_pages = await export.export_static(sesh, directory,
+                page_size = page_size)
+        log.info("exported pages; %s" % num_pages)
+    # run until complete.
+    asyncio.get_event_loop()\
+        .run_until_complete(_async_export_static())
+    log.info("done :)")
+
+
+@wrapper.command()
+def bench_read_path(
+    iterations: int = typer.Option(200,
+        help = "Number of reads to time for each route and read path."),
+    size: int = typer.Option(25,
+        help = "Number of items per read, like a page.")
+):
+    """Benchmark the CPU time of a single page read for each selector route,
+    through both the ORM and the projected read paths, against the current
+    database. Each read is queried, validated and serialised to JSON.
+    """
+    async def _async_bench_read_path():
+        for route, item_type, build_query, args in await _sample_selector_cases():
+            adapter = TypeAdapter(List[item_type])
+            for projected in (False, True,):
+                started: float = time.process_time()
+                for _ in range(iterations):
+                    query = build_query(*args).limit(size)
+                    if projected:
+                        query = database.project_selector_query(route, query)
+                    async with database.async_session() as sesh:
+                        result = await sesh.execute(query)
+                        rows = result.all() if projected else result.scalars().all()
+                        items = [item_type.model_validate(row) for row in rows]
+                    adapter.dump_json(items, by_alias = True)
+                per_read: float = (time.process_time() - started) / iterations
+                log.info("%-6s %-9s %4d items %8.1f us/read"
+                         % (route, "projected" if projected else "orm",
+                            len(items), per_read * 1000000,))
+    # run until complete.
+    asyncio.get_event_loop()\
+        .run_until_complete(_async_bench_read_path())
+
+
+@wrapper.command()
+def bench_search(
+    iterations: int = typer.Option(500,
+        help = "Number of times to run each query."),
+    limit: int = typer.Option(25,
+        help = "Maximum number of results per query.")
+):
+    """Benchmark building the vehicle search index from the current
+    database, then the latency of a set of type-ahead queries against it.
+    Import the real master first for representative results.
+    """
+    queries = ["9", "94", "94 supra", "94 supra manual", "toyota", "to",
+               "mazda rx", "2020 mazda 6 auto", "gt", "3.0 t manual"]
+    async def _async_bench_search():
+        async with database.async_session() as sesh:
+            started: float = time.perf_counter()
+            index = await search.SearchIndex.load(sesh, 0)
+        log.info("built index in %.1fms; %s"
+                 % ((time.perf_counter() - started) * 1000, index.count(),))
+        for query in queries:
+            timings: List[float] = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                results = index.search(query, limit)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            log.info("%-20s %3d results  p50 %7.1f us  p99 %7.1f us"
+                     % (query, len(results),
+                        timings[len(timings) // 2] * 1000000,
+                        timings[int(len(timings) * 0.99)] * 1000000,))
+    # run until complete.
+    asyncio.get_event_loop()\
+        .run_until_complete(_async_bench_search())
+
+
+@wrapper.command()
+def bench_compression(
+    iterations: int = typer.Option(200,
+        help = "Number of requests to time for each route and mode.")
+):
+    """Benchmark the bytes on the wire and CPU time per request of a set of
+    selector requests, against the current database, with compression off,
+    on with every body compressed again (cold) and on with compressed bodies
+    cached by ETag (warm).
+    """
+    from fastapi.testclient import TestClient
+    from app import middleware
+    # the test client logs every request.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    params = ("mk", "t", "mdl", "y",)
+    paths = [("/api/vehicles/%s" % route, dict(zip(params, args)),)
+             for route, _, _, args in asyncio.get_event_loop()
+                .run_until_complete(_sample_selector_cases())]
+    paths.append(("/api/vehicles/snapshot", {},))
+    paths.append(("/api/vehicles/search", {"q": "a", "limit": 100},))
+    encoding: str = "br" if middleware.brotli is not None else "gzip"
+    modes = [("off", False, False,), ("%s cold" % encoding, True, False,),
+             ("%s warm" % encoding, True, True,)]
+    for mode, enabled, warm in modes:
+        config.COMPRESSION_ENABLED = enabled
+        with TestClient(create_app()) as client:
+            for path, query in paths:
+                headers = {"accept-encoding": encoding if enabled else "identity"}
+                started: float = time.process_time()
+                for _ in range(iterations):
+                    if not warm:
+                        cache.compression_cache.clear()
+                    response = client.get(path, params = query, headers = headers)
+                per_request: float = (time.process_time() - started) / iterations
+                log.info("%-9s %-24s %7d bytes, %7d on wire %8.1f us/request"
+                         % (mode, path, len(response.content),
+                            response.num_bytes_downloaded, per_request * 1000000,))
+
+
+@wrapper.command()
+def bench_serialisation(
+    iterations: int = typer.Option(2000,
+        help = "Number of pages to serialise on each path."),
+    size: int = typer.Option(25,
+        help = "Number of vehicles per page.")
+):
+    """Benchmark the time to serialise a single page of vehicles from the
+    current database, through FastAPI's default path (validate against the
+    response model, encode, then dump) and through the fast JSON response.
+    """
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+    from fastapi_pagination import Params
+    from app import utility as util
+    from app.routes import schemas
+    page_type = util.make_page_response()[schemas.VehicleResponse]
+    async def _async_bench_serialisation():
+        async with database.async_session() as sesh:
+            result = await sesh.execute(
+                select(*database.PROJECTIONS["stock"]).limit(size))
+            items = [schemas.VehicleResponse.model_validate(row) for row in result]
+        page = page_type.create(items, Params(page = 1, size = size),
+            total = len(items))
+        field = create_model_field(name = "Response", type_ = page_type,
+            mode = "serialization")
+        started: float = time.perf_counter()
+        for _ in range(iterations):
+            default_body: bytes = JSONResponse(
+                await serialize_response(field = field, response_content = page)).body
+        default_time: float = (time.perf_counter() - started) / iterations
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fast_body: bytes = util.FastJSONResponse(page).body
+        fast_time: float = (time.perf_counter() - started) / iterations
+        log.info("%d item page; default %.1f us, fast %.1f us (%.1fx)"
+                 % (len(items), default_time * 1000000, fast_time * 1000000,
+                    default_time / fast_time,))
+        if json.loads(default_body) != json.loads(fast_body):
+            log.error("fast response body differs from the default!")
+            raise typer.Exit(code = 1)
+    # run until complete.
+    asyncio.get_event_loop()\
+        .run_until_complete(_async_bench_serialisation())
+
+
+@wrapper.command()
+def check_query_plans():
+    """Explain every selector query, as each route would run it, against the
+    current database, and fail if any reads a table with a full scan rather
+    than through an index. The makes query has no criteria, so may scan. The
+    same check runs in the test suite.
+    """
+    async def _async_check_query_plans() -> bool:
+        all_indexed: bool = True
+        async with database.async_session() as sesh:
+            explained = await database.explain_selector_queries(sesh)
+        for route, (plan, uses_scan) in explained.items():
+            log.info("%s: %s" % (route, "; ".join(plan),))
+            if uses_scan:
+                log.error("%s query reads a table with a full scan!" % route)
+                all_indexed = False
+        return all_indexed
+    # run until complete.
+    all_indexed: bool = asyncio.get_event_loop()\
+        .run_until_complete(_async_check_query_plans())
+    if not all_indexed:
+        raise typer.Exit(code = 1)
+    log.info("done :)")
+
+
+async def _sample_selector_cases() -> List[Tuple]:
+    """Find a year model with vehicles, and return a case for each selector
+    route with args leading to it; a tuple of route name, response schema,
+    query builder and args.
+    """
+    from app.routes import schemas
+    item_types = {
+        "makes": schemas.VehicleMakeResponse,
+        "types": schemas.VehicleTypeResponse,
+        "models": schemas.VehicleModelResponse,
+        "years": schemas.VehicleYearModelResponse,
+        "stock": schemas.VehicleResponse
+    }
+    async with database.async_session() as sesh:
+        sample_args = await database.sample_selector_args(sesh)
+    return [
+        (route, item_types[route], database.SELECTOR_QUERY_BUILDERS[route], args)
+        for route, args in sample_args.items()
+    ]
+
+
 if __name__ == "__main__":
     wrapper()
\ No newline at end of file
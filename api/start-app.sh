@@ -1,9 +1,15 @@
 #!/bin/sh
 
+# Caches and the master generation must be shared with anything that updates
+# master, so keep them on the shared cache volume.
+export CACHE_DIRECTORY="${CACHE_DIRECTORY:-/var/csb/cache/}"
+mkdir -p "$CACHE_DIRECTORY"
+
 # Ensure database schema is created.
 python manage.py init-db
 
-# Import/update master data.
+# Import/update master data. If STATIC_DIRECTORY is set, this also exports
+# selector responses for the web server to serve statically.
 python manage.py update-master
 
 # Invoke gunicorn with our configuration.
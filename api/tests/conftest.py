@@ -1,3 +1,18 @@
+import os
+import tempfile
+
+# the app is configured as it is imported, so point it at the tests' own
+# database and cache directory first.
+_TEST_DIRECTORY = tempfile.mkdtemp(prefix = "csb-tests-")
+_REPO_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ["APP_ENV"] = "Test"
+os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite+aiosqlite:///%s" \
+    % os.path.join(_TEST_DIRECTORY, "csb.sqlite")
+os.environ["CACHE_DIRECTORY"] = os.path.join(_TEST_DIRECTORY, "cache")
+os.environ["MASTER_DIRECTORY"] = os.path.join(_REPO_DIRECTORY, "data", "master")
+os.environ["CONTENT_DIRECTORY"] = os.path.join(_REPO_DIRECTORY, "data", "content")
+
+import asyncio
 import pytest
 
 from typing import Dict, Generator, Tuple
@@ -6,6 +21,54 @@ from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
+from app import cache, config, create_app, database
+from app.data import vehicles
+
+
+@pytest.fixture(scope = "session")
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture(scope = "session")
+def test_directory() -> str:
+    """The directory holding the tests' database and caches."""
+    return _TEST_DIRECTORY
+
+
+@pytest.fixture(scope = "session")
+def master_path() -> str:
+    """The path to the bundled vehicle master."""
+    return os.path.join(config.MASTER_DIRECTORY, "vehicles.json")
+
+
+async def create_schema():
+    """Drop and create every table and index in the tests' database."""
+    async with database.async_engine.begin() as conn:
+        await conn.run_sync(database.Model.metadata.drop_all)
+        await conn.run_sync(database.Model.metadata.create_all)
+        await conn.run_sync(database.ensure_columns)
+        await conn.run_sync(database.ensure_indexes)
+
+
+@pytest.fixture(scope = "session")
+def master_database(master_path: str) -> None:
+    """Create the tests' database, and import the bundled master into it."""
+    async def _import_master():
+        await create_schema()
+        async with database.async_session() as sesh, sesh.begin():
+            await vehicles.import_vehicles_from(sesh, master_path)
+        cache.invalidate_master()
+    asyncio.run(_import_master())
+
+
+@pytest.fixture(scope = "function")
+def client(master_database: None) -> Generator[TestClient, None, None]:
+    """A client for a new app, serving the bundled master."""
+    with TestClient(create_app()) as c:
+        yield c
+
+
 '''from ..app import create_app, dependencies, vehicles
 from ..app.models import SessionLocal, init_database
 
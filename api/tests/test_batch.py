@@ -0,0 +1,76 @@
+import pytest
+import sqlite3
+
+from typing import List
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, make_url
+from sqlalchemy.engine import Engine
+
+from app import config
+
+
+def _stock_ids(client: TestClient, num_ids: int) -> List[str]:
+    """Return the IDs of the first few vehicles in the stock of the first
+    selection.
+    """
+    snapshot = client.get("/api/vehicles/snapshot").json()
+    return [vehicle["id"] for vehicle in snapshot["stock"][:num_ids]]
+
+
+def test_batch_returns_requested_order_once(client: TestClient):
+    """Ensure a batch returns vehicles in the order requested, each once even
+    if requested more than once, and reports missing IDs once.
+    """
+    first, second = _stock_ids(client, 2)
+    response = client.post("/api/vehicles/batch",
+        json = {"ids": [second, "missing", first, second, "missing"]})
+    assert response.status_code == 200
+    response_json = response.json()
+    assert [vehicle["id"] for vehicle in response_json["items"]] == [second, first]
+    assert response_json["missing"] == ["missing"]
+    assert all(vehicle["title"] and vehicle["yearModelSpec"]
+               for vehicle in response_json["items"])
+
+
+def test_batch_reads_vehicles_without_joins(client: TestClient):
+    """Ensure a batch reads only the vehicle table, as everything in the
+    response is stored on each vehicle.
+    """
+    ids = _stock_ids(client, 2)
+    statements: List[str] = []
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(Engine, "before_cursor_execute", _record)
+    try:
+        assert client.post("/api/vehicles/batch", json = {"ids": ids}).status_code == 200
+    finally:
+        event.remove(Engine, "before_cursor_execute", _record)
+    vehicle_statements = [statement for statement in statements
+                          if "FROM vehicle" in statement]
+    assert len(vehicle_statements) == 1
+    assert "JOIN" not in vehicle_statements[0]
+
+
+def test_batch_serves_unmaterialised_vehicles(client: TestClient):
+    """Ensure a vehicle stored before its title and year model spec columns
+    existed, so both are still null, is served with neither rather than
+    failing.
+    """
+    vehicle_id, = _stock_ids(client, 1)
+    database_path: str = make_url(config.SQLALCHEMY_DATABASE_URI).database
+    with sqlite3.connect(database_path) as conn:
+        title, year_model_spec = conn.execute(
+            "SELECT title, year_model_spec FROM vehicle WHERE id = ?",
+            (vehicle_id,)).fetchone()
+        conn.execute("UPDATE vehicle SET title = NULL, year_model_spec = NULL "\
+                     "WHERE id = ?", (vehicle_id,))
+    try:
+        response = client.post("/api/vehicles/batch", json = {"ids": [vehicle_id]})
+        assert response.status_code == 200
+        vehicle = response.json()["items"][0]
+        assert vehicle["title"] is None and vehicle["yearModelSpec"] is None
+    finally:
+        with sqlite3.connect(database_path) as conn:
+            conn.execute("UPDATE vehicle SET title = ?, year_model_spec = ? "\
+                         "WHERE id = ?", (title, year_model_spec, vehicle_id,))
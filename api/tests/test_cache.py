@@ -0,0 +1,130 @@
+import asyncio
+import pytest
+
+from app import cache
+
+
+class TestLRUCache():
+    def test_evicts_least_recently_used(self):
+        """Ensure a full cache evicts its least recently used entry, where a
+        get counts as a use.
+        """
+        lru = cache.LRUCache(max_entries = 2, max_bytes = 1024)
+        lru.set("a", 1, 1)
+        lru.set("b", 2, 1)
+        assert lru.get("a") == 1
+        lru.set("c", 3, 1)
+        assert lru.get("b") is None
+        assert lru.get("a") == 1
+        assert lru.get("c") == 3
+        assert lru.stats() == dict(entries = 2, bytes = 2, hits = 3, misses = 1,
+                                   evictions = 1)
+
+    def test_evicts_by_size(self):
+        """Ensure entries are evicted until the cache is within its byte bound,
+        and values larger than the whole cache are never cached.
+        """
+        lru = cache.LRUCache(max_entries = 10, max_bytes = 10)
+        lru.set("a", "a", 4)
+        lru.set("b", "b", 4)
+        lru.set("c", "c", 4)
+        assert lru.get("a") is None
+        assert lru.stats()["bytes"] == 8
+        lru.set("huge", "huge", 11)
+        assert lru.get("huge") is None
+        assert lru.get("b") == "b"
+
+    def test_replacing_entry_keeps_size(self):
+        """Ensure setting an existing key replaces its size, not adds to it."""
+        lru = cache.LRUCache(max_entries = 10, max_bytes = 10)
+        lru.set("a", "a", 6)
+        lru.set("a", "aa", 8)
+        assert lru.stats()["bytes"] == 8
+        assert lru.get("a") == "aa"
+
+    def test_clear_keeps_counters(self):
+        """Ensure clearing drops every entry, but not the counters."""
+        lru = cache.LRUCache(max_entries = 10, max_bytes = 10)
+        lru.set("a", "a", 1)
+        lru.get("a")
+        lru.clear()
+        assert lru.get("a") is None
+        assert lru.stats() == dict(entries = 0, bytes = 0, hits = 1, misses = 1,
+                                   evictions = 0)
+
+
+class TestSingleFlight():
+    @pytest.mark.anyio
+    async def test_followers_coalesce(self):
+        """Ensure callers arriving while a flight is in progress await its
+        result, rather than running the work again.
+        """
+        flights = cache.SingleFlight()
+        num_runs: int = 0
+        async def _work():
+            nonlocal num_runs
+            num_runs += 1
+            await asyncio.sleep(0.01)
+            return num_runs
+        results = await asyncio.gather(*[flights.run("key", _work) for _ in range(5)])
+        assert results == [1] * 5
+        assert flights.stats() == dict(in_flight = 0, leads = 1, coalesced = 4)
+        # a later call is a new flight.
+        assert await flights.run("key", _work) == 2
+
+    @pytest.mark.anyio
+    async def test_cancelled_leader_hands_over(self):
+        """Ensure followers of a cancelled leader run the work themselves,
+        once between them.
+        """
+        flights = cache.SingleFlight()
+        num_runs: int = 0
+        started = asyncio.Event()
+        async def _work():
+            nonlocal num_runs
+            num_runs += 1
+            started.set()
+            await asyncio.sleep(0.01)
+            return num_runs
+        leader = asyncio.create_task(flights.run("key", _work))
+        await started.wait()
+        followers = [asyncio.create_task(flights.run("key", _work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert await asyncio.gather(*followers) == [2] * 3
+        assert flights.stats() == dict(in_flight = 0, leads = 2, coalesced = 2)
+
+    @pytest.mark.anyio
+    async def test_exception_reaches_followers(self):
+        """Ensure the leader's exception is raised to each of its followers,
+        and that the next call runs the work again.
+        """
+        flights = cache.SingleFlight()
+        num_runs: int = 0
+        async def _work():
+            nonlocal num_runs
+            num_runs += 1
+            await asyncio.sleep(0.01)
+            raise ValueError("failed")
+        results = await asyncio.gather(*[flights.run("key", _work) for _ in range(3)],
+            return_exceptions = True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert num_runs == 1
+        with pytest.raises(ValueError):
+            await flights.run("key", _work)
+        assert num_runs == 2
+
+
+def test_master_change_expires_selector_cache():
+    """Ensure selector pages only live until the master generation changes;
+    once another process bumps it, this process drops its cached pages.
+    """
+    cache.refresh_master_generation()
+    cache.selector_cache.set(("page",), "page", 4)
+    assert cache.refresh_master_generation() is False
+    assert cache.selector_cache.get(("page",)) == "page"
+    cache.master_generation.bump()
+    assert cache.refresh_master_generation() is True
+    assert cache.selector_cache.get(("page",)) is None
@@ -0,0 +1,106 @@
+import pytest
+import re
+
+from typing import List
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+
+from app import database
+from app.data import selector
+from app.routes import schemas
+
+
+def test_cursor_round_trips():
+    """Ensure keyset values survive being encoded as a cursor."""
+    values = ["Mazda", "mazda-GANMfBBPNc", 2004, 2.5]
+    assert database.decode_cursor(database.encode_cursor(values), 4) == values
+
+
+@pytest.mark.parametrize("cursor", [
+    "!!not base64!!",
+    "bm90IGpzb24",
+    database.encode_cursor({"name": "Mazda"}),
+    database.encode_cursor(["Mazda"]),
+    database.encode_cursor(["Mazda", "mazda", "extra"]),
+    database.encode_cursor([{"name": "Mazda"}, "mazda"]),
+    database.encode_cursor([None, "mazda"]),
+])
+def test_malformed_cursor_is_invalid(cursor: str):
+    """Ensure malformed and tampered cursors are rejected as invalid."""
+    with pytest.raises(database.errors.InvalidCursorException):
+        database.decode_cursor(cursor, 2)
+
+
+@pytest.mark.parametrize("cursor", [
+    "!!not base64!!",
+    database.encode_cursor(["Mazda"]),
+    database.encode_cursor([["Mazda"], "mazda"]),
+])
+def test_malformed_cursor_is_bad_request(client: TestClient, cursor: str):
+    """Ensure a route given a malformed or tampered cursor responds with 400,
+    not a server error.
+    """
+    response = client.get("/api/vehicles/makes/cursor",
+        params = {"cursor": cursor})
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+async def test_keyset_pages_across_equal_keys(master_database: None, size: int):
+    """Ensure paging by keyset through rows sharing sort keys, like every year
+    model of every make ordered by year, neither skips nor repeats a row.
+    """
+    def _build_query():
+        return select(database.VehicleYearModel)
+    async with database.async_read_session() as sesh:
+        result = await sesh.execute(_build_query()
+            .order_by(*database.KEYSET_ORDERS["years"]))
+        year_models = result.scalars().all()
+        expected = [year_model.id for year_model in year_models]
+        ids = []
+        cursor = None
+        while True:
+            items, cursor, _ = await database.paginate_keyset(sesh, "years",
+                schemas.VehicleYearModelResponse, _build_query,
+                cursor = cursor, size = size)
+            assert len(items) <= size
+            ids.extend(item.id for item in items)
+            if cursor is None:
+                break
+    # there must be equal years for this to test anything.
+    assert len(set(year_model.year for year_model in year_models)) < len(expected)
+    assert ids == expected
+
+
+@pytest.mark.anyio
+async def test_keyset_pages_are_projected(master_database: None):
+    """Ensure paging by keyset selects only the columns each route's response
+    needs, and still pages through every option.
+    """
+    statements: List[str] = []
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    sync_engine = database.async_engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _on_execute)
+    try:
+        async with database.async_read_session() as sesh:
+            args = await database.sample_selector_args(sesh)
+            for route, item_type, build_query, _, _ in selector.SELECTOR_LEVELS:
+                expected = await database.select_selector_options(sesh, route,
+                    item_type, build_query, *args[route])
+                statements.clear()
+                items, cursor = [], None
+                while True:
+                    page, cursor, _ = await database.paginate_keyset(sesh, route,
+                        item_type, build_query, *args[route], cursor = cursor, size = 1)
+                    items.extend(page)
+                    if cursor is None:
+                        break
+                assert items == expected
+                for statement in statements:
+                    selected: str = re.match(r"SELECT (.*?)\s+FROM", statement, re.S).group(1)
+                    assert selected.count(",") + 1 == len(database.PROJECTIONS[route])
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", _on_execute)
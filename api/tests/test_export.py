@@ -0,0 +1,102 @@
+import asyncio
+import gzip
+import json
+import os
+import pytest
+
+from fastapi.testclient import TestClient
+from typer.testing import CliRunner
+
+from app import config, database
+from app.data import export
+
+
+def _exported_files(directory: str):
+    """Return the paths of every file in the given directory, relative to it."""
+    return {
+        os.path.relpath(os.path.join(root, filename), directory)
+        for root, _, filenames in os.walk(directory) for filename in filenames
+    }
+
+
+def test_static_page_path_layout():
+    """Ensure pages are laid out by route, then each arg, then page and size."""
+    assert export.static_page_path("makes", (), 1, 25) == \
+        os.path.join("vehicles", "makes", "page-1-25.json")
+    assert export.static_page_path("years", ("mazda-x", "car", "mazda-6",), 2, 10) == \
+        os.path.join("vehicles", "years", "mazda-x", "car", "mazda-6", "page-2-10.json")
+
+
+@pytest.mark.anyio
+async def test_export_writes_pages_and_siblings(master_database: None, tmp_path):
+    """Ensure every page of every route is exported, each with compressed
+    siblings of the same body.
+    """
+    directory = str(tmp_path / "static")
+    async with database.async_session() as sesh:
+        num_pages = await export.export_static(sesh, directory, page_size = 2)
+    assert set(num_pages.keys()) == set(export.EXPORTED_ROUTES.keys())
+    files = _exported_files(directory)
+    json_files = {path for path in files if path.endswith(".json")}
+    assert len(json_files) == sum(num_pages.values())
+    for path in json_files:
+        with open(os.path.join(directory, path), "rb") as r:
+            body = r.read()
+        with gzip.open(os.path.join(directory, path + ".gz"), "rb") as r:
+            assert r.read() == body
+        assert (path + ".br" in files) == (export.brotli is not None)
+    with open(os.path.join(directory, export.static_page_path("makes", (), 1, 2)), "r") as r:
+        makes_page = json.load(r)
+    assert makes_page["page"] == 1 and makes_page["size"] == 2
+    assert len(makes_page["items"]) == min(2, makes_page["total"])
+
+
+@pytest.mark.anyio
+async def test_export_replaces_previous_export(master_database: None, tmp_path):
+    """Ensure an export is swapped in for the previous one whole, leaving
+    nothing of it, nor any working directory, behind.
+    """
+    directory = tmp_path / "static"
+    os.makedirs(directory / "vehicles" / "makes")
+    (directory / "vehicles" / "makes" / "page-9-2.json").write_text("{}")
+    async with database.async_session() as sesh:
+        await export.export_static(sesh, str(directory), page_size = 2)
+    assert not (directory / "vehicles" / "makes" / "page-9-2.json").exists()
+    assert (directory / "vehicles" / "makes" / "page-1-2.json").exists()
+    assert os.listdir(tmp_path) == ["static"]
+
+
+def test_export_matches_api(client: TestClient, tmp_path):
+    """Ensure an exported page is the same page the API responds with."""
+    directory = str(tmp_path / "static")
+    async def _export():
+        async with database.async_session() as sesh:
+            await export.export_static(sesh, directory)
+    asyncio.run(_export())
+    with open(os.path.join(directory, export.static_page_path("makes", (), 1,
+                           config.DEFAULT_NUM_PER_PAGE)), "r") as r:
+        assert json.load(r) == client.get("/api/vehicles/makes").json()
+
+
+def test_update_master_re_exports(master_database: None, tmp_path, monkeypatch):
+    """Ensure updating the master replaces the static export, if there is a
+    static directory, so the web server doesn't keep serving the previous
+    master.
+    """
+    import manage
+    directory = tmp_path / "static"
+    os.makedirs(directory)
+    (directory / "stale.json").write_text("{}")
+    monkeypatch.setattr(config, "STATIC_DIRECTORY", str(directory))
+    # commands run on the current event loop, as they would in their own process.
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        result = CliRunner().invoke(manage.wrapper, ["update-master"])
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+    assert result.exit_code == 0, result.output
+    assert not (directory / "stale.json").exists()
+    assert (directory / export.static_page_path("makes", (), 1,
+            config.DEFAULT_NUM_PER_PAGE)).exists()
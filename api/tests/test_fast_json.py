@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+
+from typing import Any, Dict, List, Tuple
+
+from fastapi.testclient import TestClient
+
+from app import config, database
+from app.data import selector
+
+
+def _selector_requests() -> List[Tuple[str, Dict[str, Any]]]:
+    """Return the path and params of a request to every selector route, page
+    and cursor alike, for a sample selection, as well as the snapshot.
+    """
+    async def _sample_args():
+        async with database.async_read_session() as sesh:
+            return await database.sample_selector_args(sesh)
+    sample_args = asyncio.run(_sample_args())
+    requests: List[Tuple[str, Dict[str, Any]]] = []
+    for route, _, _, _, _ in selector.SELECTOR_LEVELS:
+        params: Dict[str, Any] = {
+            param: arg for (_, _, _, param, _), arg
+            in zip(selector.SELECTOR_LEVELS, sample_args[route])
+        }
+        requests.append(("/api/vehicles/%s" % route, params,))
+        requests.append(("/api/vehicles/%s/cursor" % route, dict(params, total = True),))
+    requests.append(("/api/vehicles/snapshot", {},))
+    return requests
+
+
+def test_fast_json_matches_response_model(client: TestClient, monkeypatch):
+    """Ensure every selector route responds with the same JSON whether it is
+    serialised straight from the page, or validated and serialised through
+    the route's response model by FastAPI; aliases and page metadata alike.
+    """
+    for path, params in _selector_requests():
+        responses = []
+        for fast_json in (True, False,):
+            monkeypatch.setattr(config, "FAST_JSON_RESPONSES", fast_json)
+            response = client.get(path, params = params)
+            assert response.status_code == 200, path
+            responses.append(response.json())
+        fast, model = responses
+        assert fast == model, path
+        if "items" in model:
+            assert model["items"], path
+        if path.startswith("/api/vehicles/stock"):
+            assert "yearModelSpec" in fast["items"][0]
+
+
+def test_fast_json_matches_response_model_for_search_and_batch(client: TestClient,
+                                                               monkeypatch):
+    """Ensure search and batch responses are the same JSON either way too."""
+    responses = []
+    for fast_json in (True, False,):
+        monkeypatch.setattr(config, "FAST_JSON_RESPONSES", fast_json)
+        found = client.get("/api/vehicles/search", params = {"q": "mazda 6"}).json()
+        batch = client.post("/api/vehicles/batch",
+            json = {"ids": [vehicle["id"] for vehicle in found[:3]] + ["missing"]}).json()
+        responses.append((found, batch,))
+    assert responses[0] == responses[1]
+    assert responses[0][0] and responses[0][1]["missing"] == ["missing"]
@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+
+from fastapi.testclient import TestClient
+
+from app import cache, config
+from app.data import logos
+
+
+def _make_id(client: TestClient) -> str:
+    """Return the ID of the first make."""
+    return client.get("/api/vehicles/makes").json()["items"][0]["id"]
+
+
+def test_content_hashed_logo_is_immutable(client: TestClient):
+    """Ensure a logo on disk is validated by its contents, and may be cached
+    for good, including when answered with 304.
+    """
+    response = client.get("/api/logo/%s" % _make_id(client))
+    assert response.status_code == 200
+    assert "immutable" in response.headers["cache-control"]
+    not_modified = client.get("/api/logo/%s" % _make_id(client),
+        headers = {"If-None-Match": response.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["cache-control"] == response.headers["cache-control"]
+
+
+def test_missing_logo_is_revalidated(client: TestClient, tmp_path, monkeypatch):
+    """Ensure a logo that isn't on disk, whose ETag can't follow its contents,
+    must always be revalidated.
+    """
+    monkeypatch.setattr(config, "CONTENT_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(config, "USING_NGINX", True)
+    monkeypatch.setattr(logos, "_logos", None)
+    response = client.get("/api/logo/%s" % _make_id(client))
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    not_modified = client.get("/api/logo/%s" % _make_id(client),
+        headers = {"If-None-Match": response.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["cache-control"] == "no-cache"
+
+
+@pytest.mark.anyio
+async def test_concurrent_lookups_reload_once(master_database: None, monkeypatch):
+    """Ensure lookups arriving while the logos are being reloaded await that
+    reload, rather than each starting their own.
+    """
+    num_reloads: int = 0
+    reload = logos.reload
+    async def _reload():
+        nonlocal num_reloads
+        num_reloads += 1
+        await asyncio.sleep(0.05)
+        await reload()
+    monkeypatch.setattr(logos, "reload", _reload)
+    monkeypatch.setattr(logos, "_logos", None)
+    found = await asyncio.gather(*[logos.find_logo("missing") for _ in range(5)])
+    assert found == [None] * 5
+    assert num_reloads == 1
+    # a new master generation reloads the logos again, once.
+    cache.invalidate_master()
+    await asyncio.gather(*[logos.find_logo("missing") for _ in range(5)])
+    assert num_reloads == 2
@@ -0,0 +1,146 @@
+import json
+import pytest
+
+from sqlalchemy import delete, event, inspect, select, text, update
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import database, datamodels as data
+from app.data import vehicles
+
+
+def test_hash_rounds_numerics_half_up():
+    """Ensure a numeric past its column's scale hashes the same as it does
+    once the database has rounded it half up; displacement is NUMERIC(3, 1).
+    """
+    table = database.Vehicle.__table__
+    assert database.hash_master_row(table, {"id": "v", "displacement": 2.25}) == \
+        database.hash_master_row(table, {"id": "v", "displacement": "2.3"})
+    assert database.hash_master_row(table, {"id": "v", "displacement": 2.24}) == \
+        database.hash_master_row(table, {"id": "v", "displacement": "2.2"})
+
+
+@pytest.mark.anyio
+async def test_reimport_is_unchanged(master_database: None, master_path: str):
+    """Ensure importing the same master again, on top of itself, finds no
+    row to insert, update or delete.
+    """
+    master = await vehicles.read_vehicles_from(master_path)
+    async with database.async_session() as sesh, sesh.begin():
+        changes = await vehicles.diff_update_vehicles(sesh, master, delete = True)
+        await sesh.rollback()
+    assert changes
+    for table_name, table_changes in changes.items():
+        assert (table_changes.inserted, table_changes.updated,
+                table_changes.deleted,) == (0, 0, 0,), table_name
+        assert table_changes.unchanged > 0, table_name
+
+
+@pytest.mark.anyio
+async def test_refresh_writes_only_changed_read_rows(master_database: None):
+    """Ensure refreshing the read tables after a single vehicle changes, or
+    is deleted, writes only that vehicle's stock row, and leaves every other
+    read table row alone.
+    """
+    statements = []
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith(("INSERT", "UPDATE", "DELETE",)):
+            statements.append((statement, parameters,))
+    sync_engine = database.async_engine.sync_engine
+    async with database.async_session() as sesh, sesh.begin():
+        changed_id, deleted_id = (await sesh.scalars(
+            select(database.Vehicle.id).order_by(database.Vehicle.id).limit(2))).all()
+        # nothing has changed yet, so nothing is written.
+        event.listen(sync_engine, "before_cursor_execute", _on_execute)
+        try:
+            changes = await database.refresh_read_tables(sesh)
+            assert statements == []
+            assert all(table_changes.unchanged > 0 and not (table_changes.inserted
+                       or table_changes.updated or table_changes.deleted)
+                       for table_changes in changes.values())
+
+            await sesh.execute(update(database.Vehicle)
+                .where(database.Vehicle.id == changed_id).values(badge = "Changed"))
+            await sesh.execute(delete(database.Vehicle)
+                .where(database.Vehicle.id == deleted_id))
+            statements.clear()
+            changes = await database.refresh_read_tables(sesh)
+            stock_changes = changes[database.VehicleStock.__tablename__]
+            assert (stock_changes.inserted, stock_changes.updated,
+                    stock_changes.deleted,) == (0, 1, 1,)
+            make_type_changes = changes[database.VehicleMakeType.__tablename__]
+            assert (make_type_changes.inserted, make_type_changes.updated,
+                    make_type_changes.deleted,) == (0, 0, 0,)
+            assert len(statements) == 2
+            upsert_parameters = statements[0][1]
+            assert len(upsert_parameters) == len(database.VehicleStock.__table__.columns)
+            assert changed_id in upsert_parameters
+            assert statements[1][1] == (deleted_id,)
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", _on_execute)
+        badge = await sesh.scalar(select(database.VehicleStock.badge)
+            .where(database.VehicleStock.id == changed_id))
+        assert badge == "Changed"
+        await sesh.rollback()
+
+
+@pytest.mark.anyio
+async def test_types_must_precede_makes(master_database: None, master_path: str,
+                                        tmp_path):
+    """Ensure a master listing its makes before their types is rejected with
+    a clear error, before any make is written.
+    """
+    with open(master_path, "r") as r:
+        master = json.load(r)
+    reordered_path = tmp_path / "vehicles.json"
+    with open(reordered_path, "w") as w:
+        json.dump({"makes": master["makes"], "types": master["types"],
+                   "years": master["years"]}, w)
+    async with database.async_session() as sesh, sesh.begin():
+        with pytest.raises(database.errors.UnknownVehicleTypeException):
+            await vehicles.import_vehicles_from(sesh, reordered_path)
+        await sesh.rollback()
+
+
+@pytest.mark.anyio
+async def test_differential_import_requires_bulk(master_database: None,
+                                                 master_path: str):
+    """Ensure a differential import refuses to write without bulk."""
+    async with database.async_session() as sesh:
+        with pytest.raises(ValueError):
+            await vehicles.import_vehicles_from(sesh, master_path,
+                differential = True, bulk = False)
+
+
+@pytest.mark.parametrize("changes", [
+    {"motor_type": "electric"},
+    {"motor_type": "steam"},
+    {"trans_type": "CVT"},
+])
+def test_unsupported_car_fails_year_model_spec(changes):
+    """Ensure a car whose options can't be described fails, rather than being
+    stored without a year model spec.
+    """
+    car = data.Car.model_validate(dict({
+        "vehicle_uid": "v", "year_model_uid": "ym", "type_id": "car",
+        "motor_type": "piston", "trans_type": "M", "num_gears": 6,
+        "displacement": 3.0, "induction": "T", "badge": "RZ"
+    }, **changes))
+    with pytest.raises(NotImplementedError):
+        car.year_model_spec()
+
+
+@pytest.mark.anyio
+async def test_ensure_columns_adds_missing_columns(tmp_path):
+    """Ensure a nullable column missing from an existing table is added."""
+    engine = create_async_engine("sqlite+aiosqlite:///%s" % (tmp_path / "csb.sqlite"))
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(database.Model.metadata.create_all)
+            await conn.execute(text("ALTER TABLE vehicle_stock DROP COLUMN year_model_spec"))
+            added = await conn.run_sync(database.ensure_columns)
+            columns = await conn.run_sync(lambda sync_conn:
+                [column["name"] for column in inspect(sync_conn).get_columns("vehicle_stock")])
+    finally:
+        await engine.dispose()
+    assert added == ["vehicle_stock.year_model_spec"]
+    assert "year_model_spec" in columns
@@ -0,0 +1,43 @@
+import pytest
+
+from fastapi.testclient import TestClient
+
+from app import config
+
+
+@pytest.mark.parametrize("path", ["/api/vehicles/makes", "/api/vehicles/snapshot"])
+@pytest.mark.parametrize("accept_encoding", ["gzip", "identity"])
+@pytest.mark.parametrize("validator", ["if-none-match", "if-modified-since"])
+def test_not_modified_repeats_validators(client: TestClient, path: str,
+                                         accept_encoding: str, validator: str):
+    """Ensure a response's ETag is only weak if its body was compressed, and
+    that a 304 repeats exactly the ETag its 200 was sent with, and varies by
+    Accept-Encoding just the same.
+    """
+    assert config.COMPRESSION_ENABLED
+    response = client.get(path, headers = {"Accept-Encoding": accept_encoding})
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    compressed: bool = response.headers.get("content-encoding", None) == "gzip"
+    assert compressed == (accept_encoding == "gzip" and
+                          len(response.content) >= config.COMPRESSION_MINIMUM_SIZE)
+    assert etag.startswith("W/") == compressed
+    assert "Accept-Encoding" in response.headers["vary"]
+
+    validator_value = etag if validator == "if-none-match" \
+        else response.headers["last-modified"]
+    not_modified = client.get(path,
+        headers = {"Accept-Encoding": accept_encoding, validator: validator_value})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert "Accept-Encoding" in not_modified.headers["vary"]
+
+
+def test_compressed_and_small_responses(client: TestClient):
+    """Ensure both a compressed and an uncompressed response are covered
+    above, so both ETag forms are.
+    """
+    small = client.get("/api/vehicles/makes", headers = {"Accept-Encoding": "gzip"})
+    large = client.get("/api/vehicles/snapshot", headers = {"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert large.headers["content-encoding"] == "gzip"
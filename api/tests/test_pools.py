@@ -0,0 +1,106 @@
+import pytest
+
+from fastapi.testclient import TestClient
+from sqlalchemy import pool, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import config
+from app.database import session
+
+
+@pytest.mark.parametrize("url,pool_class", [
+    ("sqlite+aiosqlite:////tmp/csb.sqlite", pool.NullPool,),
+    ("sqlite+aiosqlite://", pool.StaticPool,),
+    ("postgresql+asyncpg://csb@localhost/csb", pool.AsyncAdaptedQueuePool,),
+    ("mysql+aiomysql://csb@localhost/csb", pool.AsyncAdaptedQueuePool,),
+])
+def test_default_pool_class_per_dialect(monkeypatch, url: str, pool_class):
+    """Ensure that if no pool class is configured, the URL's dialect's own
+    default is used.
+    """
+    monkeypatch.setattr(config, "SQLALCHEMY_POOLCLASS", None)
+    assert session.resolve_pool_class(url) is pool_class
+
+
+@pytest.mark.parametrize("configured,pool_class", [
+    ("NullPool", pool.NullPool,),
+    ("AsyncAdaptedQueuePool", pool.AsyncAdaptedQueuePool,),
+    (pool.StaticPool, pool.StaticPool,),
+])
+def test_configured_pool_class(monkeypatch, configured, pool_class):
+    """Ensure a pool class configured by name, or as a class, is used."""
+    monkeypatch.setattr(config, "SQLALCHEMY_POOLCLASS", configured)
+    assert session.resolve_pool_class("postgresql+asyncpg://csb@localhost/csb") \
+        is pool_class
+
+
+@pytest.mark.parametrize("configured", ["NoSuchPool", "ConnectionPoolEntry"])
+def test_unknown_pool_class_is_refused(monkeypatch, configured: str):
+    """Ensure a configured name that isn't a pool class is refused."""
+    monkeypatch.setattr(config, "SQLALCHEMY_POOLCLASS", configured)
+    with pytest.raises(ValueError):
+        session.resolve_pool_class("sqlite+aiosqlite://")
+
+
+def test_queue_pool_options(monkeypatch):
+    """Ensure a queue pool is given its size, overflow and timeout, while
+    other pools are given only the options they accept.
+    """
+    monkeypatch.setattr(config, "SQLALCHEMY_POOLCLASS", "AsyncAdaptedQueuePool")
+    options = session.engine_options("postgresql+asyncpg://csb@localhost/csb")
+    assert options["poolclass"] is pool.AsyncAdaptedQueuePool
+    assert (options["pool_size"], options["max_overflow"], options["pool_timeout"],) == \
+        (config.SQLALCHEMY_POOL_SIZE, config.SQLALCHEMY_MAX_OVERFLOW,
+         config.SQLALCHEMY_POOL_TIMEOUT,)
+    assert options["pool_pre_ping"] == config.SQLALCHEMY_POOL_PRE_PING
+    assert options["pool_recycle"] == config.SQLALCHEMY_POOL_RECYCLE
+
+    monkeypatch.setattr(config, "SQLALCHEMY_POOLCLASS", "NullPool")
+    options = session.engine_options("postgresql+asyncpg://csb@localhost/csb")
+    assert options["poolclass"] is pool.NullPool
+    assert not {"pool_size", "max_overflow", "pool_timeout"} & set(options.keys())
+
+
+@pytest.mark.anyio
+async def test_pool_options_reach_engine(monkeypatch, tmp_path):
+    """Ensure an engine created with the options has the configured pool,
+    and that its counters and stats follow connections in and out of it.
+    """
+    monkeypatch.setattr(config, "SQLALCHEMY_POOLCLASS", "AsyncAdaptedQueuePool")
+    monkeypatch.setattr(config, "SQLALCHEMY_POOL_SIZE", 3)
+    url = "sqlite+aiosqlite:///%s" % (tmp_path / "pool.sqlite")
+    engine = create_async_engine(url, **session.engine_options(url))
+    counters = session.PoolCounters(engine)
+    try:
+        assert isinstance(engine.pool, pool.AsyncAdaptedQueuePool)
+        assert engine.pool.size() == 3
+        async with engine.connect() as first, engine.connect() as second:
+            await first.execute(text("SELECT 1"))
+            await second.execute(text("SELECT 1"))
+            assert counters.in_use == 2
+            stats = session.pool_stats(engine, counters)
+            assert stats["checked_out"] == 2
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        assert counters.in_use == 0
+        stats = session.pool_stats(engine, counters)
+        assert stats["pool_class"] == "AsyncAdaptedQueuePool"
+        assert (stats["size"], stats["max_overflow"],) == \
+            (3, config.SQLALCHEMY_MAX_OVERFLOW,)
+        # the third checkout reuses a pooled connection.
+        assert (stats["connects"], stats["checkouts"], stats["checked_in"],) == (2, 3, 2,)
+    finally:
+        await engine.dispose()
+
+
+def test_health_pool_reports_each_engine(client: TestClient):
+    """Ensure pool stats are reported for the primary, by their aliases, with
+    sizes omitted for pools that don't queue connections.
+    """
+    client.get("/api/vehicles/makes")
+    response = client.get("/api/health/pool")
+    assert response.status_code == 200
+    primary = response.json()["primary"]
+    assert primary["poolClass"] == "NullPool"
+    assert primary["size"] is None and primary["checkedOut"] is None
+    assert primary["connects"] > 0 and primary["checkouts"] >= primary["connects"]
@@ -0,0 +1,49 @@
+import pytest
+import shutil
+
+from sqlalchemy import make_url, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app import config, database
+
+
+@pytest.mark.anyio
+async def test_selector_queries_use_indexes(master_database: None):
+    """Ensure no selector query, as its route runs it, reads a table with a
+    full scan rather than through an index; every route but makes has
+    criteria an index serves.
+    """
+    async with database.async_read_session() as sesh:
+        explained = await database.explain_selector_queries(sesh)
+    assert set(explained.keys()) == set(database.SELECTOR_QUERY_BUILDERS.keys())
+    for route, (plan, uses_scan) in explained.items():
+        assert not uses_scan, "%s: %s" % (route, "; ".join(plan),)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("route,index_name", [
+    ("models", "ix_vehicle_model_make_type_name",),
+    ("years", "ix_vehicle_year_model_make_model_year",),
+    ("stock", "ix_vehicle_stock_selector",),
+])
+async def test_selector_query_uses_its_index(master_database: None, tmp_path,
+                                             route: str, index_name: str):
+    """Ensure each selector query is served by the index added for it, and
+    that without that index, on a copy of the database, the check reports a
+    full scan.
+    """
+    async with database.async_read_session() as sesh:
+        plan, uses_scan = (await database.explain_selector_queries(sesh))[route]
+    assert any(index_name in line for line in plan), "; ".join(plan)
+
+    copy_path = tmp_path / "csb.sqlite"
+    shutil.copyfile(make_url(config.SQLALCHEMY_DATABASE_URI).database, copy_path)
+    engine = create_async_engine("sqlite+aiosqlite:///%s" % copy_path)
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP INDEX %s" % index_name))
+        async with AsyncSession(engine) as sesh:
+            plan, uses_scan = (await database.explain_selector_queries(sesh))[route]
+    finally:
+        await engine.dispose()
+    assert uses_scan, "; ".join(plan)
@@ -0,0 +1,54 @@
+import pytest
+
+from sqlalchemy import select
+from sqlalchemy.exc import InvalidRequestError
+
+from app import database
+from app.database import session
+
+
+@pytest.mark.anyio
+async def test_connection_released_after_each_statement(master_database: None):
+    """Ensure a read session checks no connection out until its first
+    statement, checks one out for each statement, and releases it as soon as
+    the statement finishes, with its rows still readable.
+    """
+    counters = session.read_router.primary.counters
+    in_use, checkouts = counters.in_use, counters.checkouts
+    async with database.async_read_session() as sesh:
+        assert (counters.in_use, counters.checkouts,) == (in_use, checkouts,)
+        result = await sesh.execute(select(database.VehicleMake.id))
+        assert counters.in_use == in_use
+        assert counters.checkouts == checkouts + 1
+        # rows were buffered before the connection was released.
+        assert result.scalars().all()
+        assert await sesh.scalar(select(database.VehicleType.id).limit(1))
+        assert (await sesh.scalars(select(database.VehicleModel.id))).all()
+        assert counters.in_use == in_use
+        assert counters.checkouts == checkouts + 3
+    assert counters.in_use == in_use
+
+
+@pytest.mark.anyio
+async def test_read_session_rejects_writes(master_database: None):
+    """Ensure a read session refuses to flush changed, new or deleted
+    objects.
+    """
+    async with database.async_read_session() as sesh:
+        make = await sesh.scalar(select(database.VehicleMake).limit(1))
+        make.name = "changed"
+        with pytest.raises(InvalidRequestError):
+            await sesh.flush()
+    async with database.async_read_session() as sesh:
+        sesh.add(database.VehicleType(id = "read-only", name = "Read Only",
+            description = "never written"))
+        with pytest.raises(InvalidRequestError):
+            await sesh.flush()
+    async with database.async_read_session() as sesh:
+        make = await sesh.scalar(select(database.VehicleMake).limit(1))
+        await sesh.delete(make)
+        with pytest.raises(InvalidRequestError):
+            await sesh.flush()
+    async with database.async_read_session() as sesh:
+        assert await sesh.scalar(select(database.VehicleType)
+            .where(database.VehicleType.id == "read-only")) is None
@@ -0,0 +1,131 @@
+import pytest
+import shutil
+import sqlite3
+
+from typing import AsyncGenerator, List
+
+from fastapi.testclient import TestClient
+from sqlalchemy import make_url, select
+
+from app import cache, config, database
+from app.database import session
+
+
+def _make_replica(tmp_path, name: str) -> str:
+    """Copy the tests' database to a replica whose makes are all named after
+    it, such that reads show which database served them. Returns its URI.
+    """
+    path = tmp_path / ("%s.sqlite" % name)
+    shutil.copyfile(make_url(config.SQLALCHEMY_DATABASE_URI).database, path)
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE vehicle_make SET name = ?", (name,))
+    return "sqlite+aiosqlite:///%s" % path
+
+
+@pytest.fixture
+async def use_replicas(master_database: None, monkeypatch) -> AsyncGenerator:
+    """Returns a function that routes reads to replicas at the given URIs,
+    with the given routing policy and max lag, returning the new read router.
+    The max lag defaults to none, since the master was only just imported.
+    """
+    routers: List[session.ReadRouter] = []
+    def _use_replicas(
+        uris: List[str],
+        policy: str = "round_robin",
+        max_lag: float = 0
+    ) -> session.ReadRouter:
+        monkeypatch.setattr(config, "SQLALCHEMY_REPLICA_URIS", ",".join(uris))
+        monkeypatch.setattr(config, "REPLICA_ROUTING", policy)
+        monkeypatch.setattr(config, "REPLICA_MAX_LAG", max_lag)
+        router = session.build_read_router()
+        monkeypatch.setattr(session, "read_router", router)
+        routers.append(router)
+        return router
+    yield _use_replicas
+    for router in routers:
+        for replica in router.replicas:
+            await replica.engine.dispose()
+
+
+async def _read_make_name() -> str:
+    """Return the name of a make, read through a new read session."""
+    async with database.async_read_session() as sesh:
+        return await sesh.scalar(select(database.VehicleMake.name).limit(1))
+
+
+@pytest.mark.anyio
+async def test_reads_round_robin_replicas(use_replicas, tmp_path):
+    """Ensure reads are routed to each replica in turn, and never the primary."""
+    use_replicas([_make_replica(tmp_path, "replica-a"),
+                  _make_replica(tmp_path, "replica-b")])
+    assert [await _read_make_name() for _ in range(4)] == \
+        ["replica-a", "replica-b", "replica-a", "replica-b"]
+
+
+@pytest.mark.anyio
+async def test_reads_least_connections_replica(use_replicas, tmp_path):
+    """Ensure reads are routed to the replica with the fewest connections in
+    use.
+    """
+    router = use_replicas([_make_replica(tmp_path, "replica-a"),
+                           _make_replica(tmp_path, "replica-b")], "least_connections")
+    async with router.replicas[0].engine.connect():
+        assert await _read_make_name() == "replica-b"
+    async with router.replicas[1].engine.connect():
+        assert await _read_make_name() == "replica-a"
+
+
+@pytest.mark.anyio
+async def test_failed_replica_falls_back_to_primary(use_replicas, tmp_path, monkeypatch):
+    """Ensure a read that fails on a replica is run again on the primary, and
+    that the replica is skipped until the retry interval has passed.
+    """
+    # an empty database, on which every read fails.
+    broken = tmp_path / "broken.sqlite"
+    sqlite3.connect(broken).close()
+    router = use_replicas(["sqlite+aiosqlite:///%s" % broken])
+    primary_name: str = await _read_make_name()
+    assert primary_name
+    replica = router.replicas[0]
+    assert replica.unhealthy_until > 0
+    # skipped while unhealthy.
+    assert router.choose() is router.primary
+    assert await _read_make_name() == primary_name
+    # routed to again once the retry interval has passed.
+    monkeypatch.setattr(replica, "unhealthy_until", 0)
+    assert router.choose() is replica
+
+
+@pytest.mark.anyio
+async def test_reads_after_master_update_skip_lagging_replica(use_replicas, tmp_path, monkeypatch):
+    """Ensure that, for the max lag after the master generation changes, reads
+    are routed to the primary rather than to a replica still serving the rows
+    from before the update.
+    """
+    router = use_replicas([_make_replica(tmp_path, "stale")], max_lag = 30)
+    cache.invalidate_master()
+    assert router.choose() is router.primary
+    assert await _read_make_name() != "stale"
+    # routed to the replica again once it has had time to catch up.
+    monkeypatch.setattr(router, "max_lag", 0)
+    assert router.choose() is router.replicas[0]
+    assert await _read_make_name() == "stale"
+
+
+def test_lagging_replica_rows_not_cached(client: TestClient, tmp_path, monkeypatch):
+    """Ensure pages served straight after a master update are read from the
+    primary, such that a lagging replica's rows are never cached under the
+    new master generation.
+    """
+    expected = client.get("/api/vehicles/makes").json()
+    monkeypatch.setattr(config, "SQLALCHEMY_REPLICA_URIS", _make_replica(tmp_path, "stale"))
+    monkeypatch.setattr(config, "REPLICA_MAX_LAG", 30)
+    router = session.build_read_router()
+    monkeypatch.setattr(session, "read_router", router)
+    cache.invalidate_master()
+    assert client.get("/api/vehicles/makes").json() == expected
+    # once the replica is routed to, pages for this generation are still
+    # those read from the primary.
+    monkeypatch.setattr(router, "max_lag", 0)
+    assert router.choose() is router.replicas[0]
+    assert client.get("/api/vehicles/makes").json() == expected
@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+
+from typing import Any, List, Optional
+
+from fastapi.testclient import TestClient
+
+from app import cache, database
+from app.data import search
+from app.routes import schemas
+
+
+def _vehicle(vehicle_id: str, title: str, year_model_spec: str,
+             trans_type: Optional[str] = "M", **kwargs: Any) -> schemas.VehicleResponse:
+    return schemas.VehicleResponse(**dict(dict(
+        id = vehicle_id, vehicle_year_model_id = "ym-%s" % vehicle_id,
+        motor_type = "ice", trans_type = trans_type, num_gears = 6,
+        displacement = 3.0, version = None, induction = None, badge = None,
+        fuel_type = None, power = None, elec_type = None, title = title,
+        year_model_spec = year_model_spec), **kwargs))
+
+
+@pytest.fixture
+def index() -> search.SearchIndex:
+    """A small index over a few vehicles."""
+    vehicles = (
+        _vehicle("supra-94", "1994 Toyota Supra", "RZ 3.0L TT 6 spd Manual", badge = "RZ"),
+        _vehicle("supra-98", "1998 Toyota Supra", "RZ 3.0L TT 6 spd Manual", badge = "RZ"),
+        _vehicle("supra-auto", "1994 Toyota Supra", "SZ 3.0L NA 4 spd Automatic",
+                 trans_type = "A", badge = "SZ"),
+        _vehicle("super", "1994 Superb Wagon", "Base 2.0L NA 5 spd Manual"),
+    )
+    return search.SearchIndex(vehicles, (1994, 1998, 1994, 1994,), 1)
+
+
+def _ids(vehicles: List[schemas.VehicleResponse]) -> List[str]:
+    return [vehicle.id for vehicle in vehicles]
+
+
+def test_tokenise_keeps_decimals():
+    """Ensure text is split into lowercase tokens, keeping decimals whole."""
+    assert search.tokenise("RZ 3.0L T-6") == ["rz", "3.0", "l", "t", "6"]
+    assert search.tokenise(None) == []
+
+
+def test_matches_every_token_by_prefix(index: search.SearchIndex):
+    """Ensure a vehicle only matches if every query token prefixes one of its
+    tokens, including its two digit year and transmission words.
+    """
+    assert set(_ids(index.search("sup", 10))) == {"supra-94", "supra-98", "supra-auto", "super"}
+    assert _ids(index.search("94 supra manual", 10)) == ["supra-94"]
+    assert _ids(index.search("supra auto", 10)) == ["supra-auto"]
+    assert index.search("supra wagon", 10) == []
+    assert index.search("  ", 10) == []
+
+
+def test_exact_tokens_outrank_prefixes(index: search.SearchIndex):
+    """Ensure an exact token match outranks a prefix match, and that equal
+    scores rank the newest year first.
+    """
+    assert _ids(index.search("supra", 10))[:3] == ["supra-98", "supra-94", "supra-auto"]
+    assert _ids(index.search("super", 10)) == ["super"]
+    # equal prefix scores; newest first, then by title.
+    assert _ids(index.search("sup", 2)) == ["supra-98", "super"]
+
+
+def test_search_route(client: TestClient):
+    """Ensure the route finds vehicles by their title and spec, best first,
+    up to the limit, and validates its query.
+    """
+    response = client.get("/api/vehicles/search",
+        params = {"q": "2019 mazda 6 atenza 2.2", "limit": 5})
+    assert response.status_code == 200
+    results = response.json()
+    assert results and len(results) <= 5
+    for vehicle in results:
+        assert vehicle["title"] == "2019 Mazda 6"
+        assert vehicle["yearModelSpec"].startswith("Atenza 2.2L")
+    response = client.get("/api/vehicles/search", params = {"q": "maz", "limit": 3})
+    assert len(response.json()) == 3
+    assert client.get("/api/vehicles/search", params = {"q": ""}).status_code == 422
+    assert client.get("/api/vehicles/search",
+        params = {"q": "mazda", "limit": 101}).status_code == 422
+
+
+@pytest.mark.anyio
+async def test_concurrent_lookups_build_once(master_database: None, monkeypatch):
+    """Ensure lookups arriving while the index is being built for a new
+    master generation await that build, rather than each building their own.
+    """
+    num_loads: int = 0
+    load = search.SearchIndex.load
+    async def _load(sesh, generation):
+        nonlocal num_loads
+        num_loads += 1
+        await asyncio.sleep(0.05)
+        return await load(sesh, generation)
+    monkeypatch.setattr(search.SearchIndex, "load", _load)
+    monkeypatch.setattr(search, "_index", None)
+    async def _current():
+        async with database.async_read_session() as sesh:
+            return await search.current(sesh)
+    indexes = await asyncio.gather(*[_current() for _ in range(5)])
+    assert num_loads == 1
+    assert all(index is indexes[0] for index in indexes)
+    assert indexes[0].generation == cache.master_generation.current()
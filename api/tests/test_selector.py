@@ -0,0 +1,164 @@
+import asyncio
+import pytest
+import sqlite3
+import time
+import warnings
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Generator, List, Tuple
+
+from fastapi.testclient import TestClient
+from sqlalchemy import make_url
+
+from app import cache, config, create_app
+from app.data import selector
+
+# Each selector level in order; its route, the parameter its selection is
+# passed as and the option attribute selected.
+LEVELS = (
+    ("makes", "mk", "id",),
+    ("types", "t", "id",),
+    ("models", "mdl", "id",),
+    ("years", "y", "year",),
+    ("stock", None, None,),
+)
+
+
+@pytest.fixture(scope = "function")
+def memory_client(master_database: None, monkeypatch) -> Generator[TestClient, None, None]:
+    """A client for a new app, serving the selector from memory."""
+    monkeypatch.setattr(config, "SELECTOR_SERVE_FROM_MEMORY", True)
+    with TestClient(create_app()) as c:
+        yield c
+
+
+def _page_through(client: TestClient, route: str, params: Dict[str, Any]) -> List[Dict]:
+    """Return every option of the given selector route, page by page."""
+    items: List[Dict] = []
+    page: int = 1
+    while True:
+        response = client.get("/api/vehicles/%s" % route,
+            params = dict(params, page = page, size = config.MAX_NUM_PER_PAGE))
+        assert response.status_code == 200
+        page_json = response.json()
+        items.extend(page_json["items"])
+        if page >= page_json["pages"]:
+            return items
+        page += 1
+
+
+def _cursor_through(client: TestClient, route: str, params: Dict[str, Any],
+                    size: int = 2) -> List[Dict]:
+    """Return every option of the given selector route, cursor by cursor."""
+    items: List[Dict] = []
+    cursor = None
+    while True:
+        response = client.get("/api/vehicles/%s/cursor" % route,
+            params = dict(params, size = size, **({"cursor": cursor} if cursor else {})))
+        assert response.status_code == 200
+        page_json = response.json()
+        items.extend(page_json["items"])
+        cursor = page_json["nextCursor"]
+        if cursor is None:
+            return items
+
+
+def _walk_selector(client: TestClient, read) -> Dict[Tuple, List[Dict]]:
+    """Walk every option of every selector level, with the given reader,
+    returning the options found for each route and selection above it.
+    """
+    options: Dict[Tuple, List[Dict]] = {}
+    def _walk(level: int, params: Dict[str, Any]):
+        route, param, attribute = LEVELS[level]
+        items: List[Dict] = read(client, route, params)
+        options[(route, *params.values(),)] = items
+        if param is None:
+            return
+        for item in items:
+            _walk(level + 1, dict(params, **{param: item[attribute]}))
+    _walk(0, {})
+    return options
+
+
+def test_memory_and_database_options_match(client: TestClient,
+                                           memory_client: TestClient):
+    """Ensure the selector serves the same options, in the same order, from
+    the database and from memory, and that cursor pages agree with both.
+    """
+    from_database = _walk_selector(client, _page_through)
+    from_memory = _walk_selector(memory_client, _page_through)
+    by_cursor = _walk_selector(client, _cursor_through)
+    assert len(from_database) > 5
+    assert from_memory == from_database
+    assert by_cursor == from_database
+
+
+def test_years_are_oldest_first(client: TestClient):
+    """Ensure years are ordered oldest first, as their keyset order is."""
+    for key, items in _walk_selector(client, _page_through).items():
+        if key[0] == "years":
+            years = [item["year"] for item in items]
+            assert years == sorted(years)
+
+
+def test_memory_pages_dont_warn(memory_client: TestClient):
+    """Ensure paginating the selector from memory raises no warnings."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert memory_client.get("/api/vehicles/makes").status_code == 200
+
+
+def test_memory_and_database_snapshots_match(client: TestClient,
+                                             memory_client: TestClient):
+    """Ensure a snapshot selects the same first options, and so returns the
+    same stock, from the database and from memory, for every make.
+    """
+    makes = client.get("/api/vehicles/snapshot").json()["makes"]
+    assert makes
+    for make in makes:
+        from_database = client.get("/api/vehicles/snapshot",
+            params = {"mk": make["id"]})
+        from_memory = memory_client.get("/api/vehicles/snapshot",
+            params = {"mk": make["id"]})
+        assert from_database.status_code == from_memory.status_code == 200
+        assert from_memory.json() == from_database.json()
+        years = [year["year"] for year in from_database.json()["years"]]
+        assert from_database.json()["y"] == min(years)
+
+
+def test_requests_during_reload_await_new_tree(memory_client: TestClient, monkeypatch):
+    """Ensure a request arriving while the selector tree is being reloaded for
+    a new master awaits the new tree, rather than serving the previous tree
+    under the new master's ETag.
+    """
+    num_loads: int = 0
+    load = selector.SelectorTree.load
+    async def _load(sesh):
+        nonlocal num_loads
+        num_loads += 1
+        tree = await load(sesh)
+        await asyncio.sleep(0.2)
+        return tree
+    monkeypatch.setattr(selector.SelectorTree, "load", _load)
+    makes = memory_client.get("/api/vehicles/makes").json()["items"]
+
+    database_path: str = make_url(config.SQLALCHEMY_DATABASE_URI).database
+    def _rename_make(name: str):
+        with sqlite3.connect(database_path) as conn:
+            conn.execute("UPDATE vehicle_make SET name = ? WHERE id = ?",
+                (name, makes[0]["id"],))
+        cache.invalidate_master()
+    _rename_make("Renamed")
+    try:
+        def _get_makes(delay: float):
+            time.sleep(delay)
+            return memory_client.get("/api/vehicles/makes")
+        with ThreadPoolExecutor(max_workers = 2) as executor:
+            responses = list(executor.map(_get_makes, [0, 0.05]))
+        assert num_loads == 1
+        for response in responses:
+            assert response.status_code == 200
+            assert response.json()["items"][0]["name"] == "Renamed"
+        assert responses[0].headers["etag"] == responses[1].headers["etag"]
+    finally:
+        _rename_make(makes[0]["name"])
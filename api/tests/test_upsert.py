@@ -0,0 +1,86 @@
+import pytest
+
+from typing import Any, Dict, List
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app import database
+from app.database import compat
+
+
+def _type_rows(num_rows: int, description: str) -> List[Dict[str, Any]]:
+    return [dict(id = "upsert-%d" % idx, name = "Upsert %d" % idx,
+                 description = description) for idx in range(num_rows)]
+
+
+@pytest.mark.parametrize("dialect,clause", [
+    (sqlite.dialect(), "ON CONFLICT (id) DO UPDATE",),
+    (postgresql.dialect(), "ON CONFLICT (id) DO UPDATE",),
+    (mysql.dialect(), "ON DUPLICATE KEY UPDATE",),
+])
+def test_build_upsert_per_dialect(dialect, clause: str):
+    """Ensure each supported dialect's upsert is a single multi-row insert,
+    updating every column but the primary key on conflict.
+    """
+    upsert_stmt = compat.build_upsert(dialect.name, database.VehicleType.__table__,
+        _type_rows(3, "first"))
+    sql: str = str(upsert_stmt.compile(dialect = dialect))
+    assert sql.count("INSERT") == 1
+    assert clause in sql
+    update_clause: str = sql[sql.index(clause):]
+    assert "name" in update_clause and "description" in update_clause
+    assert "id =" not in update_clause
+
+
+def test_build_upsert_rejects_unknown_dialect():
+    """Ensure an upsert can't be built for an unsupported dialect."""
+    with pytest.raises(NotImplementedError):
+        compat.build_upsert("oracle", database.VehicleType.__table__,
+            _type_rows(1, "first"))
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("num_rows,chunk_size,num_statements", [
+    (6, 3, 2,), (7, 3, 3,), (2, 3, 1,), (3, 1, 3,),
+])
+async def test_bulk_upsert_in_chunks(master_database: None, num_rows: int,
+                                     chunk_size: int, num_statements: int):
+    """Ensure a chunked batch inserts every row, one statement per chunk, and
+    that running it again, changed or unchanged, updates the same rows rather
+    than adding any.
+    """
+    statements: List[str] = []
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT"):
+            statements.append(statement)
+    sync_engine = database.async_engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _on_execute)
+    try:
+        async with database.async_session() as sesh:
+            async def _upsert(description: str) -> Dict[str, str]:
+                statements.clear()
+                assert await database.vehicle_types.bulk_upsert(sesh,
+                    _type_rows(num_rows, description), chunk_size = chunk_size) == num_rows
+                assert len(statements) == num_statements
+                result = await sesh.execute(
+                    select(database.VehicleType.id, database.VehicleType.description)
+                    .where(database.VehicleType.id.startswith("upsert-")))
+                return dict(result.all())
+            expected = {"upsert-%d" % idx: "first" for idx in range(num_rows)}
+            assert await _upsert("first") == expected
+            assert await _upsert("first") == expected
+            assert await _upsert("second") == \
+                {type_id: "second" for type_id in expected}
+            await sesh.rollback()
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", _on_execute)
+
+
+@pytest.mark.anyio
+async def test_bulk_upsert_rejects_empty_chunks(master_database: None):
+    """Ensure a chunk size below one is refused."""
+    async with database.async_session() as sesh:
+        with pytest.raises(ValueError):
+            await database.vehicle_types.bulk_upsert(sesh, _type_rows(1, "first"),
+                chunk_size = 0)
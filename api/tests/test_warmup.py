@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+
+from typing import Dict
+
+from fastapi.testclient import TestClient
+
+from app import config, database
+from app.data import warmup
+
+
+@pytest.fixture
+def cold_worker(monkeypatch) -> None:
+    """A worker that has yet to warm up."""
+    monkeypatch.setattr(config, "WARMUP_ENABLED", True)
+    monkeypatch.setattr(warmup, "_ready", False)
+    monkeypatch.setattr(warmup, "_error", None)
+    monkeypatch.setattr(warmup, "_task", None)
+
+
+@pytest.mark.anyio
+async def test_warm_up_marks_ready(master_database: None, cold_worker: None):
+    """Ensure a worker is ready once its warm-up finishes."""
+    warmup.start()
+    assert not warmup.is_ready()
+    await warmup._task
+    assert warmup.is_ready()
+    assert warmup.error() is None
+
+
+def test_failed_warm_up_is_not_ready(client: TestClient, cold_worker: None, monkeypatch):
+    """Ensure a worker whose warm-up failed reports itself not ready, along
+    with why.
+    """
+    async def _fail():
+        raise RuntimeError("selector unavailable")
+    monkeypatch.setattr(warmup, "warm_selector", _fail)
+    asyncio.run(warmup.warm_up())
+    response = client.get("/api/health/ready")
+    assert response.status_code == 503
+    assert response.json() == dict(ready = False, failed = True,
+                                   error = "selector unavailable")
+
+
+@pytest.mark.anyio
+async def test_stop_lets_pools_finish_opening(cold_worker: None, monkeypatch):
+    """Ensure stopping a warm-up that is opening the pools lets them finish
+    opening, then stops without error, leaving the worker not ready.
+    """
+    opened = asyncio.Event()
+    async def _open_pools() -> Dict[str, int]:
+        await asyncio.sleep(0.05)
+        opened.set()
+        return {}
+    monkeypatch.setattr(database, "open_pools", _open_pools)
+    warmup.start()
+    await asyncio.sleep(0)
+    await warmup.stop()
+    assert opened.is_set()
+    assert not warmup.is_ready()
+    assert warmup.error() is None
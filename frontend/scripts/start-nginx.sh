@@ -1,8 +1,13 @@
 #!/bin/sh
 
 # Substitute environment variables in our custom config, then write
-# that configuration to Nginx configuration directory.
-envsubst < /etc/nginx/conf.d/csb.conf.template > /etc/nginx/conf.d/csb.conf
+# that configuration to Nginx configuration directory. Only our own
+# variables are substituted, so Nginx's variables are left as they are.
+CSB_VARIABLES='$DOMAIN $UPSTREAM_SERVER $UPSTREAM_PORT $CONTENT_DIRECTORY $STATIC_DIRECTORY $ACCESS_LOG'
+envsubst "$CSB_VARIABLES" < /etc/nginx/conf.d/csb.conf.template > /etc/nginx/conf.d/csb.conf
+for snippet in /etc/nginx/snippets/static-selector.conf; do
+    envsubst "$CSB_VARIABLES" < "$snippet" > "$snippet.tmp" && mv "$snippet.tmp" "$snippet"
+done
 
 # Execute nginx.
 nginx -g 'daemon off;'
\ No newline at end of file